@@ -0,0 +1,140 @@
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import os
+import time
+
+from app.models import LogEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION = 100000
+DEFAULT_LOG_PATH = os.getenv("ACTIVITY_LOG_PATH", "logs/activity.jsonl")
+DEFAULT_MAX_BYTES = int(os.getenv("ACTIVITY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+DEFAULT_BACKUP_COUNT = 5
+WRITER_BATCH_SIZE = 1000
+LOG_LEVELS = ("info", "warning", "error")
+
+
+class ActivityLog:
+    """Process-wide activity log.
+
+    `append` is O(1) and takes no state lock: it stamps the entry with the
+    next monotonic id, keeps it in a bounded deque of `retention` entries
+    and, while `run_writer` is running, queues it for the JSONL file.
+    Readers pull only the entries after the last id they have seen.
+    """
+
+    def __init__(
+        self,
+        retention: int = DEFAULT_RETENTION,
+        path: str | None = DEFAULT_LOG_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._entries: collections.deque[tuple[int, float, str, str]] = (
+            collections.deque(maxlen=retention)
+        )
+        self._ids = itertools.count(1)
+        self._queue: asyncio.Queue | None = None
+        self.dropped = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._entries[-1][0] if self._entries else 0
+
+    def append(self, level: str, message: str) -> int:
+        entry = (next(self._ids), time.time(), level, message)
+        self._entries.append(entry)
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        return entry[0]
+
+    def since(
+        self, last_id: int, levels: set[str] | None = None, limit: int | None = None
+    ) -> list[LogEntry]:
+        """Entries newer than `last_id`, oldest first, at most the newest
+        `limit` of them. Walks back from the tail, so the cost is the number
+        of new entries, not the retention."""
+        found = []
+        for entry in reversed(self._entries):
+            if entry[0] <= last_id or (limit is not None and len(found) >= limit):
+                break
+            if levels is None or entry[2] in levels:
+                found.append(entry)
+        found.reverse()
+        return [_to_log_entry(entry) for entry in found]
+
+    def tail(self, limit: int, levels: set[str] | None = None) -> list[LogEntry]:
+        return self.since(0, levels, limit)
+
+    async def run_writer(self):
+        """Drains queued entries into the JSONL file in batches, rotating it
+        at `max_bytes`. Runs until cancelled, then writes what is left."""
+        self._queue = asyncio.Queue(maxsize=self._entries.maxlen)
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while len(batch) < WRITER_BATCH_SIZE and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await asyncio.to_thread(self._write, batch)
+        finally:
+            queue, self._queue = self._queue, None
+            batch = []
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list[tuple[int, float, str, str]]):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            lines = "".join(
+                json.dumps(
+                    {"id": entry_id, "ts": ts, "level": level, "message": message}
+                )
+                + "\n"
+                for entry_id, ts, level, message in batch
+            )
+            if (
+                os.path.exists(self.path)
+                and os.path.getsize(self.path) + len(lines) > self.max_bytes
+            ):
+                self._rotate()
+            with open(self.path, "a") as f:
+                f.write(lines)
+        except OSError:
+            logger.exception("Failed to write activity log")
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def _to_log_entry(entry: tuple[int, float, str, str]) -> LogEntry:
+    entry_id, ts, level, message = entry
+    return LogEntry(
+        id=entry_id,
+        time=time.strftime("%H:%M:%S", time.localtime(ts)),
+        level=level,
+        message=message,
+    )
+
+
+activity_log = ActivityLog()
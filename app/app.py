@@ -1,9 +1,25 @@
+import asyncio
+import contextlib
+
 import reflex as rx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.metrics import metrics
 from app.pages.dashboard import dashboard_page
 from app.pages.market_detail import market_detail_page
 from app.pages.settings import settings_page
 
+
+async def metrics_endpoint(request):
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 app = rx.App(
+    api_transformer=Starlette(routes=[Route("/metrics", metrics_endpoint)]),
     theme=rx.theme(appearance="light"),
     head_components=[
         rx.el.link(rel="preconnect", href="https://fonts.googleapis.com"),
@@ -14,12 +30,52 @@ app = rx.App(
         ),
     ],
 )
+from app import polymarket_api
+from app.activity_log import activity_log
+from app.kalshi_api import close_client
+from app.market_cache import market_cache
 from app.state import BotState
 
+
+@contextlib.asynccontextmanager
+async def kalshi_http_client():
+    yield
+    await close_client()
+
+
+@contextlib.asynccontextmanager
+async def polymarket_http_client():
+    yield
+    await polymarket_api.close_client()
+
+
+@contextlib.asynccontextmanager
+async def activity_log_writer():
+    task = asyncio.create_task(activity_log.run_writer())
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+@contextlib.asynccontextmanager
+async def market_cache_writer():
+    task = asyncio.create_task(market_cache.run_writer())
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+app.register_lifespan_task(kalshi_http_client)
+app.register_lifespan_task(polymarket_http_client)
+app.register_lifespan_task(activity_log_writer)
+app.register_lifespan_task(market_cache_writer)
+
 app.add_page(dashboard_page, route="/", on_load=BotState.on_load_dashboard)
 app.add_page(
     market_detail_page,
     route="/market/[market_id]",
     on_load=BotState.on_load_market_detail,
 )
-app.add_page(settings_page, route="/settings")
\ No newline at end of file
+app.add_page(settings_page, route="/settings")
@@ -0,0 +1,360 @@
+"""Micro-benchmarks for the hot paths of the operator panel.
+
+Run with `python -m app.benchmarks [name ...]`; with no names every
+benchmark runs. Each benchmark prints one line per variant.
+"""
+
+import argparse
+import json
+import logging
+import time
+
+
+def synthetic_feed_messages(count: int, tickers: int = 500) -> list[str]:
+    """Encoded websocket frames from `replay.synthetic_frames`, stamped with
+    a per-channel `sid` and `seq` as the exchange would send them."""
+    from app.replay import CHANNEL_FOR_TYPE, synthetic_frames
+
+    sids = {"orderbook_delta": 1, "ticker": 2}
+    seqs = {1: 0, 2: 0}
+    messages = []
+    for frame in synthetic_frames(count, tickers):
+        sid = sids[CHANNEL_FOR_TYPE[frame["type"]]]
+        seqs[sid] += 1 + frame.get("skip", 0)
+        data = {
+            "type": frame["type"],
+            "sid": sid,
+            "seq": seqs[sid],
+            "msg": frame["msg"],
+        }
+        messages.append(json.dumps(data, separators=(",", ":")))
+    return messages
+
+
+def bench_json(count: int = 200000):
+    """Feed frames decoded per second with each installed JSON backend."""
+    from app.json_codec import available_backends, get_decoder
+
+    messages = synthetic_feed_messages(count)
+    for backend in available_backends():
+        decode = get_decoder(backend).decode_feed
+        started = time.perf_counter()
+        for message in messages:
+            decode(message)
+        elapsed = time.perf_counter() - started
+        print(f"json[{backend}]: {count / elapsed:,.0f} msgs/s")
+
+
+def bench_replay(count: int = 50000):
+    """End-to-end feed replay through a local websocket server, flat out and
+    at 1x of a 2000 msgs/s recording."""
+    import asyncio
+
+    from app.replay import run_replay, synthetic_frames
+
+    frames = synthetic_frames(count, tickers=500, rate=2000.0)
+    for label, speed in (("max", 0.0), ("1x", 1.0)):
+        report = asyncio.run(run_replay(frames, speed=speed))
+        print(
+            f"replay[{label}]: {report['msgs_per_sec']:,.0f} msgs/s, "
+            f"p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms, "
+            f"peak RSS {report['peak_rss_mb']} MB"
+        )
+
+
+def bench_kill_switch(count: int = 1000):
+    """Time from kill-switch press to the last cancel ack for `count` resting
+    orders, against the mock exchange at several latencies and levels of
+    parallelism."""
+    import asyncio
+
+    from app import kalshi_api
+    from app.kill_switch import TARGET_MS, cancel_everything
+    from app.mock_exchange import MockExchange
+
+    for latency in (0.02, 0.05):
+        for concurrency in (1, 4, 16, 32):
+            exchange = MockExchange(latency=latency, fail_rate=0.02, seed=1)
+            kalshi_api.configure_client(transport=exchange.transport())
+            exchange._create(
+                [
+                    {
+                        "ticker": f"KX-BENCH-{i % 100}",
+                        "action": "buy",
+                        "count": 1,
+                        "yes_price": 40,
+                    }
+                    for i in range(count)
+                ]
+            )
+            order_ids = list(exchange.orders)
+            report, _ = asyncio.run(
+                cancel_everything(
+                    "key", order_ids, time.monotonic(), concurrency=concurrency
+                )
+            )
+            verdict = "ok" if report["elapsed_ms"] < TARGET_MS else "SLOW"
+            print(
+                f"kill_switch[{latency * 1000:.0f}ms rtt, x{concurrency}]: "
+                f"{report['canceled']}/{count} in {report['elapsed_ms']} ms, "
+                f"{report['requests']} requests, {report['retries']} retries, "
+                f"{report['failed']} failed ({verdict})"
+            )
+
+
+def bench_market_store(count: int = 50000):
+    """Memory held by `count` markets as `Market` dicts versus the columnar
+    store, and the cost of a volume sort and a 100-row page on each."""
+    import tracemalloc
+
+    from app.market_store import MarketStore
+    from app.market_view import MarketView
+    from app.models import Market, StrategyParams
+
+    def market_fields(i: int) -> dict:
+        return {
+            "best_bid": (30 + i % 40) / 100.0,
+            "best_ask": (35 + i % 40) / 100.0,
+            "total_volume": i * 7 % 100000,
+        }
+
+    params = StrategyParams(
+        target_spread_bps=200,
+        max_inventory=1000,
+        base_quote_size=100,
+        skew=0.5,
+        enabled=False,
+    )
+    # Descriptions and tickers are built outside the traced region so both
+    # layouts are charged only for their own structures.
+    tickers = [f"KXBENCH-{i:06d}" for i in range(count)]
+    descriptions = [f"Will benchmark market {i} resolve yes?" for i in range(count)]
+
+    def build_dicts() -> dict:
+        return {
+            ticker: Market(
+                market_id=ticker,
+                ticker=ticker,
+                description=description,
+                my_bid_price=None,
+                my_bid_size=None,
+                my_ask_price=None,
+                my_ask_size=None,
+                inventory=0,
+                unrealized_pnl=0.0,
+                quoting_active=False,
+                strategy_params=StrategyParams(**params),
+                order_book=[],
+                recent_trades=[],
+                **market_fields(i),
+            )
+            for i, (ticker, description) in enumerate(zip(tickers, descriptions))
+        }
+
+    def build_store() -> MarketStore:
+        store = MarketStore()
+        for i, (ticker, description) in enumerate(zip(tickers, descriptions)):
+            store.add(ticker, ticker, description, market_fields(i), params)
+        return store
+
+    for label, build in (("dicts", build_dicts), ("store", build_store)):
+        tracemalloc.start()
+        markets = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if label == "dicts":
+            started = time.perf_counter()
+            ids = sorted(
+                markets, key=lambda market_id: markets[market_id]["total_volume"]
+            )
+            sort_ms = (time.perf_counter() - started) * 1000.0
+            started = time.perf_counter()
+            page = [dict(markets[market_id]) for market_id in ids[:100]]
+        else:
+            view = MarketView()
+            started = time.perf_counter()
+            ids = view.ordered_ids(markets, None, "volume", 0)
+            sort_ms = (time.perf_counter() - started) * 1000.0
+            started = time.perf_counter()
+            page = view.page(markets, ids, 1, 100)
+        page_ms = (time.perf_counter() - started) * 1000.0
+        print(
+            f"market_store[{label}]: {size / 2**20:.1f} MB for {count:,} markets "
+            f"({size / count:.0f} B each), volume sort {sort_ms:.1f} ms, "
+            f"{len(page)}-row page {page_ms:.2f} ms"
+        )
+
+
+def bench_market_cache(count: int = 50000):
+    """Cold start from the market cache for `count` markets: the full first
+    write, a write after 1% of prices moved, reading the file back and
+    restoring it into a fresh state."""
+    import os
+    import tempfile
+
+    from app.market_cache import MarketCache
+    from app.replay import _make_state
+    from app.state import BotState
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = MarketCache(os.path.join(directory, "markets.sqlite3"))
+        state = _make_state([f"KXBENCH-{i:06d}" for i in range(count)])
+        markets = state._plain_markets()
+
+        def timed_write() -> float:
+            cache.mark_dirty(markets, state._price_histories)
+            started = time.perf_counter()
+            cache._write(*cache._capture())
+            return (time.perf_counter() - started) * 1000.0
+
+        full_ms = timed_write()
+        for market_id in markets.ids()[::100]:
+            markets.set(market_id, "best_bid", 0.41)
+        delta_ms = timed_write()
+        started = time.perf_counter()
+        rows, prices = MarketCache(cache.path).load()
+        load_ms = (time.perf_counter() - started) * 1000.0
+        fresh = BotState(_reflex_internal_init=True)
+        started = time.perf_counter()
+        fresh._restore_markets(rows, prices)
+        restore_ms = (time.perf_counter() - started) * 1000.0
+        size = os.path.getsize(cache.path)
+    print(
+        f"market_cache: {count:,} markets, {size / 2**20:.1f} MB; first write "
+        f"{full_ms:.0f} ms, 1% delta write {delta_ms:.0f} ms, load "
+        f"{load_ms:.0f} ms, restore {restore_ms:.0f} ms"
+    )
+
+
+def bench_bulk_update(count: int = 10000):
+    """A spread change and a quoting disable on `count` markets in one bulk
+    event, versus one `update_strategy_params` / `toggle_market_quoting`
+    call per market."""
+    from app.replay import _make_state
+    from app.state import DEFAULT_STRATEGY_PARAMS
+
+    def timed(run) -> float:
+        state = _make_state([f"KXBENCH-{i:06d}" for i in range(count)])
+        state.set_bulk_quoting(True)
+        started = time.perf_counter()
+        run(state)
+        return (time.perf_counter() - started) * 1000.0
+
+    def per_market_params(state):
+        params = DEFAULT_STRATEGY_PARAMS | {"target_spread_bps": 150}
+        for market_id in state._plain_markets().ids():
+            state.update_strategy_params(market_id, params)
+
+    def per_market_disable(state):
+        for market_id in state._plain_markets().ids():
+            state.toggle_market_quoting(market_id)
+
+    runs = (
+        (
+            "params",
+            per_market_params,
+            lambda state: state.apply_bulk_params({"target_spread_bps": "150"}),
+        ),
+        ("disable", per_market_disable, lambda state: state.set_bulk_quoting(False)),
+    )
+    for label, per_market, bulk in runs:
+        single_ms = timed(per_market)
+        bulk_ms = timed(bulk)
+        print(
+            f"bulk_update[{label}]: {count:,} markets, per market "
+            f"{single_ms:.0f} ms, bulk {bulk_ms:.1f} ms "
+            f"({single_ms / bulk_ms:.0f}x)"
+        )
+
+
+def bench_response_cache(count: int = 100, latency: float = 0.02):
+    """Requests sent and wall time for `count` concurrent identical
+    `get_markets` calls, then `count` more within the TTL, against a
+    transport with `latency` seconds of round trip."""
+    import asyncio
+
+    import httpx
+
+    from app import kalshi_api
+
+    sent = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"markets": [], "cursor": ""})
+
+    async def run() -> tuple[float, float]:
+        started = time.perf_counter()
+        await asyncio.gather(*(kalshi_api.get_markets("") for _ in range(count)))
+        burst_ms = (time.perf_counter() - started) * 1000.0
+        started = time.perf_counter()
+        for _ in range(count):
+            await kalshi_api.get_markets("")
+        repeat_ms = (time.perf_counter() - started) * 1000.0
+        return burst_ms, repeat_ms
+
+    kalshi_api.configure_client(transport=httpx.MockTransport(handle))
+    burst_ms, repeat_ms = asyncio.run(run())
+    stats = kalshi_api.response_cache_stats()
+    print(
+        f"response_cache: {count} concurrent calls sent {len(sent)} request(s) "
+        f"in {burst_ms:.0f} ms, {count} repeats in {repeat_ms:.1f} ms; "
+        f"{stats['hit']} hits, {stats['coalesced']} coalesced, "
+        f"{stats['miss']} misses"
+    )
+
+
+def bench_metrics(count: int = 1000000):
+    """Per-observation cost of a histogram `observe` and a counter `inc`,
+    including the benchmark loop itself."""
+    from app.metrics import Counter, Histogram
+
+    histogram = Histogram()
+    counter = Counter()
+    # Durations from 0 to ~8.5 ms, so every bucket path is taken.
+    values = [(i % 5000) * 1.7e-6 for i in range(1000)]
+    rounds = count // len(values)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for value in values:
+            pass
+    loop_ns = (time.perf_counter() - started) / count * 1e9
+    for label, record in (("observe", histogram.observe), ("inc", counter.inc)):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for value in values:
+                record(value)
+        elapsed_ns = (time.perf_counter() - started) / count * 1e9
+        print(
+            f"metrics[{label}]: {elapsed_ns:.0f} ns per call "
+            f"({elapsed_ns - loop_ns:.0f} ns over the bare loop)"
+        )
+
+
+BENCHMARKS = {
+    "json": bench_json,
+    "replay": bench_replay,
+    "kill_switch": bench_kill_switch,
+    "market_store": bench_market_store,
+    "market_cache": bench_market_cache,
+    "metrics": bench_metrics,
+    "bulk_update": bench_bulk_update,
+    "response_cache": bench_response_cache,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help=f"any of: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    logging.disable(logging.ERROR)
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
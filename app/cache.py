@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+
+
+class TTLCache:
+    """Size-bounded LRU map whose entries expire `ttl` seconds after they
+    were stored.
+
+    `get` refreshes an entry's recency, not its expiry, so a hot entry is
+    still refetched every `ttl` seconds. `set` drops every expired entry
+    before storing, then evicts the least recently used ones past
+    `maxsize`, so expired values are not kept alive until they are next
+    looked up.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        """The live value for `key`, or `default` when it is missing or
+        expired. Counts a hit or a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value, ttl: float | None = None):
+        """Stores `value` for `ttl` seconds (default `self.ttl`)."""
+        now = self._clock()
+        self._purge(now)
+        self._entries[key] = (now + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _purge(self, now: float):
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
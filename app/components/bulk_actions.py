@@ -0,0 +1,70 @@
+import reflex as rx
+
+from app.state import BotState
+
+INPUT_CLASS = "w-28 px-2 py-1 text-sm bg-white border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-blue-500 focus:border-blue-500"
+
+
+def param_input(name: str, placeholder: str, step: str = "1") -> rx.Component:
+    return rx.el.input(
+        name=name,
+        placeholder=placeholder,
+        type="number",
+        step=step,
+        class_name=INPUT_CLASS,
+    )
+
+
+def bulk_actions_bar() -> rx.Component:
+    return rx.el.form(
+        rx.el.span("Bulk:", class_name="text-sm font-medium text-gray-600"),
+        rx.el.select(
+            rx.el.option("Search results", value="filtered"),
+            rx.el.option("Series", value="series"),
+            value=BotState.bulk_scope,
+            on_change=BotState.set_bulk_scope,
+            class_name=INPUT_CLASS,
+        ),
+        rx.cond(
+            BotState.bulk_scope == "series",
+            rx.el.select(
+                rx.el.option("Choose series", value=""),
+                rx.foreach(
+                    BotState.series_names,
+                    lambda series: rx.el.option(series, value=series),
+                ),
+                value=BotState.bulk_series,
+                on_change=BotState.set_bulk_series,
+                class_name=INPUT_CLASS,
+            ),
+        ),
+        param_input("target_spread_bps", "Spread bps"),
+        param_input("max_inventory", "Max inventory"),
+        param_input("base_quote_size", "Quote size"),
+        param_input("skew", "Skew", step="any"),
+        rx.el.button(
+            "Apply to ",
+            BotState.bulk_target_count.to_string(),
+            " markets",
+            type="submit",
+            disabled=BotState.bulk_target_count == 0,
+            class_name="h-8 px-3 text-xs bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:opacity-50",
+        ),
+        rx.el.button(
+            "Enable quoting",
+            type="button",
+            on_click=BotState.set_bulk_quoting(True),
+            disabled=BotState.bulk_target_count == 0,
+            class_name="h-8 px-3 text-xs bg-white border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50",
+        ),
+        rx.el.button(
+            "Disable quoting",
+            type="button",
+            on_click=BotState.set_bulk_quoting(False),
+            disabled=BotState.bulk_target_count == 0,
+            class_name="h-8 px-3 text-xs bg-yellow-500 text-white rounded-md hover:bg-yellow-600 disabled:opacity-50",
+        ),
+        on_submit=BotState.apply_bulk_params,
+        reset_on_submit=True,
+        class_name="flex flex-wrap items-center gap-2 mb-4 px-4 md:px-0",
+    )
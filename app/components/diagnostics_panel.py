@@ -0,0 +1,56 @@
+import reflex as rx
+
+from app.state import BotState
+
+
+def metric_row(row: rx.Var[dict]) -> rx.Component:
+    return rx.el.tr(
+        rx.el.td(row["name"], class_name="px-4 py-1"),
+        rx.el.td(row["labels"], class_name="px-4 py-1 text-gray-400"),
+        rx.el.td(row["count"].to_string(), class_name="px-4 py-1 text-right"),
+        rx.el.td(row["p50_ms"].to_string(), class_name="px-4 py-1 text-right"),
+        rx.el.td(row["p99_ms"].to_string(), class_name="px-4 py-1 text-right"),
+        rx.el.td(row["max_ms"].to_string(), class_name="px-4 py-1 text-right"),
+    )
+
+
+def diagnostics_panel() -> rx.Component:
+    return rx.el.div(
+        rx.el.div(
+            rx.el.h3("Diagnostics", class_name="text-lg font-semibold text-gray-800"),
+            rx.el.div(
+                rx.el.a(
+                    "/metrics",
+                    href=f"{rx.config.get_config().api_url}/metrics",
+                    target="_blank",
+                    class_name="text-xs text-blue-600 hover:underline",
+                ),
+                rx.el.button(
+                    "Refresh",
+                    on_click=BotState.refresh_metrics,
+                    class_name="px-2 py-1 text-xs bg-white border border-gray-300 rounded-md shadow-sm hover:bg-gray-50",
+                ),
+                class_name="flex items-center gap-3",
+            ),
+            class_name="flex items-center justify-between px-4 pt-4",
+        ),
+        rx.el.div(
+            rx.el.table(
+                rx.el.thead(
+                    rx.el.tr(
+                        rx.el.th("Metric", class_name="px-4 py-1 text-left"),
+                        rx.el.th("Labels", class_name="px-4 py-1 text-left"),
+                        rx.el.th("Count", class_name="px-4 py-1 text-right"),
+                        rx.el.th("p50 ms", class_name="px-4 py-1 text-right"),
+                        rx.el.th("p99 ms", class_name="px-4 py-1 text-right"),
+                        rx.el.th("max ms", class_name="px-4 py-1 text-right"),
+                        class_name="text-gray-500",
+                    )
+                ),
+                rx.el.tbody(rx.foreach(BotState.metric_summaries, metric_row)),
+                class_name="w-full font-mono text-xs",
+            ),
+            class_name="max-h-64 overflow-y-auto py-2",
+        ),
+        class_name="bg-white border rounded-lg shadow-sm",
+    )
@@ -4,27 +4,40 @@ from app.state import BotState
 
 def log_viewer() -> rx.Component:
     return rx.el.div(
-        rx.el.h3(
-            "Activity Log", class_name="text-lg font-semibold text-gray-800 px-4 pt-4"
+        rx.el.div(
+            rx.el.h3("Activity Log", class_name="text-lg font-semibold text-gray-800"),
+            rx.el.select(
+                rx.el.option("All levels", value="all"),
+                rx.el.option("Info", value="info"),
+                rx.el.option("Warning", value="warning"),
+                rx.el.option("Error", value="error"),
+                value=BotState.log_level,
+                on_change=BotState.set_log_level,
+                class_name="px-2 py-1 text-xs bg-white border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-blue-500 focus:border-blue-500",
+            ),
+            class_name="flex items-center justify-between px-4 pt-4",
         ),
         rx.el.div(
             rx.foreach(
-                BotState.log_messages,
-                lambda msg: rx.el.div(
+                BotState.log_entries,
+                lambda entry: rx.el.div(
                     rx.el.code(
-                        msg["message"],
+                        entry["time"],
+                        " - ",
+                        entry["message"],
                         class_name=rx.match(
-                            msg["level"],
+                            entry["level"],
                             ("info", "text-blue-500"),
                             ("warning", "text-yellow-600"),
                             ("error", "text-red-500"),
                             "text-gray-500",
                         ),
                     ),
+                    key=entry["id"],
                     class_name="font-mono text-xs px-4 py-1",
                 ),
             ),
-            class_name="h-48 overflow-y-scroll w-full font-mono text-xs",
+            class_name="h-48 overflow-y-scroll w-full font-mono text-xs flex flex-col-reverse justify-end",
         ),
         class_name="bg-white border rounded-lg shadow-sm mt-6",
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+
+from app import kalshi_api, polymarket_api
+from app.cache import TTLCache
+from app.models import VenueMarket, VenueStats
+
+KALSHI_CLOSED_STATUSES = {"closed", "settled", "determined", "finalized"}
+REST_LATENCY_SMOOTHING = 0.2
+# Cancel rejections that mean the order is no longer resting.
+GONE_REASONS = ("not found", "not_found", "already canceled", "matched", "filled")
+
+# Search fan-out: uncached series/event requests in flight at once, and how
+# many per-term responses are kept, for how long.
+SEARCH_CONCURRENCY = 4
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL = 60.0
+_SEARCH_TERM = re.compile(r"[A-Z0-9][A-Z0-9._-]{2,}")
+# Reflex does not say when a browser session ends, so a session's adapters
+# are dropped once they have gone this long without a running feed or a call.
+SESSION_IDLE_TTL = 3600.0
+
+exchange_adapters: dict[str, dict[str, "ExchangeAdapter"]] = {}
+# client token -> monotonic time the session's adapters were last used
+_last_used: dict[str, float] = {}
+search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+
+def search_terms(query: str) -> list[str]:
+    """The series and event tickers a search box query names: its
+    comma-separated terms of three or more ticker characters, uppercased."""
+    terms = []
+    for term in query.upper().split(","):
+        term = term.strip()
+        if _SEARCH_TERM.fullmatch(term) and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def kalshi_market(market_data: dict) -> VenueMarket:
+    """Normalizes a Kalshi API market; prices arrive in cents."""
+    if market_data.get("series_ticker"):
+        series = market_data["series_ticker"]
+    else:
+        event_ticker = market_data.get("event_ticker") or market_data["ticker"]
+        series = event_ticker.split("-", 1)[0]
+    return VenueMarket(
+        market_id=market_data["ticker"],
+        ticker=market_data["ticker"],
+        venue="kalshi",
+        series=series,
+        description=market_data.get("title", ""),
+        best_bid=market_data.get("yes_bid", 0) / 100.0,
+        best_ask=market_data.get("yes_ask", 0) / 100.0,
+        total_volume=market_data.get("volume_total", 0),
+        last_price=(
+            market_data["last_price"] / 100.0 if market_data.get("last_price") else None
+        ),
+        closed=market_data.get("status") in KALSHI_CLOSED_STATUSES,
+    )
+
+
+def polymarket_market(market_data: dict) -> tuple[VenueMarket, str] | None:
+    """Normalizes a Gamma market and returns it with its yes-token id, or
+    None for markets without a CLOB book."""
+    token_ids = market_data.get("clobTokenIds")
+    if isinstance(token_ids, str):
+        token_ids = json.loads(token_ids)
+    if not token_ids:
+        return None
+    events = market_data.get("events") or []
+    series = (events[0].get("ticker") or events[0].get("slug")) if events else ""
+    best_bid = market_data.get("bestBid")
+    best_ask = market_data.get("bestAsk")
+    last_price = market_data.get("lastTradePrice")
+    market = VenueMarket(
+        market_id=market_data["slug"],
+        ticker=market_data["slug"],
+        venue="polymarket",
+        series=series or "",
+        description=market_data.get("question", ""),
+        best_bid=float(best_bid) if best_bid is not None else None,
+        best_ask=float(best_ask) if best_ask is not None else None,
+        total_volume=round(float(market_data.get("volumeNum") or 0)),
+        last_price=float(last_price) if last_price else None,
+        closed=bool(market_data.get("closed")) or not market_data.get("active", True),
+    )
+    return market, token_ids[0]
+
+
+class ExchangeAdapter(ABC):
+    """One venue behind a common async surface: a REST snapshot of its
+    markets, a streaming feed of books and tickers into the shared update
+    path, and the order operations the kill switch needs.
+
+    Markets come back as `VenueMarket`s with prices in dollars of the $1
+    payout and sizes in whole contracts. REST calls made through `_timed`
+    feed the request count, error count and smoothed latency reported by
+    `venue_stats` alongside the feed's throughput.
+    """
+
+    venue = ""
+    cancel_batch_size = 1
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.feed = None
+        self.rest_requests = 0
+        self.rest_errors = 0
+        self.rest_latency_ms = 0.0
+        self._rate_at = time.monotonic()
+        self._rate_messages = 0
+        self._msgs_per_sec = 0.0
+
+    @abstractmethod
+    async def fetch_markets(self, series_tickers: list[str] | None = None) -> dict:
+        """Returns `{"markets": [VenueMarket, ...]}` or an error dict."""
+
+    async def search_markets(self, terms: list[str]) -> dict:
+        """Like `fetch_markets`, for the series and events named by the
+        search `terms`, served from `search_cache` where possible."""
+        return await self.fetch_markets(terms)
+
+    @abstractmethod
+    def create_feed(self, market_ids: list[str]):
+        """Builds the venue's streaming feed for `market_ids` and keeps it
+        as `self.feed`."""
+
+    @abstractmethod
+    async def cancel_orders(self, order_ids: list[str]) -> dict:
+        """Cancels up to `cancel_batch_size` orders and returns
+        `{"canceled": [...], "gone": [...], "retry": [...]}`, or an error
+        dict when the request itself failed."""
+
+    @abstractmethod
+    async def resting_order_ids(self) -> list[str] | dict:
+        """Ids of every resting order on the account, or an error dict."""
+
+    @abstractmethod
+    def _feed_stats(self) -> tuple[bool, int, int, float]:
+        """(connected, markets, messages, feed latency ms) of the live feed."""
+
+    async def _timed(self, call) -> dict:
+        started = time.perf_counter()
+        response = await call
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.rest_requests += 1
+        if isinstance(response, dict) and "error" in response:
+            self.rest_errors += 1
+        if self.rest_requests == 1:
+            self.rest_latency_ms = elapsed_ms
+        else:
+            self.rest_latency_ms += REST_LATENCY_SMOOTHING * (
+                elapsed_ms - self.rest_latency_ms
+            )
+        return response
+
+    def venue_stats(self) -> VenueStats:
+        connected, markets, messages, latency_ms = (
+            self._feed_stats() if self.feed is not None else (False, 0, 0, 0.0)
+        )
+        now = time.monotonic()
+        if now - self._rate_at >= 1.0 or messages < self._rate_messages:
+            self._msgs_per_sec = max(0, messages - self._rate_messages) / (
+                now - self._rate_at
+            )
+            self._rate_at = now
+            self._rate_messages = messages
+        return VenueStats(
+            venue=self.venue,
+            connected=connected,
+            markets=markets,
+            messages=messages,
+            msgs_per_sec=round(self._msgs_per_sec, 1),
+            feed_latency_ms=latency_ms,
+            rest_requests=self.rest_requests,
+            rest_errors=self.rest_errors,
+            rest_latency_ms=round(self.rest_latency_ms, 1),
+        )
+
+
+class KalshiAdapter(ExchangeAdapter):
+    venue = "kalshi"
+    cancel_batch_size = kalshi_api.BATCH_ORDER_LIMIT
+
+    async def fetch_markets(self, series_tickers: list[str] | None = None) -> dict:
+        response = await self._timed(
+            kalshi_api.get_all_markets(
+                self.api_key, status="open", series_tickers=series_tickers
+            )
+        )
+        if "error" in response:
+            return response
+        return {"markets": [kalshi_market(market) for market in response["markets"]]}
+
+    async def search_markets(self, terms: list[str]) -> dict:
+        """Fetches each term as a series, or as an event when it has a dash,
+        at most `SEARCH_CONCURRENCY` at a time, and merges the results.
+        Terms fetched within `SEARCH_CACHE_TTL` cost no request. Fails only
+        when every uncached term failed."""
+        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+        async def fetch(term: str) -> list[dict] | dict:
+            key = (self.venue, term)
+            markets = search_cache.get(key)
+            if markets is not None:
+                return markets
+            partition = "event_tickers" if "-" in term else "series_tickers"
+            async with semaphore:
+                response = await self._timed(
+                    kalshi_api.get_all_markets(
+                        self.api_key,
+                        status="open",
+                        max_concurrency=1,
+                        **{partition: [term]}
+                    )
+                )
+            if "error" in response:
+                return response
+            search_cache.set(key, response["markets"])
+            return response["markets"]
+
+        responses = await asyncio.gather(*(fetch(term) for term in terms))
+        markets = {}
+        errors = []
+        for response in responses:
+            if isinstance(response, dict):
+                errors.append(response["error"])
+                continue
+            for market in response:
+                markets[market["ticker"]] = market
+        if errors and len(errors) == len(responses):
+            return {"error": errors[0]}
+        return {"markets": [kalshi_market(market) for market in markets.values()]}
+
+    def create_feed(self, market_ids: list[str]):
+        from app.websocket_client import ShardedKalshiFeed
+
+        self.feed = ShardedKalshiFeed(self.api_key, market_ids)
+        self.feed.update_buffer.venue_stats = self.venue_stats
+        return self.feed
+
+    async def cancel_orders(self, order_ids: list[str]) -> dict:
+        response = await self._timed(
+            kalshi_api.batch_cancel_orders(self.api_key, order_ids)
+        )
+        if "error" in response:
+            return response
+        result = {"canceled": [], "gone": [], "retry": []}
+        for order in response.get("orders", []):
+            error = order.get("error")
+            if not error:
+                result["canceled"].append(order["order_id"])
+            elif error.get("code") == "not_found":
+                result["gone"].append(order["order_id"])
+            else:
+                result["retry"].append(order["order_id"])
+        return result
+
+    async def resting_order_ids(self) -> list[str] | dict:
+        order_ids = []
+        cursor = None
+        while True:
+            response = await self._timed(
+                kalshi_api.get_orders(self.api_key, status="resting", cursor=cursor)
+            )
+            if "error" in response:
+                return response
+            order_ids.extend(order["order_id"] for order in response.get("orders", []))
+            cursor = response.get("cursor")
+            if not cursor:
+                return order_ids
+
+    def _feed_stats(self) -> tuple[bool, int, int, float]:
+        shards = self.feed.shards
+        return (
+            any(shard.stats["connected"] for shard in shards),
+            sum(shard.stats["tickers"] for shard in shards),
+            sum(shard.stats["messages"] for shard in shards),
+            max(shard.stats["queue_lag_ms"] for shard in shards),
+        )
+
+
+class PolymarketAdapter(ExchangeAdapter):
+    venue = "polymarket"
+    cancel_batch_size = polymarket_api.CANCEL_BATCH_LIMIT
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.token_ids: dict[str, str] = {}
+
+    async def fetch_markets(self, series_tickers: list[str] | None = None) -> dict:
+        response = await self._timed(polymarket_api.get_all_markets())
+        if "error" in response:
+            return response
+        listing = [
+            normalized
+            for normalized in map(polymarket_market, response["markets"])
+            if normalized is not None
+        ]
+        search_cache.set((self.venue,), listing)
+        return self._select(listing, series_tickers)
+
+    async def search_markets(self, terms: list[str]) -> dict:
+        """Gamma has no series filter, so searches filter the last full
+        listing while it is in `search_cache`."""
+        listing = search_cache.get((self.venue,))
+        if listing is None:
+            return await self.fetch_markets(terms)
+        return self._select(listing, terms)
+
+    def _select(
+        self, listing: list[tuple[VenueMarket, str]], series: list[str] | None
+    ) -> dict:
+        """The listed markets in `series` (case-insensitive), all of them
+        when None, remembering their yes-token ids."""
+        wanted = {name.upper() for name in series} if series else None
+        markets = []
+        for market, token_id in listing:
+            if wanted and market["series"].upper() not in wanted:
+                continue
+            self.token_ids[market["market_id"]] = token_id
+            markets.append(market)
+        return {"markets": markets}
+
+    def create_feed(self, market_ids: list[str]):
+        from app.polymarket_feed import PolymarketFeed
+
+        self.feed = PolymarketFeed(self.api_key, market_ids, self.token_ids)
+        self.feed.update_buffer.venue_stats = self.venue_stats
+        return self.feed
+
+    async def cancel_orders(self, order_ids: list[str]) -> dict:
+        response = await self._timed(
+            polymarket_api.cancel_orders(self.api_key, order_ids)
+        )
+        if "error" in response:
+            return response
+        result = {
+            "canceled": list(response.get("canceled") or []),
+            "gone": [],
+            "retry": [],
+        }
+        for order_id, reason in (response.get("not_canceled") or {}).items():
+            gone = any(text in str(reason).lower() for text in GONE_REASONS)
+            result["gone" if gone else "retry"].append(order_id)
+        return result
+
+    async def resting_order_ids(self) -> list[str] | dict:
+        order_ids = []
+        cursor = None
+        while True:
+            response = await self._timed(
+                polymarket_api.get_open_orders(self.api_key, cursor)
+            )
+            if "error" in response:
+                return response
+            order_ids.extend(order["id"] for order in response.get("data", []))
+            cursor = response.get("next_cursor")
+            if not cursor or cursor == polymarket_api.END_CURSOR:
+                return order_ids
+
+    def _feed_stats(self) -> tuple[bool, int, int, float]:
+        handler = self.feed.handler
+        return (
+            self.feed.connected,
+            self.feed.market_count,
+            handler.messages,
+            handler.latency_ms,
+        )
+
+
+def adapters_for(
+    client_token: str, kalshi_api_key: str, polymarket_api_key: str
+) -> dict[str, ExchangeAdapter]:
+    """The session's adapters, reused across calls so token maps, feeds and
+    stats persist. Kalshi market data is public, so its adapter always
+    exists; Polymarket is only enabled once its key is set. An adapter whose
+    key changed is replaced unless its feed is running. Other sessions left
+    idle for `SESSION_IDLE_TTL` are dropped on the way."""
+    now = time.monotonic()
+    for token, used_at in list(_last_used.items()):
+        if now - used_at < SESSION_IDLE_TTL or any(
+            adapter.feed is not None
+            for adapter in exchange_adapters.get(token, {}).values()
+        ):
+            continue
+        exchange_adapters.pop(token, None)
+        del _last_used[token]
+    _last_used[client_token] = now
+    adapters = exchange_adapters.setdefault(client_token, {})
+    for adapter_type, api_key, required in (
+        (KalshiAdapter, kalshi_api_key, False),
+        (PolymarketAdapter, polymarket_api_key, True),
+    ):
+        adapter = adapters.get(adapter_type.venue)
+        if adapter is not None and (
+            adapter.feed is not None or adapter.api_key == api_key
+        ):
+            continue
+        if required and not api_key:
+            adapters.pop(adapter_type.venue, None)
+        else:
+            adapters[adapter_type.venue] = adapter_type(api_key)
+    return adapters
+
+
+def release_feeds(client_token: str):
+    """Detaches the session's feeds once its bot stops. The adapters stay,
+    with their Polymarket token ids for the next start, and their idle clock
+    starts now."""
+    for adapter in exchange_adapters.get(client_token, {}).values():
+        adapter.feed = None
+    _last_used[client_token] = time.monotonic()
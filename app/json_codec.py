@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+from collections.abc import Callable
+from typing import Any
+
+from app.models import OrderbookDeltaMessage, TickerMessage
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Fastest first. "msgspec-typed" validates the hot frames against their
+# schemas, which costs more than it saves on the dispatch, so it is opt-in.
+BACKEND_PREFERENCE = ("msgspec", "orjson", "msgspec-typed", "json")
+FRAME_HEAD = 32
+DEFAULT_BACKEND = os.getenv("KALSHI_JSON_BACKEND")
+
+
+def available_backends() -> list[str]:
+    installed = {
+        "msgspec": msgspec,
+        "orjson": orjson,
+        "msgspec-typed": msgspec,
+        "json": json,
+    }
+    return [name for name in BACKEND_PREFERENCE if installed[name] is not None]
+
+
+class JsonDecoder:
+    """Decodes REST bodies and websocket frames with one JSON backend.
+
+    `loads` returns plain Python objects. `decode_feed` returns the feed
+    envelope as a dict; with `msgspec-typed`, `ticker` and `orderbook_delta`
+    frames are decoded against the `TickerMessage` / `OrderbookDeltaMessage`
+    TypedDicts, so only the fields the handlers read are materialized and
+    their types are checked. Any other frame, or one that does not match
+    its schema, is decoded generically.
+    """
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.loads: Callable[[str | bytes], Any]
+        if backend == "msgspec":
+            self.loads = msgspec.json.Decoder().decode
+            self.decode_feed = self.loads
+        elif backend == "msgspec-typed":
+            self.loads = msgspec.json.Decoder().decode
+            self._delta = msgspec.json.Decoder(OrderbookDeltaMessage).decode
+            self._ticker = msgspec.json.Decoder(TickerMessage).decode
+            self.decode_feed = self._decode_feed_typed
+        elif backend == "orjson":
+            self.loads = orjson.loads
+            self.decode_feed = orjson.loads
+        elif backend == "json":
+            self.loads = json.loads
+            self.decode_feed = json.loads
+        else:
+            raise ValueError(f"Unknown JSON backend: {backend}")
+
+    def _decode_feed_typed(self, raw: str | bytes) -> dict:
+        # Kalshi sends "type" first, so only the head of the frame is
+        # searched rather than the whole (possibly long) body.
+        head = raw[:FRAME_HEAD]
+        if isinstance(raw, str):
+            delta_tag, ticker_tag = '"orderbook_delta"', '"ticker"'
+        else:
+            delta_tag, ticker_tag = b'"orderbook_delta"', b'"ticker"'
+        try:
+            if delta_tag in head:
+                data = self._delta(raw)
+                if data.get("type") == "orderbook_delta":
+                    return data
+            elif ticker_tag in head:
+                data = self._ticker(raw)
+                if data.get("type") == "ticker":
+                    return data
+        except msgspec.ValidationError:
+            pass
+        return self.loads(raw)
+
+
+def get_decoder(backend: str | None = None) -> JsonDecoder:
+    """Returns a decoder for `backend`, or for `KALSHI_JSON_BACKEND`, or for
+    the fastest installed backend."""
+    backend = backend or DEFAULT_BACKEND
+    available = available_backends()
+    if backend and backend not in available:
+        logger.warning(
+            f"JSON backend {backend} is not installed; using {available[0]}."
+        )
+        backend = None
+    return JsonDecoder(backend or available[0])
+
+
+decoder = get_decoder()
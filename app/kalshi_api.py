@@ -1,57 +1,433 @@
-import reflex as rx
-import httpx
-import os
+import asyncio
+import datetime
 import logging
+import os
+import time
 
+import httpx
+import reflex as rx
 
-async def get_markets(
-    api_key: str,
-    status: str = "open",
-    limit: int = 500,
-    series_ticker: str | None = None,
+from app import json_codec
+from app.cache import TTLCache
+from app.metrics import InstrumentedTransport, metrics
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://demo-api.kalshi.co"
+DEFAULT_TIMEOUT = httpx.Timeout(
+    float(os.getenv("KALSHI_HTTP_TIMEOUT", "10.0")),
+    connect=float(os.getenv("KALSHI_HTTP_CONNECT_TIMEOUT", "5.0")),
+)
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("KALSHI_HTTP_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("KALSHI_HTTP_MAX_KEEPALIVE", "10")),
+    keepalive_expiry=30.0,
+)
+DEFAULT_PAGE_CONCURRENCY = 4
+MAX_PAGE_LIMIT = 1000
+CLOSE_TIME_SPLITS_DAYS = (1, 7, 30, 90, 365)
+# First pages of `get_markets` are reused for RESPONSE_CACHE_TTL seconds;
+# ones that carried an ETag are kept ETAG_TTL seconds, for conditional
+# refetches.
+RESPONSE_CACHE_TTL = float(os.getenv("KALSHI_RESPONSE_CACHE_TTL", "2.0"))
+RESPONSE_CACHE_SIZE = int(os.getenv("KALSHI_RESPONSE_CACHE_SIZE", "512"))
+ETAG_TTL = 300.0
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_client_options: dict = {}
+# key -> (fresh until, ETag or None, body)
+_responses = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+_in_flight: dict[tuple, asyncio.Task] = {}
+_cache_results = {
+    result: metrics.counter(
+        "rest_cache_total",
+        "Cached REST reads by outcome.",
+        venue="kalshi",
+        result=result,
+    )
+    for result in ("hit", "coalesced", "not_modified", "miss")
+}
+
+
+def configure_client(
+    limits: httpx.Limits | None = None,
+    timeout: httpx.Timeout | None = None,
+    http2: bool | None = None,
+    base_url: str | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+):
+    """Sets connection limits, timeouts and transport for the pooled client.
+
+    Takes effect on the next request; the previous client is dropped so its
+    connections are released once in-flight requests finish.
+    """
+    global _client
+    _client_options.update(
+        {
+            key: value
+            for key, value in {
+                "limits": limits,
+                "timeout": timeout,
+                "http2": http2,
+                "base_url": base_url,
+                "transport": transport,
+            }.items()
+            if value is not None
+        }
+    )
+    _client = None
+    clear_response_cache()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared keep-alive client, creating it for the running loop.
+    Its transport records per-endpoint REST metrics."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        http2 = _client_options.get("http2", HTTP2_AVAILABLE) and HTTP2_AVAILABLE
+        transport = _client_options.get("transport") or httpx.AsyncHTTPTransport(
+            limits=_client_options.get("limits", DEFAULT_LIMITS), http2=http2
+        )
+        _client = httpx.AsyncClient(
+            base_url=_client_options.get("base_url", BASE_URL),
+            timeout=_client_options.get("timeout", DEFAULT_TIMEOUT),
+            transport=InstrumentedTransport(transport, "kalshi"),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    """Closes the shared client. Called from the app lifespan on shutdown."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def clear_response_cache():
+    _responses.clear()
+    _in_flight.clear()
+
+
+def response_cache_stats() -> dict:
+    """Outcomes of cached reads since start, and the cache's current size."""
+    stats = {result: counter.value for result, counter in _cache_results.items()}
+    stats["entries"] = len(_responses)
+    stats["evictions"] = _responses.evictions
+    return stats
+
+
+async def _get(api_key: str, path: str, params: dict) -> dict:
+    """GETs `path` without the response cache."""
+    try:
+        response = await get_client().get(
+            path, params=params, headers=_auth_headers(api_key)
+        )
+        response.raise_for_status()
+        return json_codec.decoder.loads(response.content)
+    except httpx.HTTPStatusError as e:
+        logger.exception("HTTP error occurred")
+        return {
+            "error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"
+        }
+    except Exception as e:
+        logger.exception("An unexpected error occurred")
+        return {"error": str(e)}
+
+
+async def _cached_get(api_key: str, path: str, params: dict) -> dict:
+    """GETs `path` through the response cache.
+
+    A response younger than `RESPONSE_CACHE_TTL` is returned as is; a call
+    identical to one in flight awaits that request instead of sending its
+    own. Otherwise the request carries `If-None-Match` when the stored
+    response had an ETag, and a 304 reuses that response's body. Error
+    dicts are never cached. Callers share the returned dict, so they must
+    not modify it.
+    """
+    key = (api_key, path, tuple(sorted(params.items())))
+    entry = _responses.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        _cache_results["hit"].inc()
+        return entry[2]
+    task = _in_flight.get(key)
+    if task is not None and task.get_loop() is asyncio.get_running_loop():
+        _cache_results["coalesced"].inc()
+    else:
+        task = asyncio.create_task(_conditional_get(api_key, path, params, key, entry))
+        _in_flight[key] = task
+
+        def forget(done: asyncio.Task):
+            if _in_flight.get(key) is done:
+                del _in_flight[key]
+
+        task.add_done_callback(forget)
+    # A cancelled caller must not cancel the request others are waiting on.
+    return await asyncio.shield(task)
+
+
+async def _conditional_get(
+    api_key: str, path: str, params: dict, key: tuple, entry: tuple | None
 ) -> dict:
-    """Fetches markets from the Kalshi API."""
-    base_url = "https://demo-api.kalshi.co"
-    path = f"/trade-api/v2/markets?status={status}&limit={limit}"
-    if series_ticker:
-        path += f"&series_ticker={series_ticker}"
-    headers = {}
-    if api_key and api_key.strip():
-        headers["Authorization"] = f"Bearer {api_key}"
+    headers = _auth_headers(api_key)
+    etag = entry[1] if entry is not None else None
+    if etag:
+        headers["If-None-Match"] = etag
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(base_url + path, headers=headers)
+        response = await get_client().get(path, params=params, headers=headers)
+        if response.status_code == 304 and etag:
+            _cache_results["not_modified"].inc()
+            data = entry[2]
+        else:
+            _cache_results["miss"].inc()
             response.raise_for_status()
-            return response.json()
+            data = json_codec.decoder.loads(response.content)
+            etag = response.headers.get("etag")
     except httpx.HTTPStatusError as e:
-        logging.exception(f"HTTP error occurred: {e}")
+        logger.exception("HTTP error occurred")
         return {
             "error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"
         }
     except Exception as e:
-        logging.exception(f"An unexpected error occurred: {e}")
+        logger.exception("An unexpected error occurred")
         return {"error": str(e)}
+    _responses.set(
+        key,
+        (time.monotonic() + RESPONSE_CACHE_TTL, etag, data),
+        ETAG_TTL if etag else RESPONSE_CACHE_TTL,
+    )
+    return data
 
 
-async def get_market(api_key: str, market_id: str) -> dict:
-    """Fetches a single market from the Kalshi API."""
-    base_url = "https://demo-api.kalshi.co"
-    path = f"/trade-api/v2/markets/{market_id}"
+def _auth_headers(api_key: str) -> dict:
     headers = {}
     if api_key and api_key.strip():
         headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+async def get_markets(
+    api_key: str,
+    status: str = "open",
+    limit: int = 500,
+    series_ticker: str | None = None,
+    event_ticker: str | None = None,
+    cursor: str | None = None,
+    min_close_ts: int | None = None,
+    max_close_ts: int | None = None,
+    tickers: list[str] | None = None,
+) -> dict:
+    """Fetches markets from the Kalshi API. `status=None` matches every
+    status; `tickers` restricts the page to those markets. Identical calls
+    for a first page share one request and its response for
+    `RESPONSE_CACHE_TTL` seconds; pages further down a cursor chain are
+    always fetched, as they are rarely requested twice."""
+    params = {"limit": limit}
+    if status:
+        params["status"] = status
+    if tickers:
+        params["tickers"] = ",".join(tickers)
+    if series_ticker:
+        params["series_ticker"] = series_ticker
+    if event_ticker:
+        params["event_ticker"] = event_ticker
+    if cursor:
+        params["cursor"] = cursor
+    if min_close_ts is not None:
+        params["min_close_ts"] = min_close_ts
+    if max_close_ts is not None:
+        params["max_close_ts"] = max_close_ts
+    if cursor:
+        return await _get(api_key, "/trade-api/v2/markets", params)
+    return await _cached_get(api_key, "/trade-api/v2/markets", params)
+
+
+async def get_market(api_key: str, market_id: str) -> dict:
+    """Fetches a single market from the Kalshi API."""
+    path = f"/trade-api/v2/markets/{market_id}"
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(base_url + path, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        response = await get_client().get(path, headers=_auth_headers(api_key))
+        response.raise_for_status()
+        return json_codec.decoder.loads(response.content)
     except httpx.HTTPStatusError as e:
-        logging.exception(f"HTTP error occurred while fetching market {market_id}: {e}")
+        logger.exception(f"HTTP error occurred while fetching market {market_id}")
         return {
             "error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"
         }
     except Exception as e:
-        logging.exception(
-            f"An unexpected error occurred while fetching market {market_id}: {e}"
+        logger.exception(
+            f"An unexpected error occurred while fetching market {market_id}"
         )
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+def _close_time_windows() -> list[tuple[int | None, int | None]]:
+    """Splits the close-time axis into disjoint windows, open-ended at both
+    ends, so each window can be paginated independently. The bounds are
+    counted from the start of the UTC day, so repeated sweeps send the same
+    requests and can share cached responses."""
+    today = datetime.datetime.now(datetime.UTC).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    bounds = [
+        int((today + datetime.timedelta(days=days)).timestamp())
+        for days in CLOSE_TIME_SPLITS_DAYS
+    ]
+    lows = [None] + bounds
+    highs = bounds + [None]
+    return list(zip(lows, highs))
+
+
+async def get_all_markets(
+    api_key: str,
+    status: str = "open",
+    series_tickers: list[str] | None = None,
+    page_limit: int = MAX_PAGE_LIMIT,
+    max_concurrency: int = DEFAULT_PAGE_CONCURRENCY,
+    event_tickers: list[str] | None = None,
+) -> dict:
+    """Fetches every market matching `status`, following `cursor` pagination.
+
+    A single cursor chain can only be walked one page at a time, so the
+    universe is partitioned (by series and event when `series_tickers` or
+    `event_tickers` are given, otherwise by close-time window) and the
+    partitions are walked concurrently, at most `max_concurrency` requests
+    in flight.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    if series_tickers or event_tickers:
+        partitions = [{"series_ticker": ticker} for ticker in series_tickers or []]
+        partitions += [{"event_ticker": ticker} for ticker in event_tickers or []]
+    else:
+        partitions = [
+            {"min_close_ts": low, "max_close_ts": high}
+            for low, high in _close_time_windows()
+        ]
+
+    async def walk(partition: dict) -> list[dict]:
+        results = []
+        cursor = None
+        while True:
+            async with semaphore:
+                page = await get_markets(
+                    api_key,
+                    status=status,
+                    limit=page_limit,
+                    cursor=cursor,
+                    **partition,
+                )
+            if "error" in page:
+                raise RuntimeError(page["error"])
+            results.extend(page.get("markets", []))
+            cursor = page.get("cursor")
+            if not cursor or not page.get("markets"):
+                return results
+
+    try:
+        pages = await asyncio.gather(*(walk(partition) for partition in partitions))
+    except RuntimeError as e:
+        return {"error": str(e)}
+    markets = {}
+    for page in pages:
+        for market in page:
+            markets[market["ticker"]] = market
+    return {"markets": list(markets.values())}
+
+
+BATCH_ORDER_LIMIT = 20
+
+
+async def _portfolio_request(
+    api_key: str, method: str, path: str, description: str, **kwargs
+) -> dict:
+    """Sends an authenticated portfolio request, returning the decoded body
+    or an `{"error": ...}` dict like the market calls."""
+    try:
+        response = await get_client().request(
+            method,
+            f"/trade-api/v2/portfolio{path}",
+            headers=_auth_headers(api_key),
+            **kwargs,
+        )
+        response.raise_for_status()
+        return json_codec.decoder.loads(response.content) if response.content else {}
+    except httpx.HTTPStatusError as e:
+        logger.exception(f"HTTP error occurred while {description}")
+        return {
+            "error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}",
+            "status_code": e.response.status_code,
+        }
+    except Exception as e:
+        logger.exception(f"An unexpected error occurred while {description}")
+        return {"error": str(e)}
+
+
+async def batch_create_orders(api_key: str, orders: list[dict]) -> dict:
+    """Places up to `BATCH_ORDER_LIMIT` orders in one request."""
+    return await _portfolio_request(
+        api_key,
+        "POST",
+        "/orders/batched",
+        "creating orders",
+        json={"orders": orders},
+    )
+
+
+async def batch_cancel_orders(api_key: str, order_ids: list[str]) -> dict:
+    """Cancels up to `BATCH_ORDER_LIMIT` orders in one request."""
+    return await _portfolio_request(
+        api_key,
+        "DELETE",
+        "/orders/batched",
+        "canceling orders",
+        json={"ids": order_ids},
+    )
+
+
+async def amend_order(api_key: str, order_id: str, fields: dict) -> dict:
+    """Changes the price and/or size of a resting order in place."""
+    return await _portfolio_request(
+        api_key,
+        "POST",
+        f"/orders/{order_id}/amend",
+        f"amending order {order_id}",
+        json=fields,
+    )
+
+
+async def get_fills(
+    api_key: str, min_ts: int | None = None, cursor: str | None = None
+) -> dict:
+    """Fetches one page of the account's fills."""
+    params = {"limit": 1000}
+    if min_ts is not None:
+        params["min_ts"] = min_ts
+    if cursor:
+        params["cursor"] = cursor
+    return await _portfolio_request(
+        api_key, "GET", "/fills", "fetching fills", params=params
+    )
+
+
+async def get_orders(
+    api_key: str, status: str | None = None, cursor: str | None = None
+) -> dict:
+    """Fetches one page of the account's orders."""
+    params = {"limit": 1000}
+    if status:
+        params["status"] = status
+    if cursor:
+        params["cursor"] = cursor
+    return await _portfolio_request(
+        api_key, "GET", "/orders", "fetching orders", params=params
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import random
+import time
+
+from app.exchanges import ExchangeAdapter, KalshiAdapter
+from app.models import KillSwitchReport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05
+TARGET_MS = 1000.0
+
+
+class _Tally:
+    def __init__(self):
+        self.canceled = 0
+        self.already_gone = 0
+        self.failed: list[str] = []
+        self.requests = 0
+        self.retries = 0
+        self.listing_failed = 0
+        self.last_ack: float | None = None
+
+
+async def _cancel_chunk(
+    exchange: ExchangeAdapter,
+    order_ids: list[str],
+    semaphore: asyncio.Semaphore,
+    max_attempts: int,
+    tally: _Tally,
+):
+    """Cancels one batch, retrying whatever the exchange did not confirm
+    with jittered exponential backoff."""
+    remaining = order_ids
+    for attempt in range(max_attempts):
+        if attempt:
+            tally.retries += 1
+            await asyncio.sleep(
+                RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+            )
+        async with semaphore:
+            tally.requests += 1
+            response = await exchange.cancel_orders(remaining)
+        if "error" in response:
+            continue
+        tally.last_ack = time.monotonic()
+        tally.canceled += len(response["canceled"])
+        tally.already_gone += len(response["gone"])
+        if not response["retry"]:
+            return
+        remaining = response["retry"]
+    tally.failed.extend(remaining)
+
+
+async def mass_cancel(
+    exchange: ExchangeAdapter,
+    order_ids: list[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    tally: _Tally | None = None,
+) -> _Tally:
+    """Cancels `order_ids` in batches of the venue's `cancel_batch_size`, at
+    most `concurrency` requests in flight. The ids still not cancelled after
+    `max_attempts` are left in the returned tally's `failed`."""
+    tally = tally or _Tally()
+    semaphore = asyncio.Semaphore(concurrency)
+    size = exchange.cancel_batch_size
+    await asyncio.gather(
+        *(
+            _cancel_chunk(
+                exchange,
+                order_ids[i : i + size],
+                semaphore,
+                max_attempts,
+                tally,
+            )
+            for i in range(0, len(order_ids), size)
+        )
+    )
+    return tally
+
+
+async def _resting_order_ids(exchange: ExchangeAdapter, tally: _Tally) -> list[str]:
+    """The account's resting order ids. A failed listing is counted in
+    `tally`, since orders the panel did not know about may still rest."""
+    response = await exchange.resting_order_ids()
+    if isinstance(response, dict):
+        logger.error(
+            f"Kill switch could not list resting {exchange.venue} orders: {response}"
+        )
+        tally.listing_failed += 1
+        return []
+    return response
+
+
+async def cancel_everything(
+    api_key: str,
+    known_order_ids: list[str],
+    pressed_at: float,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    exchange: ExchangeAdapter | None = None,
+) -> tuple[KillSwitchReport, list[str]]:
+    """Cancels every order the panel knows about and, in parallel, lists the
+    account's resting orders so any the panel did not know about are
+    cancelled too. `exchange` defaults to Kalshi with `api_key`.
+
+    Returns the report and the ids of the orders still not cancelled after
+    every retry, which may still be live. `pressed_at` is the
+    `time.monotonic()` of the button press; the report's `elapsed_ms` runs
+    from it to the last cancel acknowledgement, and is 0 when nothing was
+    acknowledged. `listing_failed` counts venues whose resting orders could
+    not be listed.
+    """
+    exchange = exchange or KalshiAdapter(api_key)
+    tally = _Tally()
+    listing = asyncio.create_task(_resting_order_ids(exchange, tally))
+    await mass_cancel(exchange, known_order_ids, concurrency, max_attempts, tally)
+    known = set(known_order_ids)
+    unknown = [order_id for order_id in await listing if order_id not in known]
+    if unknown:
+        await mass_cancel(exchange, unknown, concurrency, max_attempts, tally)
+    report = KillSwitchReport(
+        requested=len(known_order_ids) + len(unknown),
+        canceled=tally.canceled,
+        already_gone=tally.already_gone,
+        failed=len(tally.failed),
+        listing_failed=tally.listing_failed,
+        requests=tally.requests,
+        retries=tally.retries,
+        elapsed_ms=(
+            round((tally.last_ack - pressed_at) * 1000.0, 1)
+            if tally.last_ack is not None
+            else 0.0
+        ),
+    )
+    return report, tally.failed
+
+
+def merge_reports(reports: list[KillSwitchReport]) -> KillSwitchReport:
+    """Sums per-venue reports; the elapsed time is the slowest venue's."""
+    merged = KillSwitchReport(
+        requested=0,
+        canceled=0,
+        already_gone=0,
+        failed=0,
+        listing_failed=0,
+        requests=0,
+        retries=0,
+        elapsed_ms=0.0,
+    )
+    for report in reports:
+        for key in merged:
+            if key == "elapsed_ms":
+                merged[key] = max(merged[key], report[key])
+            else:
+                merged[key] += report[key]
+    return merged
@@ -0,0 +1,268 @@
+import asyncio
+import bisect
+import logging
+import math
+import os
+import sqlite3
+import time
+import weakref
+
+import numpy as np
+
+from app.market_store import PARAM_FIELDS, MarketStore
+from app.price_history import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv("MARKET_CACHE_PATH", "cache/markets.sqlite3")
+WRITE_INTERVAL = 2.0
+# Price points older than this are pruned and not restored.
+PRICE_RETENTION = 7 * 24 * 60 * 60
+CACHED_FIELDS = (
+    "best_bid",
+    "best_ask",
+    "total_volume",
+    "quoting_active",
+    "inventory",
+    "avg_cost",
+    "realized_pnl",
+) + PARAM_FIELDS
+_BOOL_FIELDS = {"quoting_active", "enabled"}
+_META_FIELDS = ("market_id", "ticker", "venue", "series", "description")
+_COLUMNS = _META_FIELDS + CACHED_FIELDS
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS markets (
+    market_id TEXT PRIMARY KEY, {", ".join(_COLUMNS[1:])}
+);
+CREATE TABLE IF NOT EXISTS prices (market_id TEXT, ts REAL, price REAL);
+CREATE INDEX IF NOT EXISTS prices_by_market ON prices (market_id, ts);
+CREATE INDEX IF NOT EXISTS prices_by_ts ON prices (ts);
+"""
+_UPSERT = (
+    f"INSERT OR REPLACE INTO markets ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_COLUMNS))})"
+)
+
+
+def _sql_values(column: np.ndarray) -> list:
+    """Column values as SQLite parameters, with NaN as NULL."""
+    values = column.tolist()
+    if column.dtype.kind == "f":
+        return [None if math.isnan(value) else value for value in values]
+    return values
+
+
+class _Tracked:
+    """What the writer knows about one session's store: its price histories
+    and the copy of its rows last written."""
+
+    def __init__(self, price_histories: dict[str, PriceHistory]):
+        self.histories = price_histories
+        self.dirty = True
+        self.previous: tuple[list, dict] | None = None
+
+
+class MarketCache:
+    """Process-wide SQLite snapshot of the market universe, strategy params,
+    quoting flags, positions and recent price history, so a restarted panel
+    renders from disk before the first API fetch returns.
+
+    Every session's store is tracked separately. `mark_dirty` is O(1) and
+    only flags the store. While `run_writer` is running it wakes at most
+    every `interval` seconds and, for each flagged store, copies the cached
+    columns in the event loop and, in a worker thread, writes only the rows
+    that differ from that store's previous copy and appends its new price
+    points, in one transaction. A price point is appended once, by the
+    first store to hold it. Rows are removed only through `retire`, so one
+    session never deletes markets another still shows.
+    """
+
+    def __init__(self, path: str | None = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.writes = 0
+        self.rows_written = 0
+        self._stores: weakref.WeakKeyDictionary[MarketStore, _Tracked] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._retired: set[str] = set()
+        self._dirty: asyncio.Event | None = None
+        self._connection: sqlite3.Connection | None = None
+        self._saved_ts: dict[str, float] = {}
+
+    def mark_dirty(
+        self, markets: MarketStore, price_histories: dict[str, PriceHistory]
+    ):
+        tracked = self._stores.get(markets)
+        if tracked is None:
+            tracked = self._stores[markets] = _Tracked(price_histories)
+        tracked.histories = price_histories
+        tracked.dirty = True
+        if self._dirty is not None:
+            self._dirty.set()
+
+    def retire(self, market_ids: list[str]):
+        """Deletes the markets and their price points on the next write."""
+        self._retired.update(market_ids)
+        for market_id in market_ids:
+            self._saved_ts.pop(market_id, None)
+        if self._dirty is not None:
+            self._dirty.set()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def load(self) -> tuple[list[dict], dict[str, list[tuple[float, float]]]]:
+        """Reads the cached markets and their recent price points. Blocking;
+        run it in a thread."""
+        if not self.path or not os.path.exists(self.path):
+            return [], {}
+        try:
+            connection = self._connect()
+            try:
+                cursor = connection.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM markets"
+                )
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor]
+                prices: dict[str, list[tuple[float, float]]] = {}
+                for market_id, ts, price in connection.execute(
+                    "SELECT market_id, ts, price FROM prices WHERE ts >= ? "
+                    "ORDER BY market_id, ts",
+                    (time.time() - PRICE_RETENTION,),
+                ):
+                    prices.setdefault(market_id, []).append((ts, price))
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            logger.exception("Failed to read market cache")
+            return [], {}
+        for row in rows:
+            for field in _BOOL_FIELDS:
+                row[field] = bool(row[field])
+        for market_id, points in prices.items():
+            self._saved_ts[market_id] = max(
+                self._saved_ts.get(market_id, 0.0), points[-1][0]
+            )
+        return rows, prices
+
+    async def run_writer(self, interval: float = WRITE_INTERVAL):
+        """Writes changed markets every `interval` seconds while anything is
+        dirty. Runs until cancelled, then writes what is left."""
+        self._dirty = asyncio.Event()
+        if self._retired or any(tracked.dirty for tracked in self._stores.values()):
+            self._dirty.set()
+        try:
+            while True:
+                await self._dirty.wait()
+                await asyncio.sleep(interval)
+                self._dirty.clear()
+                await asyncio.to_thread(self._write, *self._capture())
+        finally:
+            dirty, self._dirty = self._dirty, None
+            if dirty.is_set():
+                self._write(*self._capture())
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _capture(self) -> tuple[list[tuple[_Tracked, list, dict, list]], list[str]]:
+        """Copies the rows and new price points of every store marked dirty
+        since its last write, and the pending retirements, in the event
+        loop, so the thread never reads live state."""
+        captured = []
+        for markets, tracked in list(self._stores.items()):
+            if not tracked.dirty:
+                continue
+            tracked.dirty = False
+            rows, columns = markets.export(CACHED_FIELDS)
+            points = []
+            for market_id, history in tracked.histories.items():
+                last = history.last()
+                saved = self._saved_ts.get(market_id, 0.0)
+                if last is None or last[0] <= saved:
+                    continue
+                timestamps, prices = history.columns()
+                start = bisect.bisect_right(timestamps, saved)
+                points.extend(
+                    (market_id, ts, price)
+                    for ts, price in zip(timestamps[start:], prices[start:])
+                )
+                self._saved_ts[market_id] = last[0]
+            captured.append((tracked, rows, columns, points))
+        retired, self._retired = list(self._retired), set()
+        return captured, retired
+
+    def _write(
+        self, captured: list[tuple[_Tracked, list, dict, list]], retired: list[str]
+    ):
+        if not self.path:
+            return
+        records, points = [], []
+        for tracked, rows, columns, store_points in captured:
+            changed = self._changed_rows(tracked, rows, columns)
+            values = {
+                field: _sql_values(columns[field][changed]) for field in CACHED_FIELDS
+            }
+            records.extend(
+                rows[row] + tuple(values[field][i] for field in CACHED_FIELDS)
+                for i, row in enumerate(changed.tolist())
+            )
+            points.extend(store_points)
+        try:
+            if self._connection is None:
+                self._connection = self._connect()
+            with self._connection as connection:
+                connection.executemany(
+                    "DELETE FROM markets WHERE market_id = ?",
+                    [(market_id,) for market_id in retired],
+                )
+                connection.executemany(
+                    "DELETE FROM prices WHERE market_id = ?",
+                    [(market_id,) for market_id in retired],
+                )
+                connection.executemany(_UPSERT, records)
+                connection.executemany(
+                    "INSERT INTO prices (market_id, ts, price) VALUES (?, ?, ?)",
+                    points,
+                )
+                connection.execute(
+                    "DELETE FROM prices WHERE ts < ?", (time.time() - PRICE_RETENTION,)
+                )
+        except sqlite3.Error:
+            logger.exception("Failed to write market cache")
+            for tracked, *_ in captured:
+                tracked.previous = None
+            self._retired.update(retired)
+            return
+        for tracked, rows, columns, _ in captured:
+            tracked.previous = (rows, columns)
+        self.writes += 1
+        self.rows_written += len(records)
+
+    def _changed_rows(self, tracked: _Tracked, rows: list, columns: dict) -> np.ndarray:
+        """Rows whose identity or any cached column differs from the copy
+        last written for this store; every live row when there is none."""
+        live = np.fromiter(
+            (row is not None for row in rows), dtype=bool, count=len(rows)
+        )
+        if tracked.previous is None:
+            return np.flatnonzero(live)
+        old_rows, old_columns = tracked.previous
+        shared = min(len(rows), len(old_rows))
+        changed = np.ones(len(rows), dtype=bool)
+        changed[:shared] = [rows[row] != old_rows[row] for row in range(shared)]
+        for field in CACHED_FIELDS:
+            new, old = columns[field][:shared], old_columns[field][:shared]
+            differs = new != old
+            if new.dtype.kind == "f":
+                differs &= ~(np.isnan(new) & np.isnan(old))
+            changed[:shared] |= differs
+        return np.flatnonzero(changed & live)
+
+
+market_cache = MarketCache()
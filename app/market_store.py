@@ -0,0 +1,315 @@
+import math
+import sys
+
+import numpy as np
+
+from app.models import Market, StrategyParams
+
+INITIAL_CAPACITY = 1024
+
+# Numeric fields of `Market` (and its `strategy_params`) kept as NumPy
+# columns. Optional fields are float columns with NaN standing for None.
+COLUMNS = {
+    "best_bid": np.float64,
+    "best_ask": np.float64,
+    "my_bid_price": np.float64,
+    "my_bid_size": np.float64,
+    "my_ask_price": np.float64,
+    "my_ask_size": np.float64,
+    "inventory": np.int64,
+    "avg_cost": np.float64,
+    "unrealized_pnl": np.float64,
+    "realized_pnl": np.float64,
+    "quoting_active": np.bool_,
+    "total_volume": np.int64,
+    "target_spread_bps": np.int64,
+    "max_inventory": np.int64,
+    "base_quote_size": np.int64,
+    "skew": np.float64,
+    "enabled": np.bool_,
+}
+OPTIONAL_FIELDS = {
+    "best_bid",
+    "best_ask",
+    "my_bid_price",
+    "my_bid_size",
+    "my_ask_price",
+    "my_ask_size",
+}
+INT_FIELDS = {"my_bid_size", "my_ask_size"}
+PARAM_FIELDS = tuple(StrategyParams.__annotations__)
+_DEFAULTS = {field: (np.nan if field in OPTIONAL_FIELDS else 0) for field in COLUMNS}
+
+
+def _to_python(field: str, value):
+    if field in OPTIONAL_FIELDS:
+        if math.isnan(value):
+            return None
+        return int(value) if field in INT_FIELDS else value
+    return value
+
+
+class MarketStore:
+    """Columnar store for the market universe.
+
+    Each market owns a row; its numeric fields live in one NumPy column per
+    field, so a market costs a few dozen bytes of numbers instead of two
+    dicts, and bulk passes (quoting, sorting) read whole columns. Ticker ids
+    are interned and map to rows through `_rows`, whose insertion order is
+    the market order. Venue and series names are interned too and, like
+    descriptions, kept in plain lists by row. The rarely populated
+    `order_book` and `recent_trades` lists are kept per id only for the
+    markets that have them.
+
+    `Market` dicts are built on demand by `materialize`, only for the rows
+    the UI shows. Writes go through `set` / `update`, which report whether
+    anything changed; the store is not a Reflex-tracked type, so state code
+    calls `BotState._touch_markets` after writing.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._rows: dict[str, int] = {}
+        self._ids: list[str | None] = []
+        self._tickers: list[str | None] = []
+        self._venues: list[str | None] = []
+        self._series: list[str | None] = []
+        self._descriptions: list[str | None] = []
+        self._free: list[int] = []
+        self._columns = {
+            field: np.full(capacity, _DEFAULTS[field], dtype=dtype)
+            for field, dtype in COLUMNS.items()
+        }
+        self._order_books: dict[str, list] = {}
+        self._recent_trades: dict[str, list] = {}
+        self._series_counts: dict[str, int] = {}
+        # Bumped whenever a series gains its first or loses its last market.
+        self.series_epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, market_id: str) -> bool:
+        return market_id in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __getitem__(self, market_id: str) -> Market:
+        return self.materialize(market_id)
+
+    def ids(self) -> list[str]:
+        return list(self._rows)
+
+    def add(
+        self,
+        market_id: str,
+        ticker: str,
+        description: str,
+        fields: dict,
+        strategy_params: StrategyParams,
+        venue: str = "kalshi",
+        series: str = "",
+    ):
+        """Inserts a market with its exchange fields and strategy params;
+        the operator fields start cleared."""
+        market_id = sys.intern(market_id)
+        if self._free:
+            row = self._free.pop()
+            self._ids[row] = market_id
+            self._tickers[row] = sys.intern(ticker)
+            self._venues[row] = sys.intern(venue)
+            self._series[row] = sys.intern(series)
+            self._descriptions[row] = description
+        else:
+            row = len(self._ids)
+            if row == len(self._columns["best_bid"]):
+                self._grow()
+            self._ids.append(market_id)
+            self._tickers.append(sys.intern(ticker))
+            self._venues.append(sys.intern(venue))
+            self._series.append(sys.intern(series))
+            self._descriptions.append(description)
+        self._rows[market_id] = row
+        if series not in self._series_counts:
+            self._series_counts[series] = 0
+            self.series_epoch += 1
+        self._series_counts[series] += 1
+        self.update(market_id, fields)
+        self.update(market_id, strategy_params)
+
+    def remove(self, market_id: str):
+        row = self._rows.pop(market_id)
+        for field, column in self._columns.items():
+            column[row] = _DEFAULTS[field]
+        series = self._series[row]
+        if self._series_counts[series] > 1:
+            self._series_counts[series] -= 1
+        else:
+            del self._series_counts[series]
+            self.series_epoch += 1
+        self._ids[row] = None
+        self._tickers[row] = None
+        self._venues[row] = None
+        self._series[row] = None
+        self._descriptions[row] = None
+        self._order_books.pop(market_id, None)
+        self._recent_trades.pop(market_id, None)
+        self._free.append(row)
+
+    def _grow(self):
+        for field, column in self._columns.items():
+            grown = np.full(len(column) * 2, _DEFAULTS[field], dtype=column.dtype)
+            grown[: len(column)] = column
+            self._columns[field] = grown
+
+    def get(self, market_id: str, field: str):
+        """One field of one market, as the `Market` dict would hold it."""
+        row = self._rows[market_id]
+        if field in self._columns:
+            return _to_python(field, self._columns[field].item(row))
+        if field == "description":
+            return self._descriptions[row]
+        if field == "ticker":
+            return self._tickers[row]
+        if field == "venue":
+            return self._venues[row]
+        if field == "series":
+            return self._series[row]
+        if field == "market_id":
+            return market_id
+        if field == "order_book":
+            return self._order_books.get(market_id, [])
+        if field == "recent_trades":
+            return self._recent_trades.get(market_id, [])
+        if field == "strategy_params":
+            return self.strategy_params(market_id)
+        raise KeyError(field)
+
+    def set(self, market_id: str, field: str, value) -> bool:
+        """Writes one field and returns whether its value changed."""
+        row = self._rows[market_id]
+        column = self._columns.get(field)
+        if column is not None:
+            if value is None:
+                value = np.nan
+            old = column.item(row)
+            if old == value or (math.isnan(old) and math.isnan(value)):
+                return False
+            column[row] = value
+            return True
+        if field == "description":
+            if self._descriptions[row] == value:
+                return False
+            self._descriptions[row] = value
+            return True
+        if field in ("order_book", "recent_trades"):
+            lists = self._order_books if field == "order_book" else self._recent_trades
+            if lists.get(market_id, []) == value:
+                return False
+            if value:
+                lists[market_id] = value
+            else:
+                lists.pop(market_id, None)
+            return True
+        if field == "strategy_params":
+            return self.update(market_id, value)
+        raise KeyError(field)
+
+    def update(self, market_id: str, fields: dict) -> bool:
+        """Writes several fields and returns whether any of them changed."""
+        changed = False
+        for field, value in fields.items():
+            changed |= self.set(market_id, field, value)
+        return changed
+
+    def update_many(self, market_ids: list[str], fields: dict) -> list[str]:
+        """Writes the same column `fields` to every market in `market_ids`
+        with one vectorized assignment per field, and returns the ids whose
+        values changed."""
+        rows = self.rows(market_ids)
+        changed = np.zeros(len(rows), dtype=bool)
+        for field, value in fields.items():
+            column = self._columns[field]
+            changed |= column[rows] != value
+            column[rows] = value
+        return [market_ids[i] for i in np.flatnonzero(changed).tolist()]
+
+    def strategy_params(self, market_id: str) -> StrategyParams:
+        row = self._rows[market_id]
+        return StrategyParams(
+            **{field: self._columns[field].item(row) for field in PARAM_FIELDS}
+        )
+
+    def materialize(self, market_id: str) -> Market:
+        """Builds the `Market` dict for one row."""
+        row = self._rows[market_id]
+        fields = {
+            field: _to_python(field, column.item(row))
+            for field, column in self._columns.items()
+            if field not in PARAM_FIELDS
+        }
+        return Market(
+            market_id=market_id,
+            ticker=self._tickers[row],
+            venue=self._venues[row],
+            series=self._series[row],
+            description=self._descriptions[row],
+            strategy_params=self.strategy_params(market_id),
+            order_book=self._order_books.get(market_id, []),
+            recent_trades=self._recent_trades.get(market_id, []),
+            **fields,
+        )
+
+    def export(
+        self, fields: tuple[str, ...]
+    ) -> tuple[list[tuple | None], dict[str, np.ndarray]]:
+        """A point-in-time copy of every row: (id, ticker, venue, series,
+        description) by row, None for free rows, and copies of the columns
+        in `fields` trimmed to the same length."""
+        rows = list(
+            zip(
+                self._ids, self._tickers, self._venues, self._series, self._descriptions
+            )
+        )
+        rows = [row if row[0] is not None else None for row in rows]
+        columns = {field: self._columns[field][: len(rows)].copy() for field in fields}
+        return rows, columns
+
+    def series_names(self) -> list[str]:
+        return sorted(series for series in self._series_counts if series)
+
+    def series_size(self, series: str) -> int:
+        return self._series_counts.get(series, 0)
+
+    def ids_in_series(self, series: str) -> list[str]:
+        """The ids of the markets in `series`, in row order."""
+        if series not in self._series_counts:
+            return []
+        return [
+            market_id
+            for market_id, row_series in zip(self._ids, self._series)
+            if row_series == series and market_id is not None
+        ]
+
+    def rows(self, market_ids: list[str]) -> np.ndarray:
+        rows = self._rows
+        return np.fromiter(
+            (rows[market_id] for market_id in market_ids),
+            dtype=np.intp,
+            count=len(market_ids),
+        )
+
+    def column(self, field: str) -> np.ndarray:
+        """The live column for `field`, indexed by row. Free rows hold the
+        field's default."""
+        return self._columns[field]
+
+    def ids_where(self, mask: np.ndarray) -> list[str]:
+        """The ids of the rows where the column-shaped `mask` is set, in
+        row order."""
+        ids = self._ids
+        return [
+            ids[row]
+            for row in np.flatnonzero(mask[: len(ids)]).tolist()
+            if ids[row] is not None
+        ]
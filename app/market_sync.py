@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+from app import kalshi_api
+from app.exchanges import kalshi_market
+
+QUIET_AFTER = 60.0
+MAX_QUIET_BACKOFF = 960.0
+SWEEP_INTERVAL = 15.0
+SWEEP_BATCH_SIZE = 100
+MAX_SWEEP_TICKERS = 2000
+REQUEST_SPACING = 0.25
+
+
+class ReconciliationSweep:
+    """Low-priority REST backstop for the Kalshi websocket feed.
+
+    The feed is the primary source of prices. Every `interval` seconds this
+    refetches, one small request at a time, only the markets the feed has
+    been silent on for `quiet_after` seconds or whose shard is disconnected,
+    and merges them through `BotState._reconcile_markets` so closed markets
+    are retired.
+
+    A market the feed stays silent on is swept again after twice the wait
+    of its previous sweep, from `quiet_after` up to `max_backoff`, so a
+    universe of quiet markets settles to a trickle of requests instead of
+    being re-polled every `quiet_after`. The wait resets when the feed
+    updates the market. Markets on a disconnected shard are swept every
+    `interval` regardless.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        feed,
+        quiet_after: float = QUIET_AFTER,
+        max_backoff: float = MAX_QUIET_BACKOFF,
+        interval: float = SWEEP_INTERVAL,
+        batch_size: int = SWEEP_BATCH_SIZE,
+        max_tickers: int = MAX_SWEEP_TICKERS,
+        request_spacing: float = REQUEST_SPACING,
+    ):
+        self.api_key = api_key
+        self.feed = feed
+        self.quiet_after = quiet_after
+        self.max_backoff = max_backoff
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_tickers = max_tickers
+        self.request_spacing = request_spacing
+        self.started = time.monotonic()
+        self.sweeps = 0
+        self.requests = 0
+        self.refreshed = 0
+        # ticker -> (time of its last sweep, wait before the next one)
+        self._backoff: dict[str, tuple[float, float]] = {}
+
+    def due_tickers(self, tickers, now: float) -> list[str]:
+        """The tickers needing a REST refresh, longest overdue first, at most
+        `max_tickers`."""
+        last_seen = self.feed.update_buffer.last_seen
+        backoff = self._backoff
+        due = []
+        for ticker in tickers:
+            seen = last_seen.get(ticker, self.started)
+            swept_at, wait = backoff.get(ticker, (seen, self.quiet_after))
+            if seen > swept_at:
+                # The feed updated the market since its last sweep.
+                del backoff[ticker]
+                swept_at, wait = seen, self.quiet_after
+            due_at = swept_at + wait
+            if due_at <= now or not self.feed.shard_for(ticker).stats["connected"]:
+                due.append((due_at, ticker))
+        due.sort()
+        return [ticker for _, ticker in due[: self.max_tickers]]
+
+    async def sweep(self, state) -> int:
+        """Runs one sweep and returns the number of markets refetched."""
+        async with state:
+            markets = state._plain_markets()
+            tickers = [
+                ticker for ticker in markets if markets.get(ticker, "venue") == "kalshi"
+            ]
+        for ticker in self._backoff.keys() - set(tickers):
+            del self._backoff[ticker]
+        due = self.due_tickers(tickers, time.monotonic())
+        if not due:
+            return 0
+        self.sweeps += 1
+        last_seen = self.feed.update_buffer.last_seen
+        raw_markets = []
+        for i in range(0, len(due), self.batch_size):
+            if i:
+                await asyncio.sleep(self.request_spacing)
+            batch = due[i : i + self.batch_size]
+            self.requests += 1
+            response = await kalshi_api.get_markets(
+                self.api_key, status=None, limit=len(batch), tickers=batch
+            )
+            if "error" in response:
+                self.feed.update_buffer.log(
+                    "warning", f"Reconciliation sweep failed: {response['error']}"
+                )
+                break
+            fetched = [kalshi_market(market) for market in response.get("markets", [])]
+            raw_markets.extend(fetched)
+            now = time.monotonic()
+            # Only the markets that came back are confirmed current; the
+            # missing ones back off like quiet ones without being marked seen.
+            for market in fetched:
+                last_seen[market["market_id"]] = now
+            for ticker in batch:
+                _, wait = self._backoff.get(ticker, (now, self.quiet_after))
+                self._backoff[ticker] = (now, min(wait * 2, self.max_backoff))
+        if not raw_markets:
+            return 0
+        async with state:
+            _, updated, retired = state._reconcile_markets(raw_markets, False, "kalshi")
+            if updated or retired:
+                state._add_log(
+                    "info",
+                    f"Reconciliation sweep refetched {len(raw_markets)} quiet "
+                    f"markets ({updated} changed, {len(retired)} retired).",
+                )
+        if retired:
+            for ticker in retired:
+                self._backoff.pop(ticker, None)
+            await self.feed.remove_tickers(retired)
+        self.refreshed += len(raw_markets)
+        return len(raw_markets)
+
+    async def run(self, state):
+        """Sweeps every `interval` seconds while the bot is running."""
+        while state.is_bot_running:
+            await asyncio.sleep(self.interval)
+            await self.sweep(state)
@@ -0,0 +1,87 @@
+import math
+import time
+
+import numpy as np
+
+from app.market_store import MarketStore
+from app.models import Market
+
+SORT_KEYS = ("default", "volume", "spread", "pnl")
+DEFAULT_RESORT_INTERVAL = 1.0
+
+
+def _spread(markets: MarketStore) -> np.ndarray:
+    spread = markets.column("best_ask") - markets.column("best_bid")
+    return np.where(np.isnan(spread), np.inf, spread)
+
+
+_SORTERS = {
+    "volume": (lambda markets: markets.column("total_volume"), True),
+    "spread": (_spread, False),
+    "pnl": (lambda markets: markets.column("unrealized_pnl"), True),
+}
+
+
+class MarketView:
+    """Memoized filter + sort order over the cached market set.
+
+    The order is rebuilt when the search result set, the sort key or the
+    market universe changes. For value-based sorts it is also refreshed at
+    most every `resort_interval` seconds, so a stream of price updates does
+    not re-sort tens of thousands of markets on every state flush. Rows are
+    always read from the live markets dict when a page is sliced, so only
+    the ordering can lag, never the values shown.
+    """
+
+    def __init__(self, resort_interval: float = DEFAULT_RESORT_INTERVAL):
+        self.resort_interval = resort_interval
+        self._key: tuple | None = None
+        self._sorted_at = 0.0
+        self._ids: list[str] = []
+
+    def ordered_ids(
+        self,
+        markets: MarketStore,
+        matches: list[str] | None,
+        sort_key: str,
+        version: int,
+    ) -> list[str]:
+        """Returns the ids of the filtered markets in display order.
+
+        `matches` is the search result (None for no filter) and `version`
+        identifies the market universe it was computed against.
+        """
+        key = (id(matches), version, len(markets), sort_key)
+        now = time.monotonic()
+        if key == self._key and (
+            sort_key not in _SORTERS or now - self._sorted_at < self.resort_interval
+        ):
+            return self._ids
+        ids = markets.ids() if matches is None else matches
+        if sort_key in _SORTERS:
+            column, reverse = _SORTERS[sort_key]
+            values = column(markets)[markets.rows(ids)]
+            order = np.argsort(-values if reverse else values, kind="stable")
+            ids = [ids[index] for index in order.tolist()]
+        self._key = key
+        self._sorted_at = now
+        self._ids = ids
+        return ids
+
+    def page(
+        self,
+        markets: MarketStore,
+        ordered_ids: list[str],
+        page: int,
+        page_size: int,
+    ) -> list[Market]:
+        """Materializes only the rows of one page."""
+        start = (page - 1) * page_size
+        return [
+            markets.materialize(market_id)
+            for market_id in ordered_ids[start : start + page_size]
+        ]
+
+
+def page_count(total: int, page_size: int) -> int:
+    return max(1, math.ceil(total / page_size))
@@ -0,0 +1,236 @@
+import re
+import time
+
+import httpx
+
+from app.models import MetricSummary
+
+# Histogram buckets are log-linear over whole microseconds: exact below
+# 2**SUB_BUCKET_BITS, then 2**(SUB_BUCKET_BITS - 1) buckets per power of
+# two, so any recorded value is within ~3% of its bucket's bounds.
+SUB_BUCKET_BITS = 5
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+_LINEAR = 1 << SUB_BUCKET_BITS
+_BUCKET_COUNT = (64 - SUB_BUCKET_BITS + 2) * _HALF
+# `le` bounds, in seconds, of the cumulative buckets on /metrics.
+EXPORT_BUCKETS = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+_ID_SEGMENT = re.compile(r"(/(?:markets|orders|events|series)/)(?!batched\b)[^/]+")
+
+
+def _bucket_bounds(index: int) -> tuple[int, int]:
+    """The [low, high) microsecond range of histogram bucket `index`."""
+    if index < _LINEAR:
+        return index, index + 1
+    shift = index // _HALF - 1
+    top = index - shift * _HALF
+    return top << shift, (top + 1) << shift
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Histogram:
+    """HDR-style latency histogram. `observe` takes seconds and costs one
+    bucket index computation and two additions; quantiles are read back
+    from the bucket bounds."""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        value = int(seconds * 1e6)
+        if value < _LINEAR:
+            index = max(0, value)
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS
+            index = (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+        self.counts[index] += 1
+        self.total += seconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """The upper bound, in seconds, of the bucket holding quantile `q`."""
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return _bucket_bounds(index)[1] / 1e6
+        return 0.0
+
+    def cumulative(self, bounds: tuple[float, ...]) -> list[int]:
+        """Observations at or below each of `bounds` seconds, to a bucket's
+        width."""
+        result = []
+        index = seen = 0
+        for bound in bounds:
+            limit = bound * 1e6
+            while index < _BUCKET_COUNT and _bucket_bounds(index)[1] <= limit:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, keyed by name and labels.
+
+    Look a metric up once and keep the handle: `counter` and `histogram`
+    return the same object for the same name and labels, and the handles'
+    `inc` / `observe` do no lookups, so hot paths pay well under a
+    microsecond per observation.
+    """
+
+    def __init__(self):
+        self._metrics: dict[tuple[str, tuple], Counter | Histogram] = {}
+        self._help: dict[str, tuple[str, str]] = {}
+
+    def _get(self, kind: type, name: str, help: str, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics[key] = kind()
+            self._help.setdefault(
+                name, ("counter" if kind is Counter else "histogram", help)
+            )
+        return metric
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str = "", **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels)
+
+    def render(self) -> str:
+        """The Prometheus text exposition of every metric."""
+        lines = []
+        for name, (kind, help) in sorted(self._help.items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric_name, labels), metric in sorted(
+                self._metrics.items(), key=lambda item: item[0]
+            ):
+                if metric_name != name:
+                    continue
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {metric.value}")
+                    continue
+                counts = metric.cumulative(EXPORT_BUCKETS)
+                for bound, count in zip(EXPORT_BUCKETS, counts):
+                    le = (("le", f"{bound:g}"),)
+                    lines.append(f"{name}_bucket{_labels(labels + le)} {count}")
+                total = metric.count
+                inf = (("le", "+Inf"),)
+                lines.append(f"{name}_bucket{_labels(labels + inf)} {total}")
+                lines.append(f"{name}_sum{_labels(labels)} {metric.total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def summaries(self) -> list[MetricSummary]:
+        """One row per metric for the diagnostics panel."""
+        rows = []
+        for (name, labels), metric in sorted(
+            self._metrics.items(), key=lambda item: item[0]
+        ):
+            label_text = ",".join(f"{key}={value}" for key, value in labels)
+            if isinstance(metric, Counter):
+                rows.append(
+                    MetricSummary(
+                        name=name,
+                        labels=label_text,
+                        count=metric.value,
+                        p50_ms=0.0,
+                        p99_ms=0.0,
+                        max_ms=0.0,
+                    )
+                )
+                continue
+            rows.append(
+                MetricSummary(
+                    name=name,
+                    labels=label_text,
+                    count=metric.count,
+                    p50_ms=round(metric.quantile(0.5) * 1000.0, 3),
+                    p99_ms=round(metric.quantile(0.99) * 1000.0, 3),
+                    max_ms=round(metric.quantile(1.0) * 1000.0, 3),
+                )
+            )
+        return rows
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps an httpx transport to count and time every request by venue,
+    endpoint and status. Ids in the path are folded into `{id}` so the
+    endpoint label stays bounded."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, venue: str):
+        self._transport = transport
+        self.venue = venue
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = _ID_SEGMENT.sub(r"\1{id}", request.url.path)
+        endpoint = f"{request.method} {path}"
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            metrics.counter(
+                "rest_failures_total",
+                "REST requests that raised before a response.",
+                venue=self.venue,
+                endpoint=endpoint,
+            ).inc()
+            raise
+        metrics.histogram(
+            "rest_latency_seconds",
+            "REST time to response headers.",
+            venue=self.venue,
+            endpoint=endpoint,
+        ).observe(time.perf_counter() - started)
+        metrics.counter(
+            "rest_requests_total",
+            "REST responses by status code.",
+            venue=self.venue,
+            endpoint=endpoint,
+            status=str(response.status_code),
+        ).inc()
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,347 @@
+import asyncio
+import base64
+import datetime
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import re
+import time
+
+import httpx
+import websockets
+
+PORTFOLIO_PREFIX = "/trade-api/v2/portfolio"
+_AMEND_PATH = re.compile(rf"^{PORTFOLIO_PREFIX}/orders/([^/]+)/amend$")
+_ORDER_PATH = re.compile(rf"^{PORTFOLIO_PREFIX}/orders/([^/]+)$")
+
+
+class MockExchange:
+    """In-memory stand-in for the Kalshi trading endpoints.
+
+    Serve it to `kalshi_api` with
+    `configure_client(transport=exchange.transport())`. It implements
+    batched create and cancel, amend, single cancel, order listing and
+    fills, and can inject latency, transient 503s and 429s above
+    `max_requests_per_second` so retry and throttling paths can be
+    exercised. Orders only fill when `fill` is called.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        max_requests_per_second: float | None = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_requests_per_second = max_requests_per_second
+        self.orders: dict[str, dict] = {}
+        self.fills: list[dict] = []
+        self.requests: list[tuple[float, str, str]] = []
+        self.rejected_for_rate = 0
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._window: list[float] = []
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def resting_orders(self) -> list[dict]:
+        return [order for order in self.orders.values() if order["status"] == "resting"]
+
+    def fill(self, order_id: str, count: int | None = None) -> dict:
+        """Executes `count` contracts (default all remaining) of a resting
+        order and records the fill."""
+        order = self.orders[order_id]
+        count = min(count or order["remaining_count"], order["remaining_count"])
+        order["remaining_count"] -= count
+        if not order["remaining_count"]:
+            order["status"] = "executed"
+        fill = {
+            "trade_id": f"trade-{next(self._ids)}",
+            "order_id": order_id,
+            "ticker": order["ticker"],
+            "side": order["side"],
+            "action": order["action"],
+            "count": count,
+            "yes_price": order["yes_price"],
+            "is_taker": False,
+            "created_time": datetime.datetime.now(datetime.UTC).isoformat(),
+            "ts": int(time.time()),
+        }
+        self.fills.append(fill)
+        return fill
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append((time.monotonic(), request.method, path))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._over_rate_limit():
+            self.rejected_for_rate += 1
+            return httpx.Response(429, json={"error": "too many requests"})
+        if self.fail_rate and self._rng.random() < self.fail_rate:
+            return httpx.Response(503, json={"error": "service unavailable"})
+        body = json.loads(request.content) if request.content else {}
+        if path == f"{PORTFOLIO_PREFIX}/orders/batched":
+            if request.method == "POST":
+                return self._create(body.get("orders", []))
+            if request.method == "DELETE":
+                return self._cancel(body.get("ids", []))
+        if path == f"{PORTFOLIO_PREFIX}/orders" and request.method == "GET":
+            status = request.url.params.get("status")
+            orders = [
+                order
+                for order in self.orders.values()
+                if status is None or order["status"] == status
+            ]
+            return httpx.Response(200, json={"orders": orders, "cursor": ""})
+        if path == f"{PORTFOLIO_PREFIX}/fills" and request.method == "GET":
+            min_ts = int(request.url.params.get("min_ts", 0))
+            fills = [fill for fill in self.fills if fill["ts"] >= min_ts]
+            return httpx.Response(200, json={"fills": fills, "cursor": ""})
+        match = _AMEND_PATH.match(path)
+        if match and request.method == "POST":
+            return self._amend(match.group(1), body)
+        match = _ORDER_PATH.match(path)
+        if match and request.method == "DELETE":
+            response = self._cancel([match.group(1)])
+            result = json.loads(response.content)["orders"][0]
+            if result["error"]:
+                return httpx.Response(404, json=result["error"])
+            return httpx.Response(200, json=result)
+        return httpx.Response(
+            404, json={"error": f"no route for {request.method} {path}"}
+        )
+
+    def _over_rate_limit(self) -> bool:
+        if not self.max_requests_per_second:
+            return False
+        now = time.monotonic()
+        self._window = [ts for ts in self._window if now - ts < 1.0]
+        if len(self._window) >= self.max_requests_per_second:
+            return True
+        self._window.append(now)
+        return False
+
+    def _create(self, orders: list[dict]) -> httpx.Response:
+        results = []
+        for payload in orders:
+            price = payload.get("yes_price")
+            if not payload.get("count") or not price or not 1 <= price <= 99:
+                results.append(
+                    {
+                        "client_order_id": payload.get("client_order_id"),
+                        "order": None,
+                        "error": {
+                            "code": "invalid_order",
+                            "message": "bad price/count",
+                        },
+                    }
+                )
+                continue
+            order_id = f"order-{next(self._ids)}"
+            order = {
+                "order_id": order_id,
+                "client_order_id": payload.get("client_order_id"),
+                "ticker": payload["ticker"],
+                "side": payload.get("side", "yes"),
+                "action": payload["action"],
+                "type": payload.get("type", "limit"),
+                "yes_price": price,
+                "initial_count": payload["count"],
+                "remaining_count": payload["count"],
+                "status": "resting",
+            }
+            self.orders[order_id] = order
+            results.append(
+                {
+                    "client_order_id": payload.get("client_order_id"),
+                    "order": dict(order),
+                    "error": None,
+                }
+            )
+        return httpx.Response(201, json={"orders": results})
+
+    def _cancel(self, order_ids: list[str]) -> httpx.Response:
+        results = []
+        for order_id in order_ids:
+            order = self.orders.get(order_id)
+            if order is None or order["status"] != "resting":
+                results.append(
+                    {
+                        "order_id": order_id,
+                        "order": None,
+                        "reduced_by": 0,
+                        "error": {"code": "not_found", "message": "order not resting"},
+                    }
+                )
+                continue
+            reduced_by = order["remaining_count"]
+            order["remaining_count"] = 0
+            order["status"] = "canceled"
+            results.append(
+                {
+                    "order_id": order_id,
+                    "order": dict(order),
+                    "reduced_by": reduced_by,
+                    "error": None,
+                }
+            )
+        return httpx.Response(200, json={"orders": results})
+
+    def _amend(self, order_id: str, body: dict) -> httpx.Response:
+        order = self.orders.get(order_id)
+        if order is None or order["status"] != "resting":
+            return httpx.Response(404, json={"error": "order not resting"})
+        old_order = dict(order)
+        filled = order["initial_count"] - order["remaining_count"]
+        order["yes_price"] = body.get("yes_price", order["yes_price"])
+        if "count" in body:
+            order["initial_count"] = body["count"]
+            order["remaining_count"] = max(0, body["count"] - filled)
+        order["client_order_id"] = body.get(
+            "updated_client_order_id", order["client_order_id"]
+        )
+        if not order["remaining_count"]:
+            order["status"] = "executed"
+        return httpx.Response(200, json={"old_order": old_order, "order": dict(order)})
+
+
+class MockPolymarket:
+    """In-memory stand-in for Polymarket's Gamma, CLOB and market-channel
+    endpoints.
+
+    Serve the REST side to `polymarket_api` with
+    `configure_client(transport=venue.transport())`; it pages `markets` by
+    offset and implements order books, open-order listing and batch cancel;
+    the trading endpoints require L2 headers signed with `secret`. Used as
+    an async context manager it also runs a local websocket server at `url`
+    that records subscribed tokens; `publish` sends events to every
+    connection.
+    """
+
+    def __init__(
+        self,
+        markets: list[dict] | None = None,
+        latency: float = 0.0,
+        secret: str = "",
+    ):
+        self.markets = markets or []
+        self.secret = secret
+        self.latency = latency
+        self.books: dict[str, dict] = {}
+        self.orders: dict[str, dict] = {}
+        self.requests: list[tuple[float, str, str]] = []
+        self.subscribed: set[str] = set()
+        self.url = ""
+        self._connections: set = set()
+        self._server = None
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def add_order(self, order_id: str, asset_id: str, price: float, size: float):
+        self.orders[order_id] = {
+            "id": order_id,
+            "asset_id": asset_id,
+            "price": str(price),
+            "original_size": str(size),
+            "status": "LIVE",
+        }
+
+    def _authorized(self, request: httpx.Request) -> bool:
+        headers = request.headers
+        if not all(
+            headers.get(name)
+            for name in ("POLY_ADDRESS", "POLY_API_KEY", "POLY_PASSPHRASE")
+        ):
+            return False
+        message = (
+            f"{headers.get('POLY_TIMESTAMP', '')}{request.method}"
+            f"{request.url.path}{request.content.decode()}"
+        )
+        digest = hmac.new(
+            base64.urlsafe_b64decode(self.secret), message.encode(), hashlib.sha256
+        ).digest()
+        return hmac.compare_digest(
+            base64.urlsafe_b64encode(digest).decode(),
+            headers.get("POLY_SIGNATURE", ""),
+        )
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append((time.monotonic(), request.method, path))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request.url.params
+        if path == "/markets" and request.method == "GET":
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", 500))
+            return httpx.Response(200, json=self.markets[offset : offset + limit])
+        if path == "/book" and request.method == "GET":
+            book = self.books.get(params.get("token_id"))
+            if book is None:
+                return httpx.Response(404, json={"error": "No orderbook exists"})
+            return httpx.Response(200, json=book)
+        if path == "/data/orders" and request.method == "GET":
+            if not self._authorized(request):
+                return httpx.Response(401, json={"error": "Unauthorized"})
+            return httpx.Response(
+                200,
+                json={"data": list(self.orders.values()), "next_cursor": "LTE="},
+            )
+        if path == "/orders" and request.method == "DELETE":
+            if not self._authorized(request):
+                return httpx.Response(401, json={"error": "Unauthorized"})
+            canceled = []
+            not_canceled = {}
+            for order_id in json.loads(request.content):
+                if self.orders.pop(order_id, None) is None:
+                    not_canceled[order_id] = "order not found"
+                else:
+                    canceled.append(order_id)
+            return httpx.Response(
+                200, json={"canceled": canceled, "not_canceled": not_canceled}
+            )
+        return httpx.Response(
+            404, json={"error": f"no route for {request.method} {path}"}
+        )
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        for websocket in list(self._connections):
+            await websocket.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, websocket):
+        self._connections.add(websocket)
+        try:
+            async for raw in websocket:
+                if raw == "PING":
+                    await websocket.send("PONG")
+                    continue
+                command = json.loads(raw)
+                if command.get("operation") == "unsubscribe":
+                    self.subscribed.difference_update(command["assets_ids"])
+                else:
+                    self.subscribed.update(command["assets_ids"])
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self._connections.discard(websocket)
+
+    async def publish(self, events: list[dict]):
+        """Sends `events` as one frame to every connection."""
+        message = json.dumps(events)
+        for websocket in list(self._connections):
+            await websocket.send(message)
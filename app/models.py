@@ -32,6 +32,8 @@ class PriceDataPoint(TypedDict):
 class Market(TypedDict):
     market_id: str
     ticker: str
+    venue: str
+    series: str
     description: str
     best_bid: float | None
     best_ask: float | None
@@ -40,10 +42,153 @@ class Market(TypedDict):
     my_ask_price: float | None
     my_ask_size: int | None
     inventory: int
+    avg_cost: float
     unrealized_pnl: float
+    realized_pnl: float
     quoting_active: bool
     total_volume: int
-    price_history: list[PriceDataPoint]
     strategy_params: StrategyParams
     order_book: list[OrderBookLevel]
-    recent_trades: list[TradeFill]
\ No newline at end of file
+    recent_trades: list[TradeFill]
+
+
+class FeedStats(TypedDict):
+    messages: int
+    merged: int
+    dropped: int
+    flushes: int
+    last_flush_size: int
+    last_lock_ms: float
+    max_lock_ms: float
+    reconnects: int
+    sequence_gaps: int
+    last_recovery_ms: float
+    max_recovery_ms: float
+
+
+class ShardStats(TypedDict):
+    shard: int
+    tickers: int
+    connected: bool
+    messages: int
+    blocked: int
+    queue_lag_ms: float
+    max_queue_lag_ms: float
+
+
+class TickerMsg(TypedDict, total=False):
+    market_ticker: str
+    yes_bid: int
+    yes_ask: int
+    price: int
+    ts: int
+
+
+class TickerMessage(TypedDict, total=False):
+    type: str
+    sid: int
+    seq: int
+    msg: TickerMsg
+
+
+class OrderbookDeltaMsg(TypedDict, total=False):
+    market_ticker: str
+    side: str
+    price: int
+    delta: int
+
+
+class OrderbookDeltaMessage(TypedDict, total=False):
+    type: str
+    sid: int
+    seq: int
+    msg: OrderbookDeltaMsg
+
+
+class LogEntry(TypedDict):
+    id: int
+    time: str
+    level: str
+    message: str
+
+
+class Order(TypedDict):
+    order_id: str
+    client_order_id: str
+    market_id: str
+    side: Literal["bid", "ask"]
+    price: float
+    size: int
+    remaining: int
+    status: Literal["pending", "resting", "canceling", "canceled", "executed"]
+
+
+class OrderStats(TypedDict):
+    open: int
+    in_flight: int
+    created: int
+    amended: int
+    canceled: int
+    rejected: int
+    fills: int
+    throttled: int
+
+
+class KillSwitchReport(TypedDict):
+    requested: int
+    canceled: int
+    already_gone: int
+    failed: int
+    listing_failed: int
+    requests: int
+    retries: int
+    elapsed_ms: float
+
+
+class Exposure(TypedDict):
+    name: str
+    gross: float
+    net: float
+    unrealized_pnl: float
+
+
+class RiskTotals(TypedDict):
+    positions: int
+    unrealized_pnl: float
+    realized_pnl: float
+    gross_exposure: float
+    net_exposure: float
+
+
+class VenueMarket(TypedDict):
+    market_id: str
+    ticker: str
+    venue: str
+    series: str
+    description: str
+    best_bid: float | None
+    best_ask: float | None
+    total_volume: int
+    last_price: float | None
+    closed: bool
+
+
+class MetricSummary(TypedDict):
+    name: str
+    labels: str
+    count: int
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class VenueStats(TypedDict):
+    venue: str
+    connected: bool
+    markets: int
+    messages: int
+    msgs_per_sec: float
+    feed_latency_ms: float
+    rest_requests: int
+    rest_errors: int
+    rest_latency_ms: float
@@ -0,0 +1,166 @@
+from array import array
+
+from app.models import OrderBookLevel
+
+MAX_PRICE_CENTS = 100
+ORDER_BOOK_DEPTH = 10
+
+
+class OrderBook:
+    """In-memory L2 book for a single Kalshi market.
+
+    Kalshi only publishes resting bids on each side of a binary contract: "yes"
+    bids and "no" bids. A "no" bid at p cents is a "yes" ask at 100 - p cents.
+    Each side is a fixed array of resting size indexed by cent price (0-100),
+    plus an int bitmask of the occupied levels, so applying a delta is O(1) and
+    the best level is a single ``bit_length()`` call.
+    """
+
+    __slots__ = ("_no", "_no_mask", "_yes", "_yes_mask", "ticker")
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self._yes = array("q", bytes(8 * (MAX_PRICE_CENTS + 1)))
+        self._no = array("q", bytes(8 * (MAX_PRICE_CENTS + 1)))
+        self._yes_mask = 0
+        self._no_mask = 0
+
+    def clear(self):
+        for price in range(MAX_PRICE_CENTS + 1):
+            self._yes[price] = 0
+            self._no[price] = 0
+        self._yes_mask = 0
+        self._no_mask = 0
+
+    def apply_snapshot(self, yes: list[list[int]], no: list[list[int]]):
+        """Replaces the book with a full `orderbook_snapshot` payload."""
+        self.clear()
+        for price, size in yes or []:
+            self._set_level("yes", int(price), int(size))
+        for price, size in no or []:
+            self._set_level("no", int(price), int(size))
+
+    def apply_delta(self, side: str, price: int, delta: int) -> bool:
+        """Applies an `orderbook_delta` and returns True if the top of book moved."""
+        if not 0 <= price <= MAX_PRICE_CENTS:
+            return False
+        levels = self._yes if side == "yes" else self._no
+        top_before = self.top_of_book_cents()
+        self._set_level(side, price, levels[price] + delta)
+        return self.top_of_book_cents() != top_before
+
+    def set_level(self, side: str, price: int, size: int) -> bool:
+        """Replaces the resting size at a level, for venues that publish
+        absolute sizes, and returns True if the top of book moved."""
+        top_before = self.top_of_book_cents()
+        self._set_level(side, price, size)
+        return self.top_of_book_cents() != top_before
+
+    def _set_level(self, side: str, price: int, size: int):
+        if not 0 <= price <= MAX_PRICE_CENTS:
+            return
+        bit = 1 << price
+        if side == "yes":
+            if size > 0:
+                self._yes[price] = size
+                self._yes_mask |= bit
+            else:
+                self._yes[price] = 0
+                self._yes_mask &= ~bit
+        elif size > 0:
+            self._no[price] = size
+            self._no_mask |= bit
+        else:
+            self._no[price] = 0
+            self._no_mask &= ~bit
+
+    def levels(self, side: str) -> list[list[int]]:
+        """The occupied `[price, size]` levels of one side, as a snapshot
+        carries them."""
+        sizes, mask = (
+            (self._yes, self._yes_mask) if side == "yes" else (self._no, self._no_mask)
+        )
+        return [
+            [price, sizes[price]]
+            for price in range(MAX_PRICE_CENTS + 1)
+            if mask >> price & 1
+        ]
+
+    def top_of_book_cents(self) -> tuple[int | None, int | None]:
+        """Returns the best yes bid and best yes ask in cents."""
+        bid = self._yes_mask.bit_length() - 1 if self._yes_mask else None
+        ask = (
+            MAX_PRICE_CENTS - (self._no_mask.bit_length() - 1)
+            if self._no_mask
+            else None
+        )
+        return (bid, ask)
+
+    def best_bid(self) -> float | None:
+        bid, _ = self.top_of_book_cents()
+        return bid / 100.0 if bid is not None else None
+
+    def best_ask(self) -> float | None:
+        _, ask = self.top_of_book_cents()
+        return ask / 100.0 if ask is not None else None
+
+    def top_levels(self, depth: int = ORDER_BOOK_DEPTH) -> list[OrderBookLevel]:
+        """Materializes the best `depth` levels per side, asks first (highest
+        price on top) followed by bids, in the layout the order book view uses."""
+        asks: list[OrderBookLevel] = []
+        mask = self._no_mask
+        while mask and len(asks) < depth:
+            price = mask.bit_length() - 1
+            mask ^= 1 << price
+            asks.append(
+                OrderBookLevel(
+                    side="ask",
+                    price=(MAX_PRICE_CENTS - price) / 100.0,
+                    size=self._no[price],
+                )
+            )
+        bids: list[OrderBookLevel] = []
+        mask = self._yes_mask
+        while mask and len(bids) < depth:
+            price = mask.bit_length() - 1
+            mask ^= 1 << price
+            bids.append(
+                OrderBookLevel(side="bid", price=price / 100.0, size=self._yes[price])
+            )
+        asks.reverse()
+        return asks + bids
+
+
+class OrderBookStore:
+    """Order books for every subscribed ticker, keyed by market ticker."""
+
+    def __init__(self):
+        self._books: dict[str, OrderBook] = {}
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._books
+
+    def get(self, ticker: str) -> OrderBook | None:
+        return self._books.get(ticker)
+
+    def book(self, ticker: str) -> OrderBook:
+        book = self._books.get(ticker)
+        if book is None:
+            book = self._books[ticker] = OrderBook(ticker)
+        return book
+
+    def apply_snapshot(
+        self, ticker: str, yes: list[list[int]], no: list[list[int]]
+    ) -> OrderBook:
+        book = self.book(ticker)
+        book.apply_snapshot(yes, no)
+        return book
+
+    def apply_delta(self, ticker: str, side: str, price: int, delta: int) -> bool:
+        return self.book(ticker).apply_delta(side, price, delta)
+
+    def set_level(self, ticker: str, side: str, price: int, size: int) -> bool:
+        return self.book(ticker).set_level(side, price, size)
+
+    def discard(self, ticker: str):
+        self._books.pop(ticker, None)
@@ -0,0 +1,504 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+from app import kalshi_api
+from app.kalshi_api import BATCH_ORDER_LIMIT
+from app.models import Order, OrderStats, TradeFill
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT = 10.0
+DEFAULT_BATCH_INTERVAL = 0.1
+DEFAULT_FILL_INTERVAL = 1.0
+MAX_RECENT_TRADES = 50
+# Fills are re-requested from this many seconds before the newest one seen,
+# in case the exchange publishes a fill a little after its trade time.
+FILL_CURSOR_SLACK = 5
+LIVE_STATUSES = ("pending", "resting", "canceling")
+
+order_managers: dict[str, "OrderManager"] = {}
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts of up
+    to `burst` (default 1, i.e. evenly spaced). `acquire` waits until a
+    token is free."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waits = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                self.waits += 1
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class OrderIndex:
+    """Live orders by order id and by (market, side).
+
+    Orders sent but not yet acknowledged are indexed under their client
+    order id and re-keyed to the exchange id on acknowledgement.
+    """
+
+    def __init__(self):
+        self._orders: dict[str, Order] = {}
+        self._by_key: dict[tuple[str, str], dict[str, Order]] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._orders
+
+    def get(self, order_id: str) -> Order | None:
+        return self._orders.get(order_id)
+
+    def values(self) -> list[Order]:
+        return list(self._orders.values())
+
+    def for_market(self, market_id: str, side: str) -> list[Order]:
+        return list(self._by_key.get((market_id, side), {}).values())
+
+    def has_market(self, market_id: str) -> bool:
+        return (market_id, "bid") in self._by_key or (market_id, "ask") in self._by_key
+
+    def add(self, order: Order):
+        self._orders[order["order_id"]] = order
+        self._by_key.setdefault((order["market_id"], order["side"]), {})[
+            order["order_id"]
+        ] = order
+
+    def remove(self, order_id: str) -> Order | None:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        key = (order["market_id"], order["side"])
+        orders = self._by_key.get(key)
+        if orders is not None:
+            orders.pop(order_id, None)
+            if not orders:
+                del self._by_key[key]
+        return order
+
+    def rekey(self, old_id: str, new_id: str):
+        order = self.remove(old_id)
+        if order is not None:
+            order["order_id"] = new_id
+            self.add(order)
+
+
+def _order_payload(order: Order) -> dict:
+    return {
+        "ticker": order["market_id"],
+        "client_order_id": order["client_order_id"],
+        "side": "yes",
+        "action": "buy" if order["side"] == "bid" else "sell",
+        "type": "limit",
+        "count": order["size"],
+        "yes_price": round(order["price"] * 100),
+    }
+
+
+def _transient(response: dict) -> bool:
+    """Whether a failed call is worth retrying: throttled, a server error or
+    no response at all."""
+    status = response.get("status_code")
+    return status is None or status == 429 or status >= 500
+
+
+def _chunks(items: list, size: int) -> list[list]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+class OrderManager:
+    """Keeps the account's resting orders in line with the quotes.
+
+    `set_quotes` records the desired quote per (market, side); repeated
+    calls between flushes overwrite each other, so only the latest target
+    is sent. `flush` diffs the targets against the live orders into
+    creates, amends and cancels, sends creates and cancels through the
+    batch endpoints in chunks of `BATCH_ORDER_LIMIT`, and spaces every
+    request through a `RateLimiter`. A side whose create is still in
+    flight keeps its target until the exchange acknowledges the order.
+    Fills are polled, de-duplicated by trade id and applied to the markets'
+    inventory and recent trades.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        batch_interval: float = DEFAULT_BATCH_INTERVAL,
+        fill_interval: float = DEFAULT_FILL_INTERVAL,
+    ):
+        self.api_key = api_key
+        self.batch_interval = batch_interval
+        self.fill_interval = fill_interval
+        self.orders = OrderIndex()
+        self.limiter = RateLimiter(rate_limit)
+        self._targets: dict[tuple[str, str], tuple[float, int] | None] = {}
+        self._fills_since = int(time.time())
+        self._seen_trades: dict[str, int] = {}
+        self._in_flight = 0
+        self._published: dict | None = None
+        self.halted = False
+        self.stats = OrderStats(
+            open=0,
+            in_flight=0,
+            created=0,
+            amended=0,
+            canceled=0,
+            rejected=0,
+            fills=0,
+            throttled=0,
+        )
+
+    def set_quotes(self, market_id: str, quote: dict):
+        """Targets the bid and ask of `quote` (Market `my_*` fields); a
+        missing price or zero size pulls that side."""
+        if self.halted:
+            return
+        for side in ("bid", "ask"):
+            price = quote.get(f"my_{side}_price")
+            size = quote.get(f"my_{side}_size")
+            self._targets[(market_id, side)] = (price, size) if price and size else None
+
+    def has_orders(self, market_id: str) -> bool:
+        """Whether `market_id` has orders on the exchange or changes queued."""
+        return (
+            self.orders.has_market(market_id)
+            or (market_id, "bid") in self._targets
+            or (market_id, "ask") in self._targets
+        )
+
+    @property
+    def pending(self) -> int:
+        return len(self._targets)
+
+    def _plan(self) -> tuple[list[Order], dict[str, tuple[float, int]], list[str]]:
+        targets, self._targets = self._targets, {}
+        creates, amends, cancels = [], {}, []
+        for key, target in targets.items():
+            live = [
+                order
+                for order in self.orders.for_market(*key)
+                if order["status"] in LIVE_STATUSES
+            ]
+            if any(order["status"] != "resting" for order in live):
+                self._targets[key] = target
+                continue
+            if target is None:
+                cancels.extend(order["order_id"] for order in live)
+                continue
+            price, size = target
+            if not live:
+                client_order_id = str(uuid.uuid4())
+                order = Order(
+                    order_id=client_order_id,
+                    client_order_id=client_order_id,
+                    market_id=key[0],
+                    side=key[1],
+                    price=price,
+                    size=size,
+                    remaining=size,
+                    status="pending",
+                )
+                self.orders.add(order)
+                creates.append(order)
+                continue
+            first, extra = live[0], live[1:]
+            cancels.extend(order["order_id"] for order in extra)
+            if first["price"] != price or first["size"] != size:
+                amends[first["order_id"]] = (price, size)
+        return creates, amends, cancels
+
+    async def flush(self) -> int:
+        """Sends everything planned since the last flush and returns the
+        number of requests made."""
+        if self.halted:
+            return 0
+        creates, amends, cancels = self._plan()
+        for order_id in cancels:
+            self.orders.get(order_id)["status"] = "canceling"
+        requests = [
+            *(self._create(batch) for batch in _chunks(creates, BATCH_ORDER_LIMIT)),
+            *(self._cancel(batch) for batch in _chunks(cancels, BATCH_ORDER_LIMIT)),
+            *(
+                self._amend(order_id, price, size)
+                for order_id, (price, size) in amends.items()
+            ),
+        ]
+        await asyncio.gather(*requests)
+        self.stats["open"] = len(self.orders)
+        return len(requests)
+
+    async def _send(self, request):
+        waits = self.limiter.waits
+        await self.limiter.acquire()
+        self.stats["throttled"] += self.limiter.waits - waits
+        self._in_flight += 1
+        self.stats["in_flight"] = self._in_flight
+        try:
+            return await request
+        finally:
+            self._in_flight -= 1
+            self.stats["in_flight"] = self._in_flight
+
+    async def _create(self, batch: list[Order]):
+        response = await self._send(
+            kalshi_api.batch_create_orders(
+                self.api_key, [_order_payload(order) for order in batch]
+            )
+        )
+        if "error" in response:
+            for order in batch:
+                self.orders.remove(order["order_id"])
+                if _transient(response):
+                    self._retry(order, (order["price"], order["size"]))
+            self.stats["rejected"] += len(batch)
+            return
+        results = {
+            result.get("client_order_id"): result
+            for result in response.get("orders", [])
+        }
+        for order in batch:
+            result = results.get(order["client_order_id"]) or {}
+            placed = result.get("order")
+            if result.get("error") or not placed:
+                self.orders.remove(order["order_id"])
+                self.stats["rejected"] += 1
+                continue
+            self.orders.rekey(order["order_id"], placed["order_id"])
+            order["remaining"] = placed.get("remaining_count", order["size"])
+            order["status"] = placed.get("status", "resting")
+            if order["status"] != "resting":
+                self.orders.remove(order["order_id"])
+            self.stats["created"] += 1
+        if self.halted:
+            # Acknowledged after the kill switch took its snapshot.
+            late = [
+                order["order_id"] for order in batch if order["status"] == "resting"
+            ]
+            if late:
+                await self._cancel(late)
+
+    async def _cancel(self, order_ids: list[str]):
+        response = await self._send(
+            kalshi_api.batch_cancel_orders(self.api_key, order_ids)
+        )
+        failed = set(order_ids) if "error" in response else set()
+        for result in response.get("orders", []):
+            # An order the exchange no longer has resting is gone either way.
+            if result.get("error") and result["error"].get("code") != "not_found":
+                failed.add(result["order_id"])
+        for order_id in order_ids:
+            order = self.orders.get(order_id)
+            if order is None:
+                continue
+            if order_id in failed:
+                order["status"] = "resting"
+                self.stats["rejected"] += 1
+                self._retry(order, None)
+            else:
+                self.orders.remove(order_id)
+                self.stats["canceled"] += 1
+
+    async def _amend(self, order_id: str, price: float, size: int):
+        order = self.orders.get(order_id)
+        if order is None:
+            return
+        updated_client_order_id = str(uuid.uuid4())
+        payload = _order_payload({**order, "price": price, "size": size})
+        payload["updated_client_order_id"] = updated_client_order_id
+        response = await self._send(
+            kalshi_api.amend_order(self.api_key, order_id, payload)
+        )
+        if "error" in response or not response.get("order"):
+            self.stats["rejected"] += 1
+            if response.get("status_code") == 404:
+                self.orders.remove(order_id)
+            elif _transient(response):
+                self._retry(order, (price, size))
+            return
+        amended = response["order"]
+        order.update(
+            price=price,
+            size=size,
+            remaining=amended.get("remaining_count", size),
+            client_order_id=updated_client_order_id,
+        )
+        if amended.get("order_id", order_id) != order_id:
+            self.orders.rekey(order_id, amended["order_id"])
+        if amended.get("status", "resting") != "resting":
+            self.orders.remove(order["order_id"])
+        self.stats["amended"] += 1
+
+    def _retry(self, order: Order, target: tuple[float, int] | None):
+        """Re-queues a failed change for the next flush unless a newer target
+        for the same side has arrived meanwhile."""
+        self._targets.setdefault((order["market_id"], order["side"]), target)
+
+    async def poll_fills(self) -> list[dict]:
+        """Returns the fills not seen before.
+
+        Each poll asks only for fills since shortly before the newest one
+        seen so far; trade ids are remembered until they fall behind that
+        cursor, so a fill returned by overlapping polls is booked once.
+        """
+        fills = []
+        cursor = None
+        while True:
+            response = await self._send(
+                kalshi_api.get_fills(self.api_key, self._fills_since, cursor)
+            )
+            if "error" in response:
+                return fills
+            for fill in response.get("fills", []):
+                if fill["trade_id"] in self._seen_trades:
+                    continue
+                self._seen_trades[fill["trade_id"]] = fill.get("ts", self._fills_since)
+                fills.append(fill)
+            cursor = response.get("cursor")
+            if not cursor:
+                break
+        if fills:
+            newest = max(self._seen_trades.values())
+            self._fills_since = max(self._fills_since, newest - FILL_CURSOR_SLACK)
+            self._seen_trades = {
+                trade_id: ts
+                for trade_id, ts in self._seen_trades.items()
+                if ts >= self._fills_since
+            }
+        return fills
+
+    async def apply_fills(self, state, fills: list[dict]):
+        """Updates order remainders, books the fills into positions and PnL,
+        records recent trades and requotes the markets whose inventory moved,
+        in one state update."""
+        for fill in fills:
+            order = self.orders.get(fill["order_id"])
+            if order is not None:
+                order["remaining"] -= fill["count"]
+                if order["remaining"] <= 0:
+                    self.orders.remove(fill["order_id"])
+        self.stats["fills"] += len(fills)
+        self.stats["open"] = len(self.orders)
+        if not fills and self.stats == self._published:
+            return
+        self._published = dict(self.stats)
+        async with state:
+            markets = state._plain_markets()
+            touched = []
+            for fill in fills:
+                market_id = fill["ticker"]
+                if market_id not in markets:
+                    continue
+                bought = (fill["action"] == "buy") == (fill.get("side", "yes") == "yes")
+                state._apply_fill(
+                    market_id,
+                    fill["count"] if bought else -fill["count"],
+                    fill["yes_price"] / 100.0,
+                )
+                trade = TradeFill(
+                    timestamp=datetime.datetime.now().strftime("%H:%M:%S"),
+                    side="buy" if bought else "sell",
+                    price=fill["yes_price"] / 100.0,
+                    size=fill["count"],
+                    market_id=fill["ticker"],
+                )
+                markets.set(
+                    market_id,
+                    "recent_trades",
+                    [trade, *markets.get(market_id, "recent_trades")][
+                        :MAX_RECENT_TRADES
+                    ],
+                )
+                touched.append(market_id)
+            if touched:
+                state._touch_markets()
+                state._requote(touched)
+                state._add_log(
+                    "info",
+                    f"{len(fills)} fills across {len(set(touched))} markets.",
+                )
+            state.order_stats = dict(self.stats)
+
+    async def run(self, state):
+        """Flushes order changes every `batch_interval` and polls fills every
+        `fill_interval` while the bot is running."""
+        next_fill_poll = 0.0
+        try:
+            while state.is_bot_running:
+                await asyncio.sleep(self.batch_interval)
+                await self.flush()
+                if time.monotonic() >= next_fill_poll:
+                    next_fill_poll = time.monotonic() + self.fill_interval
+                    await self.apply_fills(state, await self.poll_fills())
+        except Exception:
+            logger.exception("Order manager failed")
+            raise
+        finally:
+            await self.cancel_all()
+
+    def halt(self) -> list[str]:
+        """Stops all order traffic for the kill switch and returns the ids
+        of the acknowledged orders, which the caller cancels. Creates still
+        in flight cancel themselves when acknowledged."""
+        self.halted = True
+        self._targets.clear()
+        order_ids = []
+        for order in self.orders.values():
+            if order["status"] in ("resting", "canceling"):
+                order["status"] = "canceling"
+                order_ids.append(order["order_id"])
+        return order_ids
+
+    def forget(self, order_ids: list[str], failed: list[str] | None = None):
+        """Drops the orders the kill switch cancelled. The ones in `failed`
+        may still be live, so they are kept as resting with a cancel queued
+        for when the manager resumes, and `cancel_all` still covers them."""
+        failed = set(failed or ())
+        for order_id in order_ids:
+            if order_id not in failed:
+                self.orders.remove(order_id)
+                continue
+            order = self.orders.get(order_id)
+            if order is not None:
+                order["status"] = "resting"
+                self._targets[(order["market_id"], order["side"])] = None
+        self.stats["open"] = len(self.orders)
+
+    def resume(self):
+        self.halted = False
+
+    async def cancel_all(self):
+        """Pulls every quote and cancels every resting order."""
+        self._targets.clear()
+        resting = [
+            order["order_id"]
+            for order in self.orders.values()
+            if order["status"] == "resting"
+        ]
+        for order_id in resting:
+            self.orders.get(order_id)["status"] = "canceling"
+        await asyncio.gather(
+            *(self._cancel(batch) for batch in _chunks(resting, BATCH_ORDER_LIMIT))
+        )
+        self.stats["open"] = len(self.orders)
@@ -4,6 +4,8 @@ from app.models import Market
 from app.components.sidebar import sidebar
 from app.components.market_card import market_card
 from app.components.log_viewer import log_viewer
+from app.components.diagnostics_panel import diagnostics_panel
+from app.components.bulk_actions import bulk_actions_bar
 from app.components.kill_switch_dialog import kill_switch_dialog
 
 
@@ -51,6 +53,15 @@ def dashboard_header() -> rx.Component:
                 on_change=BotState.set_items_per_page,
                 class_name="px-3 py-2 text-sm bg-white border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-blue-500 focus:border-blue-500",
             ),
+            rx.el.select(
+                rx.el.option("Default order", value="default"),
+                rx.el.option("Volume", value="volume"),
+                rx.el.option("Spread", value="spread"),
+                rx.el.option("PnL", value="pnl"),
+                value=BotState.sort_key,
+                on_change=BotState.set_sort_key,
+                class_name="px-3 py-2 text-sm bg-white border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-blue-500 focus:border-blue-500",
+            ),
             class_name="flex items-center gap-4",
         ),
         rx.el.div(
@@ -82,27 +93,198 @@ def dashboard_header() -> rx.Component:
                 disabled=BotState.global_kill_switch_active,
             ),
             kill_switch_dialog(),
+            rx.cond(
+                BotState.kill_switch_report,
+                rx.el.span(
+                    BotState.kill_switch_report["canceled"].to_string(),
+                    "/",
+                    BotState.kill_switch_report["requested"].to_string(),
+                    " canceled in ",
+                    BotState.kill_switch_report["elapsed_ms"].to_string(),
+                    " ms",
+                    class_name=rx.cond(
+                        (BotState.kill_switch_report["failed"] > 0)
+                        | (BotState.kill_switch_report["listing_failed"] > 0),
+                        "text-xs font-mono text-red-600",
+                        "text-xs font-mono text-gray-500",
+                    ),
+                ),
+            ),
             class_name="flex items-center gap-2",
         ),
         class_name="flex items-center justify-between p-4 border-b bg-white",
     )
 
 
+def pagination_controls() -> rx.Component:
+    return rx.el.div(
+        rx.el.button(
+            rx.icon("chevron-left", class_name="h-4 w-4"),
+            on_click=BotState.prev_page,
+            disabled=BotState.current_page <= 1,
+            class_name="p-1 rounded-md text-gray-600 hover:bg-gray-200 disabled:opacity-40",
+        ),
+        rx.el.span(
+            "Page ",
+            BotState.current_page.to_string(),
+            " of ",
+            BotState.total_pages.to_string(),
+            class_name="text-sm text-gray-600",
+        ),
+        rx.el.button(
+            rx.icon("chevron-right", class_name="h-4 w-4"),
+            on_click=BotState.next_page,
+            disabled=BotState.current_page >= BotState.total_pages,
+            class_name="p-1 rounded-md text-gray-600 hover:bg-gray-200 disabled:opacity-40",
+        ),
+        class_name="flex items-center gap-2",
+    )
+
+
+def shard_stat(stats: rx.Var[dict]) -> rx.Component:
+    return rx.el.span(
+        "#",
+        stats["shard"].to_string(),
+        ": ",
+        stats["tickers"].to_string(),
+        " tickers, lag ",
+        stats["queue_lag_ms"].to_string(),
+        " ms, ",
+        stats["blocked"].to_string(),
+        " blocked",
+        class_name=rx.cond(
+            stats["connected"],
+            "text-xs text-gray-400 font-mono",
+            "text-xs text-red-500 font-mono",
+        ),
+    )
+
+
+def venue_stat(stats: rx.Var[dict]) -> rx.Component:
+    return rx.el.span(
+        stats["venue"],
+        ": ",
+        stats["markets"].to_string(),
+        " markets, ",
+        stats["msgs_per_sec"].to_string(),
+        " msgs/s, feed ",
+        stats["feed_latency_ms"].to_string(),
+        " ms, REST ",
+        stats["rest_latency_ms"].to_string(),
+        " ms, ",
+        stats["rest_errors"].to_string(),
+        "/",
+        stats["rest_requests"].to_string(),
+        " errors",
+        class_name=rx.cond(
+            stats["connected"],
+            "text-xs text-gray-400 font-mono",
+            "text-xs text-gray-300 font-mono",
+        ),
+    )
+
+
+def exposure_stat(exposure: rx.Var[dict]) -> rx.Component:
+    return rx.el.span(
+        exposure["name"],
+        ": gross $",
+        exposure["gross"].to_string(),
+        ", net $",
+        exposure["net"].to_string(),
+        ", uPnL $",
+        exposure["unrealized_pnl"].to_string(),
+        class_name=rx.cond(
+            exposure["unrealized_pnl"] < 0,
+            "text-xs text-red-500 font-mono",
+            "text-xs text-gray-400 font-mono",
+        ),
+    )
+
+
 def dashboard_content() -> rx.Component:
     return rx.el.main(
         dashboard_header(),
         rx.el.div(
             rx.el.div(
-                rx.el.p(
-                    "Showing ",
-                    rx.el.b(BotState.active_markets.length()),
-                    " of ",
-                    rx.el.b(BotState.filtered_markets_count),
-                    " markets.",
-                    class_name="text-sm text-gray-600 mb-4",
+                rx.el.div(
+                    rx.el.p(
+                        "Showing ",
+                        rx.el.b(BotState.active_markets.length()),
+                        " of ",
+                        rx.el.b(BotState.filtered_markets_count),
+                        " markets.",
+                        class_name="text-sm text-gray-600",
+                    ),
+                    pagination_controls(),
+                    class_name="flex items-center gap-4",
+                ),
+                rx.el.div(
+                    rx.el.p(
+                        "Feed: ",
+                        BotState.feed_stats["messages"].to_string(),
+                        " msgs, ",
+                        BotState.feed_stats["merged"].to_string(),
+                        " merged, ",
+                        BotState.feed_stats["dropped"].to_string(),
+                        " dropped. Last flush ",
+                        BotState.feed_stats["last_flush_size"].to_string(),
+                        " markets in ",
+                        BotState.feed_stats["last_lock_ms"].to_string(),
+                        " ms. ",
+                        BotState.feed_stats["reconnects"].to_string(),
+                        " reconnects, ",
+                        BotState.feed_stats["sequence_gaps"].to_string(),
+                        " gaps, last recovery ",
+                        BotState.feed_stats["last_recovery_ms"].to_string(),
+                        " ms.",
+                        class_name="text-xs text-gray-400 font-mono",
+                    ),
+                    rx.el.p(
+                        "Orders: ",
+                        BotState.order_stats["open"].to_string(),
+                        " open, ",
+                        BotState.order_stats["in_flight"].to_string(),
+                        " in flight, ",
+                        BotState.order_stats["fills"].to_string(),
+                        " fills, ",
+                        BotState.order_stats["rejected"].to_string(),
+                        " rejected, ",
+                        BotState.order_stats["throttled"].to_string(),
+                        " throttled.",
+                        class_name="text-xs text-gray-400 font-mono",
+                    ),
+                    rx.el.p(
+                        "Risk: ",
+                        BotState.risk_totals["positions"].to_string(),
+                        " positions, unrealized $",
+                        BotState.risk_totals["unrealized_pnl"].to_string(),
+                        ", realized $",
+                        BotState.risk_totals["realized_pnl"].to_string(),
+                        ", gross $",
+                        BotState.risk_totals["gross_exposure"].to_string(),
+                        ", net $",
+                        BotState.risk_totals["net_exposure"].to_string(),
+                        ".",
+                        class_name="text-xs text-gray-500 font-mono",
+                    ),
+                    rx.el.div(
+                        rx.foreach(BotState.venue_exposure, exposure_stat),
+                        rx.foreach(BotState.series_exposure, exposure_stat),
+                        class_name="flex flex-wrap justify-end gap-3",
+                    ),
+                    rx.el.div(
+                        rx.foreach(BotState.venue_stats, venue_stat),
+                        class_name="flex flex-wrap justify-end gap-3",
+                    ),
+                    rx.el.div(
+                        rx.foreach(BotState.shard_stats, shard_stat),
+                        class_name="flex flex-wrap justify-end gap-3",
+                    ),
+                    class_name="flex flex-col items-end gap-1",
                 ),
-                class_name="px-4 md:px-0",
+                class_name="flex justify-between items-baseline mb-4 px-4 md:px-0",
             ),
+            bulk_actions_bar(),
             rx.cond(
                 BotState.active_markets.length() > 0,
                 rx.el.div(
@@ -154,6 +336,7 @@ def dashboard_content() -> rx.Component:
                 ),
             ),
             log_viewer(),
+            diagnostics_panel(),
             class_name="flex flex-col gap-6 p-4 md:p-6",
         ),
         class_name="ml-64 flex flex-col h-screen font-['Lato'] bg-gray-50",
@@ -165,4 +348,4 @@ def dashboard_page() -> rx.Component:
         sidebar(),
         dashboard_content(),
         class_name="min-h-screen w-full bg-gray-50 font-['Lato']",
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,195 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+
+import httpx
+
+from app import json_codec
+from app.kalshi_api import DEFAULT_LIMITS, DEFAULT_TIMEOUT
+from app.metrics import InstrumentedTransport
+
+logger = logging.getLogger(__name__)
+
+GAMMA_URL = os.getenv("POLYMARKET_GAMMA_URL", "https://gamma-api.polymarket.com")
+CLOB_URL = os.getenv("POLYMARKET_CLOB_URL", "https://clob.polymarket.com")
+MARKET_PAGE_LIMIT = 500
+DEFAULT_PAGE_CONCURRENCY = 4
+CANCEL_BATCH_LIMIT = 100
+END_CURSOR = "LTE="
+# CLOB L2 credentials that go with the API key entered in the panel, as
+# issued by the CLOB's API key derivation for the trading wallet.
+API_SECRET = os.getenv("POLYMARKET_API_SECRET", "")
+API_PASSPHRASE = os.getenv("POLYMARKET_API_PASSPHRASE", "")
+WALLET_ADDRESS = os.getenv("POLYMARKET_ADDRESS", "")
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_client_options: dict = {}
+
+
+def configure_client(
+    limits: httpx.Limits | None = None,
+    timeout: httpx.Timeout | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+):
+    """Sets connection limits, timeouts and transport for the pooled client,
+    as `kalshi_api.configure_client` does."""
+    global _client
+    _client_options.update(
+        {
+            key: value
+            for key, value in {
+                "limits": limits,
+                "timeout": timeout,
+                "transport": transport,
+            }.items()
+            if value is not None
+        }
+    )
+    _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared keep-alive client, creating it for the running loop.
+    It serves both the Gamma (market data) and CLOB (trading) hosts."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        transport = _client_options.get("transport") or httpx.AsyncHTTPTransport(
+            limits=_client_options.get("limits", DEFAULT_LIMITS)
+        )
+        _client = httpx.AsyncClient(
+            timeout=_client_options.get("timeout", DEFAULT_TIMEOUT),
+            transport=InstrumentedTransport(transport, "polymarket"),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def _auth_headers(api_key: str, method: str, url: str, body: str = "") -> dict:
+    """CLOB L2 headers: an HMAC-SHA256 over timestamp, method, path and body,
+    keyed with the base64 API secret. Public (Gamma, book) requests pass no
+    key and are sent unsigned."""
+    if not (api_key and api_key.strip()):
+        return {}
+    timestamp = str(int(time.time()))
+    message = f"{timestamp}{method}{httpx.URL(url).path}{body}"
+    digest = hmac.new(
+        base64.urlsafe_b64decode(API_SECRET), message.encode(), hashlib.sha256
+    ).digest()
+    return {
+        "POLY_ADDRESS": WALLET_ADDRESS,
+        "POLY_SIGNATURE": base64.urlsafe_b64encode(digest).decode(),
+        "POLY_TIMESTAMP": timestamp,
+        "POLY_API_KEY": api_key,
+        "POLY_PASSPHRASE": API_PASSPHRASE,
+    }
+
+
+async def _request(
+    api_key: str, method: str, url: str, description: str, json_body=None, **kwargs
+) -> dict | list:
+    """Sends a request, returning the decoded body or an `{"error": ...}`
+    dict like `kalshi_api`. `json_body` is serialized here so the signature
+    covers exactly the bytes sent."""
+    body = json.dumps(json_body) if json_body is not None else ""
+    try:
+        headers = _auth_headers(api_key, method, url, body)
+        if body:
+            headers["Content-Type"] = "application/json"
+            kwargs["content"] = body
+        response = await get_client().request(method, url, headers=headers, **kwargs)
+        response.raise_for_status()
+        return json_codec.decoder.loads(response.content) if response.content else {}
+    except httpx.HTTPStatusError as e:
+        logger.exception(f"HTTP error occurred while {description}")
+        return {
+            "error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}",
+            "status_code": e.response.status_code,
+        }
+    except Exception as e:
+        logger.exception(f"An unexpected error occurred while {description}")
+        return {"error": str(e)}
+
+
+async def get_markets(
+    limit: int = MARKET_PAGE_LIMIT, offset: int = 0, active: bool = True
+) -> dict:
+    """Fetches one page of markets from the Gamma API, as `{"markets": [...]}`."""
+    params = {"limit": limit, "offset": offset}
+    if active:
+        params.update({"active": "true", "closed": "false"})
+    page = await _request(
+        "", "GET", f"{GAMMA_URL}/markets", "fetching markets", params=params
+    )
+    if isinstance(page, dict):
+        return page
+    return {"markets": page}
+
+
+async def get_all_markets(
+    page_limit: int = MARKET_PAGE_LIMIT,
+    max_concurrency: int = DEFAULT_PAGE_CONCURRENCY,
+) -> dict:
+    """Fetches every active market. Gamma pages by offset, so pages are
+    requested `max_concurrency` at a time until one comes back short."""
+    markets = {}
+    offset = 0
+    while True:
+        pages = await asyncio.gather(
+            *(
+                get_markets(limit=page_limit, offset=offset + i * page_limit)
+                for i in range(max_concurrency)
+            )
+        )
+        for page in pages:
+            if "error" in page:
+                return page
+            for market in page["markets"]:
+                markets[market["conditionId"]] = market
+        if any(len(page["markets"]) < page_limit for page in pages):
+            return {"markets": list(markets.values())}
+        offset += max_concurrency * page_limit
+
+
+async def get_order_book(token_id: str) -> dict:
+    """Fetches the CLOB book for one outcome token."""
+    return await _request(
+        "",
+        "GET",
+        f"{CLOB_URL}/book",
+        f"fetching the order book for {token_id}",
+        params={"token_id": token_id},
+    )
+
+
+async def get_open_orders(api_key: str, cursor: str | None = None) -> dict:
+    """Fetches one page of the account's open orders."""
+    params = {"next_cursor": cursor} if cursor else None
+    return await _request(
+        api_key, "GET", f"{CLOB_URL}/data/orders", "listing orders", params=params
+    )
+
+
+async def cancel_orders(api_key: str, order_ids: list[str]) -> dict:
+    """Cancels up to `CANCEL_BATCH_LIMIT` orders; the response lists the
+    `canceled` ids and maps the rest to a reason in `not_canceled`."""
+    return await _request(
+        api_key,
+        "DELETE",
+        f"{CLOB_URL}/orders",
+        "canceling orders",
+        json_body=order_ids,
+    )
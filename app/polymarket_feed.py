@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+import websockets
+
+from app import json_codec
+from app.metrics import metrics
+from app.update_buffer import DEFAULT_FLUSH_INTERVAL
+from app.websocket_client import (
+    RECONNECT_BASE_DELAY,
+    RECONNECT_MAX_DELAY,
+    MarketFeedHandler,
+)
+
+logger = logging.getLogger(__name__)
+
+POLYMARKET_WS_URL = os.getenv(
+    "POLYMARKET_WS_URL", "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+)
+PING_INTERVAL = 10.0
+
+_received_bytes = metrics.counter(
+    "feed_received_bytes_total", "Websocket bytes received.", venue="polymarket"
+)
+_decode_seconds = metrics.histogram(
+    "feed_decode_seconds", "Time to decode one feed frame.", venue="polymarket"
+)
+_handle_seconds = metrics.histogram(
+    "feed_handle_seconds",
+    "Time to apply one decoded feed frame.",
+    venue="polymarket",
+)
+
+
+def _level(side: str, price) -> tuple[int, int]:
+    """The cent bucket on book `side` and the tenth-of-a-cent tick of a
+    price level.
+
+    Polymarket ticks down to $0.001 near the extremes, finer than the
+    book's cents, so ticks are bucketed conservatively: bids round down
+    and asks round up, and neither side ever looks better than it is. Asks
+    land on the no side at `100 - p`.
+    """
+    tick = round(float(price) * 1000)
+    if side == "yes":
+        return tick // 10, tick
+    return 100 - -(-tick // 10), tick
+
+
+class PolymarketFeedHandler(MarketFeedHandler):
+    """Applies Polymarket market-channel events to the shared order book and
+    update path.
+
+    Polymarket quotes the yes token in dollars with fractional share sizes;
+    bids land on the book's yes side and asks on its no side at `100 - p`
+    cents. Each market's sizes are kept per tick, and each cent level of
+    the book holds the sum of its ticks rounded to whole contracts, so
+    sub-cent ticks add up instead of overwriting each other. Events are
+    keyed by outcome token and mapped back to market ids.
+    """
+
+    def __init__(self, api_key: str, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        super().__init__(api_key, flush_interval)
+        self.markets_by_token: dict[str, str] = {}
+        self.messages = 0
+        self.latency_ms = 0.0
+        # market id -> (side, cent) -> tick -> size
+        self._ticks: dict[str, dict[tuple[str, int], dict[int, float]]] = {}
+
+    async def handle_message(self, data):
+        if isinstance(data, list):
+            for event in data:
+                await self.handle_message(event)
+            return
+        self.messages += 1
+        if data.get("timestamp"):
+            self.latency_ms = round(time.time() * 1000.0 - int(data["timestamp"]), 1)
+        event_type = data.get("event_type")
+        if event_type == "book":
+            self._handle_book(data)
+        elif event_type == "price_change":
+            self._handle_price_change(data)
+        elif event_type == "last_trade_price":
+            self._handle_trade(data)
+
+    def _handle_book(self, data: dict):
+        market_id = self.markets_by_token.get(data.get("asset_id"))
+        if market_id is None:
+            return
+        ticks = self._ticks[market_id] = {}
+        for side, levels in (("yes", data.get("bids")), ("no", data.get("asks"))):
+            for level in levels or []:
+                cent, tick = _level(side, level["price"])
+                ticks.setdefault((side, cent), {})[tick] = float(level["size"])
+        sides = {"yes": [], "no": []}
+        for (side, cent), sizes in ticks.items():
+            sides[side].append([cent, round(sum(sizes.values()))])
+        self.order_books.apply_snapshot(market_id, sides["yes"], sides["no"])
+        self._publish_book(market_id, top_changed=True)
+
+    def _handle_price_change(self, data: dict):
+        for change in data.get("price_changes") or data.get("changes") or []:
+            token = change.get("asset_id") or data.get("asset_id")
+            market_id = self.markets_by_token.get(token)
+            if market_id is None:
+                continue
+            side = "yes" if change["side"].upper() == "BUY" else "no"
+            cent, tick = _level(side, change["price"])
+            ticks = self._ticks.setdefault(market_id, {})
+            sizes = ticks.setdefault((side, cent), {})
+            size = float(change["size"])
+            if size > 0:
+                sizes[tick] = size
+            else:
+                sizes.pop(tick, None)
+                if not sizes:
+                    del ticks[(side, cent)]
+            top_changed = self.order_books.set_level(
+                market_id, side, cent, round(sum(sizes.values()))
+            )
+            self._publish_book(market_id, top_changed)
+
+    def _handle_trade(self, data: dict):
+        market_id = self.markets_by_token.get(data.get("asset_id"))
+        if market_id is None or not data.get("price"):
+            return
+        timestamp = int(data.get("timestamp") or time.time() * 1000) / 1000.0
+        self.update_buffer.record_price(market_id, timestamp, float(data["price"]))
+
+    def forget(self, tickers: list[str]):
+        for ticker in tickers:
+            self._ticks.pop(ticker, None)
+        super().forget(tickers)
+
+
+class PolymarketFeed:
+    """Supervised websocket connection to Polymarket's market channel, with
+    the same `run` / `add_tickers` / `remove_tickers` surface as
+    `ShardedKalshiFeed`. `token_ids` maps market ids to the yes-token ids
+    the channel is keyed by."""
+
+    def __init__(
+        self,
+        api_key: str,
+        market_ids: list[str],
+        token_ids: dict[str, str],
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        ws_url: str = POLYMARKET_WS_URL,
+        decoder: json_codec.JsonDecoder | None = None,
+    ):
+        self.handler = PolymarketFeedHandler(api_key, flush_interval=flush_interval)
+        self.update_buffer = self.handler.update_buffer
+        self.token_ids = token_ids
+        self.ws_url = ws_url
+        self.decoder = decoder or json_codec.decoder
+        self.connected = False
+        self.reconnects = 0
+        self._websocket = None
+        for market_id in market_ids:
+            if market_id in token_ids:
+                self.handler.markets_by_token[token_ids[market_id]] = market_id
+
+    @property
+    def market_count(self) -> int:
+        return len(self.handler.markets_by_token)
+
+    async def run(self, state_setter):
+        flusher = asyncio.create_task(self.update_buffer.run(state_setter))
+        try:
+            await self._connect(state_setter)
+        finally:
+            flusher.cancel()
+            await self.update_buffer.flush(state_setter)
+
+    async def _connect(self, state_setter):
+        update_buffer = self.update_buffer
+        attempt = 0
+        while state_setter.is_bot_running:
+            try:
+                async with websockets.connect(self.ws_url) as websocket:
+                    attempt = 0
+                    self._websocket = websocket
+                    self.connected = True
+                    update_buffer.log("info", "Connected to Polymarket WebSocket.")
+                    await self._subscribe(
+                        websocket, list(self.handler.markets_by_token)
+                    )
+                    await self._receive(websocket, state_setter)
+            except websockets.exceptions.ConnectionClosed:
+                logger.exception("Polymarket WebSocket connection closed")
+                update_buffer.log("error", "Polymarket WebSocket connection closed.")
+            except Exception as e:
+                logger.exception("Polymarket WebSocket connection failed")
+                update_buffer.log(
+                    "error", f"Polymarket WebSocket connection failed: {e}"
+                )
+            finally:
+                self._websocket = None
+                self.connected = False
+            if not state_setter.is_bot_running:
+                break
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+            attempt += 1
+            self.reconnects += 1
+            update_buffer.log(
+                "warning", f"Reconnecting to Polymarket WebSocket in {delay:.1f}s."
+            )
+            await asyncio.sleep(delay)
+
+    async def _subscribe(self, websocket, token_ids: list[str]):
+        if token_ids:
+            await websocket.send(
+                json.dumps({"assets_ids": token_ids, "type": "market"})
+            )
+
+    async def _receive(self, websocket, state_setter):
+        while state_setter.is_bot_running:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.recv(), timeout=PING_INTERVAL
+                )
+            except TimeoutError:
+                await websocket.send("PING")
+                continue
+            if message == "PONG":
+                continue
+            _received_bytes.inc(len(message))
+            started = time.perf_counter()
+            data = self.decoder.loads(message)
+            decoded = time.perf_counter()
+            _decode_seconds.observe(decoded - started)
+            await self.handler.handle_message(data)
+            _handle_seconds.observe(time.perf_counter() - decoded)
+
+    async def add_tickers(self, market_ids: list[str]):
+        tokens = []
+        for market_id in market_ids:
+            token = self.token_ids.get(market_id)
+            if token is not None and token not in self.handler.markets_by_token:
+                self.handler.markets_by_token[token] = market_id
+                tokens.append(token)
+        if tokens and self._websocket is not None:
+            await self._websocket.send(
+                json.dumps({"assets_ids": tokens, "operation": "subscribe"})
+            )
+
+    async def remove_tickers(self, market_ids: list[str]):
+        tokens = []
+        for market_id in market_ids:
+            token = self.token_ids.get(market_id)
+            if self.handler.markets_by_token.pop(token, None) is not None:
+                tokens.append(token)
+        self.handler.forget(market_ids)
+        if tokens and self._websocket is not None:
+            await self._websocket.send(
+                json.dumps({"assets_ids": tokens, "operation": "unsubscribe"})
+            )
@@ -0,0 +1,114 @@
+import bisect
+import datetime
+from array import array
+
+import numpy as np
+
+from app.models import PriceDataPoint
+
+DEFAULT_CAPACITY = 8192
+MAX_CHART_POINTS = 500
+CHART_RANGES = {
+    "1D": 24 * 60 * 60,
+    "1W": 7 * 24 * 60 * 60,
+    "1M": 30 * 24 * 60 * 60,
+    "ALL": None,
+}
+
+
+class PriceHistory:
+    """Fixed-capacity ring buffer of (unix timestamp, price) points.
+
+    Timestamps and prices live in two `array("d")` columns that grow on
+    demand up to `capacity` and then wrap, overwriting the oldest points, so
+    a quiet market costs a few bytes and a busy one never more than
+    16 * capacity. Points are only recorded when the price changes.
+    """
+
+    __slots__ = ("_head", "_px", "_ts", "capacity")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._ts = array("d")
+        self._px = array("d")
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    def last(self) -> tuple[float, float] | None:
+        if not self._ts:
+            return None
+        index = self._head - 1
+        return (self._ts[index], self._px[index])
+
+    def append(self, timestamp: float, price: float):
+        last = self.last()
+        if last is not None:
+            if price == last[1]:
+                return
+            timestamp = max(timestamp, last[0])
+        if len(self._ts) < self.capacity:
+            self._ts.append(timestamp)
+            self._px.append(price)
+            self._head = len(self._ts) % self.capacity
+        else:
+            self._ts[self._head] = timestamp
+            self._px[self._head] = price
+            self._head = (self._head + 1) % self.capacity
+
+    def columns(self) -> tuple[array, array]:
+        """Returns the timestamps and prices in chronological order."""
+        if len(self._ts) < self.capacity or self._head == 0:
+            return self._ts, self._px
+        head = self._head
+        return self._ts[head:] + self._ts[:head], self._px[head:] + self._px[:head]
+
+    def query(
+        self, since: float | None = None, max_points: int = MAX_CHART_POINTS
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the points at or after `since`, min/max downsampled to at
+        most `max_points`."""
+        timestamps, prices = self.columns()
+        start = bisect.bisect_left(timestamps, since) if since is not None else 0
+        ts = np.frombuffer(timestamps[start:], dtype=np.float64)
+        px = np.frombuffer(prices[start:], dtype=np.float64)
+        return downsample_min_max(ts, px, max_points)
+
+
+def downsample_min_max(
+    ts: np.ndarray, px: np.ndarray, max_points: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Keeps the minimum and maximum of each of `max_points // 2` equal-count
+    buckets, in time order, so spikes survive the reduction."""
+    count = len(ts)
+    if count <= max_points:
+        return ts, px
+    size = -(-count // max(1, max_points // 2))
+    buckets = -(-count // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:count] = px
+    grid = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.nanargmin(grid, axis=1)
+    highs = offsets + np.nanargmax(grid, axis=1)
+    keep = np.unique(np.concatenate([lows, highs]))
+    return ts[keep], px[keep]
+
+
+def chart_points(
+    history: PriceHistory | None, time_range: str, now: float
+) -> list[PriceDataPoint]:
+    """Builds the recharts series for one of the `CHART_RANGES`."""
+    if history is None or not len(history):
+        return []
+    span = CHART_RANGES.get(time_range)
+    ts, px = history.query(now - span if span is not None else None)
+    label = "%H:%M" if time_range == "1D" else "%m/%d %H:%M"
+    return [
+        PriceDataPoint(
+            time=datetime.datetime.fromtimestamp(timestamp).strftime(label),
+            price=price,
+        )
+        for timestamp, price in zip(ts.tolist(), px.tolist())
+    ]
@@ -0,0 +1,93 @@
+import numpy as np
+
+from app.market_store import MarketStore
+
+TICK = 0.01
+MIN_PRICE = 0.01
+MAX_PRICE = 0.99
+DEFAULT_REQUOTE_TOLERANCE = 0.01
+
+
+class QuoteEngine:
+    """Vectorized inventory-skewed quoting.
+
+    For each market, fair value is the top-of-book mid and the quotes sit
+    `target_spread_bps / 2` (of the $1 payout) either side of a reservation
+    price shifted against inventory by `skew`. Sizes shrink linearly to zero
+    on the side that would grow inventory past `max_inventory`. All markets
+    passed to `requote` are priced in one NumPy pass over the store's
+    columns; a market is only requoted when a price moves by at least
+    `tolerance` or a size changes.
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_REQUOTE_TOLERANCE):
+        self.tolerance = tolerance
+        self.requotes = 0
+        self.suppressed = 0
+
+    def requote(self, markets: MarketStore, market_ids: list[str]) -> dict:
+        """Returns `{market_id: quote fields}` for the markets whose quotes
+        should change."""
+        if not market_ids:
+            return {}
+        rows = markets.rows(market_ids)
+        best_bid = markets.column("best_bid")[rows]
+        best_ask = markets.column("best_ask")[rows]
+        inventory = markets.column("inventory")[rows].astype(np.float64)
+        spread = markets.column("target_spread_bps")[rows] / 10000.0
+        max_inventory = markets.column("max_inventory")[rows].astype(np.float64)
+        size = markets.column("base_quote_size")[rows].astype(np.float64)
+        skew = markets.column("skew")[rows]
+
+        valid = (best_bid > 0) & (best_ask > 0) & (best_ask >= best_bid)
+        fair = (best_bid + best_ask) / 2.0
+        half = np.maximum(spread / 2.0, TICK / 2.0)
+        position = np.clip(inventory / np.maximum(max_inventory, 1.0), -1.0, 1.0)
+        reservation = fair - skew * position * half
+        bid = np.floor(np.round((reservation - half) / TICK, 6)) * TICK
+        ask = np.ceil(np.round((reservation + half) / TICK, 6)) * TICK
+        bid = np.clip(bid, MIN_PRICE, MAX_PRICE - TICK)
+        ask = np.clip(np.maximum(ask, bid + TICK), MIN_PRICE + TICK, MAX_PRICE)
+        bid_size = np.floor(size * (1.0 - np.maximum(position, 0.0)))
+        ask_size = np.floor(size * (1.0 + np.minimum(position, 0.0)))
+
+        current_bid = markets.column("my_bid_price")[rows]
+        current_ask = markets.column("my_ask_price")[rows]
+        current_bid_size = np.nan_to_num(markets.column("my_bid_size")[rows])
+        current_ask_size = np.nan_to_num(markets.column("my_ask_size")[rows])
+        tolerance = self.tolerance - 1e-9
+        moved = (
+            np.isnan(current_bid)
+            | np.isnan(current_ask)
+            | (np.abs(bid - current_bid) >= tolerance)
+            | (np.abs(ask - current_ask) >= tolerance)
+            | (bid_size != current_bid_size)
+            | (ask_size != current_ask_size)
+        )
+        # A market that lost its book is pulled, once.
+        pull = ~valid & ~np.isnan(current_bid)
+        emit = (valid & moved) | pull
+        self.requotes += int(emit.sum())
+        self.suppressed += int((valid & ~moved).sum())
+
+        quotes = {}
+        for index in np.flatnonzero(emit).tolist():
+            if pull[index]:
+                quotes[market_ids[index]] = cleared_quote()
+                continue
+            quotes[market_ids[index]] = {
+                "my_bid_price": round(float(bid[index]), 2),
+                "my_bid_size": int(bid_size[index]),
+                "my_ask_price": round(float(ask[index]), 2),
+                "my_ask_size": int(ask_size[index]),
+            }
+        return quotes
+
+
+def cleared_quote() -> dict:
+    return {
+        "my_bid_price": None,
+        "my_bid_size": None,
+        "my_ask_price": None,
+        "my_ask_size": None,
+    }
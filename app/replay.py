@@ -0,0 +1,424 @@
+"""Offline replay of the Kalshi websocket feed.
+
+Serves recorded or synthetic frames from a local websockets server to a real
+`ShardedKalshiFeed` flushing into a real `BotState`, and reports
+message-to-state latency, throughput and peak RSS.
+
+Run with `python -m app.replay [--recording FILE] [--speed X] ...`.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import random
+import resource
+import time
+from typing import TypedDict
+
+import numpy as np
+import websockets
+
+from app.order_book import OrderBookStore
+
+CHANNEL_FOR_TYPE = {
+    "orderbook_delta": "orderbook_delta",
+    "orderbook_snapshot": "orderbook_delta",
+    "ticker": "ticker",
+}
+
+
+class ReplayReport(TypedDict):
+    frames: int
+    seconds: float
+    msgs_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+    sequence_gaps: int
+    peak_rss_mb: float
+
+
+def synthetic_frames(
+    count: int,
+    tickers: int = 500,
+    rate: float = 5000.0,
+    gap_rate: float = 0.0005,
+    seed: int = 7,
+) -> list[dict]:
+    """Feed frames in the Kalshi v2 shape without `sid` / `seq`: a snapshot
+    per ticker, then mostly order book deltas and some ticker updates.
+
+    `t` is the frame's offset in seconds at `rate` frames per second, and a
+    `skip` on a delta makes the server leave a hole in that subscription's
+    sequence numbers.
+    """
+    rng = random.Random(seed)
+    names = [f"KXREPLAY-{i:05d}" for i in range(tickers)]
+    frames = [
+        {
+            "type": "orderbook_snapshot",
+            "msg": {
+                "market_ticker": ticker,
+                "yes": [[price, rng.randint(1, 500)] for price in range(30, 48)],
+                "no": [[price, rng.randint(1, 500)] for price in range(40, 58)],
+            },
+        }
+        for ticker in names
+    ]
+    for _ in range(max(0, count - len(frames))):
+        ticker = rng.choice(names)
+        if rng.random() < 0.85:
+            frame = {
+                "type": "orderbook_delta",
+                "msg": {
+                    "market_ticker": ticker,
+                    "market_id": f"{ticker}-id",
+                    "price": rng.randint(1, 99),
+                    "delta": rng.randint(-50, 50),
+                    "side": rng.choice(("yes", "no")),
+                    "ts": "2024-01-01T00:00:00Z",
+                },
+            }
+            if rng.random() < gap_rate:
+                frame["skip"] = 1
+        else:
+            bid = rng.randint(1, 98)
+            frame = {
+                "type": "ticker",
+                "msg": {
+                    "market_ticker": ticker,
+                    "market_id": f"{ticker}-id",
+                    "price": bid,
+                    "yes_bid": bid,
+                    "yes_ask": bid + 1,
+                    "volume": rng.randint(0, 100000),
+                    "open_interest": rng.randint(0, 100000),
+                    "ts": 1700000000,
+                },
+            }
+        frames.append(frame)
+    for index, frame in enumerate(frames):
+        frame["t"] = index / rate
+    return frames[:count]
+
+
+def load_recording(path: str) -> list[dict]:
+    """Reads a JSONL capture of raw feed frames. The server re-stamps `sid`
+    and `seq`, so recorded holes in `seq` are kept as `skip`s and `t` is
+    taken from the frame's `recv_ts` when the capture has one."""
+    frames = []
+    last_seq: dict[int, int] = {}
+    started = None
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get("type") not in CHANNEL_FOR_TYPE:
+                continue
+            frame = {"type": data["type"], "msg": data["msg"]}
+            sid, seq = data.get("sid"), data.get("seq")
+            if sid is not None and seq is not None:
+                if sid in last_seq and seq > last_seq[sid] + 1:
+                    frame["skip"] = seq - last_seq[sid] - 1
+                last_seq[sid] = seq
+            received = data.get("recv_ts")
+            if received is not None:
+                started = received if started is None else started
+                frame["t"] = received - started
+            frames.append(frame)
+    return frames
+
+
+def save_recording(path: str, frames: list[dict]):
+    with open(path, "w") as f:
+        f.writelines(
+            json.dumps(frame, separators=(",", ":")) + "\n" for frame in frames
+        )
+
+
+class ReplayServer:
+    """Local stand-in for the Kalshi websocket endpoint.
+
+    Acknowledges `subscribe` commands with fresh sids, then streams the
+    frames to whichever connection subscribed each frame's ticker on the
+    frame's channel, stamping per-subscription `seq` numbers. Send times are
+    kept per connection path so the harness can pair them with the frames
+    the client applied. A subscribe after streaming has started is answered,
+    as the exchange does, with a snapshot of each book streamed so far.
+    """
+
+    def __init__(self, frames: list[dict], speed: float = 0.0):
+        self.frames = frames
+        self.speed = speed
+        self.url = ""
+        self.sent: dict[str, collections.deque] = collections.defaultdict(
+            collections.deque
+        )
+        self.frames_sent = 0
+        self.started_at = 0.0
+        self._routes: dict[tuple[str, str], tuple] = {}
+        self._needed = {
+            (CHANNEL_FOR_TYPE[frame["type"]], frame["msg"]["market_ticker"])
+            for frame in frames
+        }
+        self._books = OrderBookStore()
+        self._ready = asyncio.Event()
+        self._connections: set = set()
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        for websocket in list(self._connections):
+            await websocket.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, websocket):
+        path = websocket.request.path
+        self._connections.add(websocket)
+        next_sid = 1
+        try:
+            async for raw in websocket:
+                command = json.loads(raw)
+                if command.get("cmd") != "subscribe":
+                    continue
+                sid = next_sid
+                next_sid += 1
+                channel = command["params"]["channels"][0]
+                route = (websocket, path, sid, [0])
+                for ticker in command["params"]["market_tickers"]:
+                    self._routes[(channel, ticker)] = route
+                await self._send(
+                    route,
+                    {
+                        "type": "subscribed",
+                        "id": command["id"],
+                        "msg": {"channel": channel, "sid": sid},
+                    },
+                )
+                if self._needed.issubset(self._routes):
+                    self._ready.set()
+                if self.started_at and channel == "orderbook_delta":
+                    await self._send_snapshots(
+                        route, command["params"]["market_tickers"]
+                    )
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self._connections.discard(websocket)
+
+    async def _send_snapshots(self, route: tuple, tickers: list[str]):
+        """Opens a resubscription the way the exchange does, with a snapshot
+        of each book as streamed so far."""
+        for ticker in tickers:
+            book = self._books.get(ticker)
+            if book is None:
+                continue
+            route[3][0] += 1
+            await self._send(
+                route,
+                {
+                    "type": "orderbook_snapshot",
+                    "sid": route[2],
+                    "seq": route[3][0],
+                    "msg": {
+                        "market_ticker": ticker,
+                        "yes": book.levels("yes"),
+                        "no": book.levels("no"),
+                    },
+                },
+            )
+
+    def _track_book(self, frame: dict):
+        msg = frame["msg"]
+        if frame["type"] == "orderbook_snapshot":
+            self._books.apply_snapshot(msg["market_ticker"], msg["yes"], msg["no"])
+        elif frame["type"] == "orderbook_delta":
+            self._books.apply_delta(
+                msg["market_ticker"], msg["side"], msg["price"], msg["delta"]
+            )
+
+    async def _send(self, route: tuple, data: dict):
+        websocket, path, _, _ = route
+        self.sent[path].append(time.monotonic())
+        self.frames_sent += 1
+        await websocket.send(json.dumps(data, separators=(",", ":")))
+
+    async def stream(self, timeout: float = 30.0):
+        """Waits for every needed subscription, then sends all frames, paced
+        by their `t` offsets divided by `speed` (0 sends flat out)."""
+        await asyncio.wait_for(self._ready.wait(), timeout)
+        self.started_at = time.monotonic()
+        for frame in self.frames:
+            if self.speed:
+                delay = self.started_at + frame.get("t", 0.0) / self.speed
+                delay -= time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            msg = frame["msg"]
+            route = self._routes[
+                (CHANNEL_FOR_TYPE[frame["type"]], msg["market_ticker"])
+            ]
+            self._track_book(frame)
+            seq = route[3]
+            seq[0] += 1 + frame.get("skip", 0)
+            await self._send(
+                route,
+                {"type": frame["type"], "sid": route[2], "seq": seq[0], "msg": msg},
+            )
+
+
+class _CountingQueue(asyncio.Queue):
+    """The feed's fan-in queue, counting dequeued frames per shard."""
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.dequeued: collections.Counter = collections.Counter()
+
+    async def get(self):
+        item = await super().get()
+        self.dequeued[item[0].shard_id] += 1
+        return item
+
+
+class ReplayState:
+    """Wraps a `BotState` so the feed's `async with state` blocks work
+    outside a Reflex event; every committed block calls `on_commit`."""
+
+    def __init__(self, state, on_commit):
+        object.__setattr__(self, "_state", state)
+        object.__setattr__(self, "_on_commit", on_commit)
+
+    def __getattr__(self, name):
+        return getattr(self._state, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._state, name, value)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._on_commit()
+
+
+def _make_state(tickers: list[str]):
+    import app.app  # noqa: F401  (registers the state tree)
+    from app.exchanges import kalshi_market
+    from app.state import BotState
+
+    state = BotState(_reflex_internal_init=True)
+    state._reconcile_markets(
+        [
+            kalshi_market(
+                {"ticker": ticker, "title": ticker, "yes_bid": 40, "yes_ask": 60}
+            )
+            for ticker in tickers
+        ],
+        complete=True,
+        venue="kalshi",
+    )
+    state.active_market_id = tickers[0]
+    state.is_bot_running = True
+    return state
+
+
+async def run_replay(
+    frames: list[dict],
+    speed: float = 0.0,
+    shard_count: int = 4,
+    flush_interval: float = 0.05,
+    timeout: float = 120.0,
+) -> ReplayReport:
+    """Replays `frames` through the real feed and state update path."""
+    from app.websocket_client import ShardedKalshiFeed
+
+    tickers = list(dict.fromkeys(frame["msg"]["market_ticker"] for frame in frames))
+    latencies: list[float] = []
+    discarded = [0]
+    committed_at = [0.0]
+    async with ReplayServer(frames, speed) as server:
+        feed = ShardedKalshiFeed(
+            "replay", tickers, shard_count=shard_count, flush_interval=flush_interval
+        )
+        dropped_seen = dict.fromkeys(range(len(feed.shards)), 0)
+        queue = _CountingQueue(feed.queue.maxsize)
+        feed.queue = queue
+        for shard in feed.shards:
+            shard.queue = queue
+            shard.ws_url = f"{server.url}/shard/{shard.shard_id}"
+
+        def on_commit():
+            now = time.monotonic()
+            for shard in feed.shards:
+                # Frames of a subscription dropped after a gap never
+                # reach the queue; they leave the send log unmeasured.
+                sent = server.sent[f"/shard/{shard.shard_id}"]
+                dropped = shard.dropped_frames - dropped_seen[shard.shard_id]
+                dropped_seen[shard.shard_id] = shard.dropped_frames
+                for _ in range(min(dropped, len(sent))):
+                    sent.popleft()
+                discarded[0] += dropped
+                for _ in range(min(queue.dequeued.get(shard.shard_id, 0), len(sent))):
+                    latencies.append(now - sent.popleft())
+            queue.dequeued.clear()
+            committed_at[0] = now
+
+        state = ReplayState(_make_state(tickers), on_commit)
+        task = asyncio.create_task(feed.run(state))
+        await server.stream()
+        deadline = time.monotonic() + timeout
+        while (
+            len(latencies) + discarded[0] < server.frames_sent
+            and time.monotonic() < deadline
+        ):
+            await asyncio.sleep(flush_interval)
+        state.is_bot_running = False
+    await task
+    seconds = max(committed_at[0] - server.started_at, 1e-9)
+    millis = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    return ReplayReport(
+        frames=len(frames),
+        seconds=round(seconds, 3),
+        msgs_per_sec=round(len(frames) / seconds, 1),
+        p50_ms=round(float(np.percentile(millis, 50)), 3),
+        p99_ms=round(float(np.percentile(millis, 99)), 3),
+        max_ms=round(float(millis.max()), 3),
+        sequence_gaps=feed.update_buffer.stats["sequence_gaps"],
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recording", help="JSONL capture to replay")
+    parser.add_argument("--save", help="write the replayed frames to this file")
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=5000.0)
+    parser.add_argument("--gap-rate", type=float, default=0.0005)
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = max speed")
+    parser.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+    if args.recording:
+        frames = load_recording(args.recording)
+    else:
+        frames = synthetic_frames(args.frames, args.tickers, args.rate, args.gap_rate)
+    if args.save:
+        save_recording(args.save, frames)
+    report = asyncio.run(run_replay(frames, args.speed, args.shards))
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from app.market_store import MarketStore
+from app.models import Exposure, RiskTotals
+
+
+class RiskEngine:
+    """Incremental position, PnL and exposure accounting.
+
+    Per-market inventory, average cost and realized/unrealized PnL live in
+    the market store. Each market holding a position also contributes its
+    net exposure (inventory x mid) and unrealized PnL to running portfolio
+    totals and to per-venue and per-series buckets. A fill or a mid change
+    swaps that one market's old contribution for its new one, so every
+    update is O(1) however many markets there are. Realized PnL only ever
+    accumulates, including for markets that have since been retired.
+    """
+
+    def __init__(self):
+        self._contributions: dict[str, tuple[str, str, float, float]] = {}
+        self.realized_pnl = 0.0
+        self.unrealized_pnl = 0.0
+        self.gross_exposure = 0.0
+        self.net_exposure = 0.0
+        self.by_venue: dict[str, list[float]] = {}
+        self.by_series: dict[str, list[float]] = {}
+        self.version = 0
+
+    def apply_fill(
+        self, markets: MarketStore, market_id: str, count: int, price: float
+    ):
+        """Books a fill of `count` yes contracts (negative for a sale) at
+        `price`, realizing PnL on the part that reduces the position."""
+        inventory = markets.get(market_id, "inventory")
+        avg_cost = markets.get(market_id, "avg_cost")
+        realized = markets.get(market_id, "realized_pnl")
+        if inventory == 0 or (inventory > 0) == (count > 0):
+            held = abs(inventory)
+            avg_cost = (avg_cost * held + price * abs(count)) / (held + abs(count))
+        else:
+            closed = min(abs(count), abs(inventory))
+            pnl = closed * (price - avg_cost) * (1 if inventory > 0 else -1)
+            realized += pnl
+            self.realized_pnl += pnl
+            if abs(count) > abs(inventory):
+                avg_cost = price
+            elif abs(count) == abs(inventory):
+                avg_cost = 0.0
+        markets.update(
+            market_id,
+            {
+                "inventory": inventory + count,
+                "avg_cost": avg_cost,
+                "realized_pnl": realized,
+            },
+        )
+        self.version += 1
+        self._revalue(markets, market_id)
+
+    def mark(self, markets: MarketStore, market_ids: list[str]):
+        """Revalues the markets among `market_ids` that hold a position,
+        after their top of book moved."""
+        if not self._contributions:
+            return
+        for market_id in market_ids:
+            if market_id in self._contributions:
+                self._revalue(markets, market_id)
+
+    def restore(self, markets: MarketStore, market_ids: list[str]):
+        """Books positions and realized PnL loaded from the market cache."""
+        for market_id in market_ids:
+            self.realized_pnl += markets.get(market_id, "realized_pnl")
+            self._revalue(markets, market_id)
+        self.version += 1
+
+    def forget(self, market_id: str):
+        """Drops a retired market's exposure; its realized PnL is kept."""
+        old = self._contributions.pop(market_id, None)
+        if old is not None:
+            self._add(*old, -1)
+            self.version += 1
+
+    def _revalue(self, markets: MarketStore, market_id: str):
+        inventory = markets.get(market_id, "inventory")
+        best_bid = markets.get(market_id, "best_bid")
+        best_ask = markets.get(market_id, "best_ask")
+        if best_bid and best_ask and best_ask >= best_bid:
+            mark = (best_bid + best_ask) / 2.0
+        else:
+            # No usable book: carry the position at cost until one returns.
+            mark = markets.get(market_id, "avg_cost")
+        net = inventory * mark
+        unrealized = inventory * (mark - markets.get(market_id, "avg_cost"))
+        markets.set(market_id, "unrealized_pnl", unrealized)
+        old = self._contributions.pop(market_id, None)
+        if old is not None:
+            if old[2] == net and old[3] == unrealized:
+                self._contributions[market_id] = old
+                return
+            self._add(*old, -1)
+        if inventory:
+            contribution = (
+                markets.get(market_id, "venue"),
+                markets.get(market_id, "series"),
+                net,
+                unrealized,
+            )
+            self._contributions[market_id] = contribution
+            self._add(*contribution, 1)
+        self.version += 1
+
+    def _add(self, venue: str, series: str, net: float, unrealized: float, sign: int):
+        self.net_exposure += sign * net
+        self.gross_exposure += sign * abs(net)
+        self.unrealized_pnl += sign * unrealized
+        for buckets, name in ((self.by_venue, venue), (self.by_series, series)):
+            bucket = buckets.setdefault(name, [0, 0.0, 0.0, 0.0])
+            bucket[0] += sign
+            if not bucket[0]:
+                # Last position in the bucket closed; drop float residue.
+                del buckets[name]
+                continue
+            bucket[1] += sign * abs(net)
+            bucket[2] += sign * net
+            bucket[3] += sign * unrealized
+        if not self._contributions and sign < 0:
+            self.net_exposure = self.gross_exposure = self.unrealized_pnl = 0.0
+
+    def totals(self) -> RiskTotals:
+        return RiskTotals(
+            positions=len(self._contributions),
+            unrealized_pnl=round(self.unrealized_pnl, 2),
+            realized_pnl=round(self.realized_pnl, 2),
+            gross_exposure=round(self.gross_exposure, 2),
+            net_exposure=round(self.net_exposure, 2),
+        )
+
+    def exposures(self, by: str = "venue", limit: int | None = None) -> list[Exposure]:
+        """Per-venue or per-series exposure, largest gross first."""
+        buckets = self.by_venue if by == "venue" else self.by_series
+        rows = sorted(buckets.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            Exposure(
+                name=name or "-",
+                gross=round(gross, 2),
+                net=round(net, 2),
+                unrealized_pnl=round(unrealized, 2),
+            )
+            for name, (_, gross, net, unrealized) in rows[:limit]
+        ]
@@ -0,0 +1,174 @@
+import numpy as np
+
+DENSE_POSTING_THRESHOLD = 512
+
+
+def _grams(text: str) -> set[str]:
+    """All distinct 1-, 2- and 3-character substrings of `text` that do not
+    span the ticker/description separator."""
+    grams = {text[i : i + 3] for i in range(len(text) - 2)}
+    grams.update(text[i : i + 2] for i in range(len(text) - 1))
+    grams.update(text)
+    return {gram for gram in grams if "\n" not in gram}
+
+
+class MarketSearchIndex:
+    """Substring index over market tickers and descriptions.
+
+    Each market gets a row number in insertion order, and every 1-, 2- and
+    3-gram of its lowercased "ticker\\ndescription" has a posting of the rows
+    containing it. Postings start as sets and are promoted to bitsets once
+    they pass `DENSE_POSTING_THRESHOLD` rows, so rare trigrams stay small
+    and common grams stay cheap to intersect. A query of up to three
+    characters is a single posting lookup; longer queries intersect the
+    postings of their trigrams, driven by the rarest one, and substring-check
+    only the surviving rows. Adds and removes touch one posting per gram.
+    """
+
+    def __init__(self):
+        self._rows: dict[str, int] = {}
+        self._ids: list[str | None] = []
+        self._texts: list[str] = []
+        self._postings: dict[str, set[int] | bytearray] = {}
+        self._counts: dict[str, int] = {}
+        self.version = 0
+        self._memo: tuple[str, int, list[str]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, market_id: str) -> bool:
+        return market_id in self._rows
+
+    def upsert(self, market_id: str, ticker: str, description: str):
+        text = f"{ticker}\n{description}".lower()
+        row = self._rows.get(market_id)
+        if row is not None:
+            if self._texts[row] == text:
+                return
+            self._unindex(row)
+        else:
+            row = len(self._ids)
+            self._rows[market_id] = row
+            self._ids.append(market_id)
+            self._texts.append("")
+        self._texts[row] = text
+        postings = self._postings
+        counts = self._counts
+        byte, bit = row >> 3, 1 << (row & 7)
+        for gram in _grams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = {row}
+                counts[gram] = 1
+                continue
+            if type(posting) is set:
+                posting.add(row)
+                if len(posting) > DENSE_POSTING_THRESHOLD:
+                    postings[gram] = posting = self._to_bitset(posting)
+            else:
+                if byte >= len(posting):
+                    posting.extend(bytes(byte + 1 - len(posting) + len(posting) // 2))
+                posting[byte] |= bit
+            counts[gram] += 1
+        self.version += 1
+
+    def remove(self, market_id: str):
+        row = self._rows.pop(market_id, None)
+        if row is None:
+            return
+        self._unindex(row)
+        self._ids[row] = None
+        self._texts[row] = ""
+        self.version += 1
+        if len(self._ids) > 2 * len(self._rows) + DENSE_POSTING_THRESHOLD:
+            self.compact()
+
+    def _unindex(self, row: int):
+        byte, bit = row >> 3, 1 << (row & 7)
+        for gram in _grams(self._texts[row]):
+            posting = self._postings[gram]
+            if type(posting) is set:
+                posting.discard(row)
+            else:
+                posting[byte] &= ~bit
+            self._counts[gram] -= 1
+            if not self._counts[gram]:
+                del self._postings[gram]
+                del self._counts[gram]
+
+    def _to_bitset(self, rows: set[int]) -> bytearray:
+        bits = bytearray((len(self._ids) + 7) // 8)
+        for row in rows:
+            bits[row >> 3] |= 1 << (row & 7)
+        return bits
+
+    def compact(self):
+        """Rebuilds the index without the rows of removed markets."""
+        live = [
+            (market_id, self._texts[row])
+            for market_id, row in sorted(self._rows.items(), key=lambda item: item[1])
+        ]
+        version = self.version
+        self.__init__()
+        for market_id, text in live:
+            ticker, _, description = text.partition("\n")
+            self.upsert(market_id, ticker, description)
+        self.version = version + 1
+
+    def _match_rows(self, needle: str) -> list[int]:
+        if len(needle) <= 3:
+            grams = [needle]
+        else:
+            grams = list({needle[i : i + 3] for i in range(len(needle) - 2)})
+        if any(gram not in self._postings for gram in grams):
+            return []
+        grams.sort(key=self._counts.__getitem__)
+        postings = [self._postings[gram] for gram in grams]
+        driver = postings[0]
+        if type(driver) is set:
+            rows = sorted(driver)
+            for posting in postings[1:]:
+                if type(posting) is set:
+                    rows = [row for row in rows if row in posting]
+                else:
+                    size = len(posting)
+                    rows = [
+                        row
+                        for row in rows
+                        if row >> 3 < size and posting[row >> 3] >> (row & 7) & 1
+                    ]
+        else:
+            size = (len(self._ids) + 7) // 8
+            bits = np.zeros(size, dtype=np.uint8)
+            bits[: len(driver)] = np.frombuffer(driver, dtype=np.uint8)[:size]
+            for posting in postings[1:]:
+                other = np.zeros(size, dtype=np.uint8)
+                other[: len(posting)] = np.frombuffer(posting, dtype=np.uint8)[:size]
+                bits &= other
+            rows = np.flatnonzero(np.unpackbits(bits, bitorder="little")).tolist()
+        if len(needle) > 3:
+            texts = self._texts
+            rows = [row for row in rows if needle in texts[row]]
+        return rows
+
+    def search(self, query: str) -> list[str] | None:
+        """Returns the ids of markets whose ticker or description contains
+        `query` (case-insensitive), in insertion order, or None for an empty
+        query. A comma-separated query matches any of its terms. The last
+        result is memoized until the index changes."""
+        needle = query.lower()
+        if not needle.strip(", "):
+            return None
+        memo = self._memo
+        if memo and memo[0] == needle and memo[1] == self.version:
+            return memo[2]
+        if "," in needle:
+            terms = {term.strip() for term in needle.split(",")} - {""}
+            rows = sorted(set().union(*(self._match_rows(term) for term in terms)))
+        else:
+            rows = self._match_rows(needle)
+        ids = self._ids
+        result = [ids[row] for row in rows]
+        self._memo = (needle, self.version, result)
+        return result
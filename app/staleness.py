@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import os
+import time
+
+from app import kalshi_api
+from app.exchanges import kalshi_market
+from app.metrics import metrics
+from app.quote_engine import cleared_quote
+
+STALE_AFTER = float(os.getenv("STALE_AFTER_SECONDS", "10"))
+CHECK_INTERVAL = 1.0
+REFRESH_CONCURRENCY = 8
+LOGGED_TICKERS = 10
+
+staleness_watchdogs: dict[str, "StalenessWatchdog"] = {}
+
+_stale_markets = metrics.counter(
+    "stale_markets_total", "Quoting markets pulled for lack of feed updates."
+)
+_stale_refreshes = metrics.counter(
+    "stale_refreshes_total", "REST refreshes of markets pulled as stale."
+)
+
+
+class StalenessWatchdog:
+    """Pulls quotes from markets whose feed can no longer be trusted.
+
+    A market's prices are current while its feed is live, however quiet the
+    market is. They go stale `stale_after` seconds after its shard drops or
+    its book starts resyncing (per `feed.unhealthy_since`), unless an update
+    (`update_buffer.last_seen`) or a REST refresh confirmed them since.
+
+    Live tickers cost nothing per tick. A tick asks the feed for its
+    outages (`feed.outages`) and arms a deadline in a min-heap for each
+    watched ticker of an outage it has not seen before; entries left behind
+    by `forget` or a re-arm are dropped when popped. A popped ticker whose
+    feed has recovered is disarmed; one that got data since is re-armed for
+    when that would go stale, and one that missed its deadline is pulled
+    and checked again `stale_after` seconds later while it stays unhealthy.
+    Stale markets that were quoting have quoting disabled and their quotes
+    cleared, then are refetched one by one through `get_market`. Quoting
+    stays off until the operator turns it back on, which restarts the clock.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        feed,
+        stale_after: float = STALE_AFTER,
+        check_interval: float = CHECK_INTERVAL,
+        refresh_concurrency: int = REFRESH_CONCURRENCY,
+    ):
+        self.api_key = api_key
+        self.feed = feed
+        self.stale_after = stale_after
+        self.check_interval = check_interval
+        self.refresh_concurrency = refresh_concurrency
+        self.pulled = 0
+        self.refreshed = 0
+        self._heap: list[tuple[float, str]] = []
+        self._watched: dict[str, float] = {}
+        self._deadlines: dict[str, float] = {}
+        # outage key -> its start, for the outages already armed
+        self._outages: dict[tuple, float] = {}
+
+    def watch(self, tickers: list[str], now: float | None = None):
+        """Starts, or restarts, the staleness clock for `tickers` at `now`."""
+        now = time.monotonic() if now is None else now
+        for ticker in tickers:
+            self._watched[ticker] = now
+            if (
+                ticker not in self._deadlines
+                and self.feed.unhealthy_since(ticker) is not None
+            ):
+                self._schedule(ticker, now + self.stale_after)
+
+    def forget(self, tickers: list[str]):
+        for ticker in tickers:
+            self._watched.pop(ticker, None)
+            self._deadlines.pop(ticker, None)
+
+    def _schedule(self, ticker: str, deadline: float):
+        self._deadlines[ticker] = deadline
+        heapq.heappush(self._heap, (deadline, ticker))
+
+    def due(self, now: float) -> list[str]:
+        """Arms the tickers of new outages, then pops the ones that went
+        stale and restarts their clock."""
+        outages = {}
+        for key, since, tickers in self.feed.outages():
+            outages[key] = since
+            if self._outages.get(key) == since:
+                continue
+            for ticker in tickers:
+                deadline = self._deadlines.get(ticker)
+                if ticker in self._watched and (
+                    deadline is None or deadline > since + self.stale_after
+                ):
+                    self._schedule(ticker, since + self.stale_after)
+        self._outages = outages
+
+        last_seen = self.feed.update_buffer.last_seen
+        heap = self._heap
+        stale = []
+        while heap and heap[0][0] <= now:
+            deadline, ticker = heapq.heappop(heap)
+            if self._deadlines.get(ticker) != deadline:
+                continue
+            since = self.feed.unhealthy_since(ticker)
+            if since is None:
+                del self._deadlines[ticker]
+                continue
+            trusted = max(since, self._watched[ticker], last_seen.get(ticker, 0.0))
+            if trusted + self.stale_after > now:
+                self._schedule(ticker, trusted + self.stale_after)
+                continue
+            stale.append(ticker)
+            self._watched[ticker] = now
+            self._schedule(ticker, now + self.stale_after)
+        return stale
+
+    async def check(self, state) -> list[str]:
+        """Runs one tick and returns the tickers whose quotes were pulled."""
+        stale = self.due(time.monotonic())
+        if not stale:
+            return []
+        async with state:
+            markets = state._plain_markets()
+            gone = [ticker for ticker in stale if ticker not in markets]
+            self.forget(gone)
+            pulled = [
+                ticker
+                for ticker in stale
+                if ticker in markets and markets.get(ticker, "quoting_active")
+            ]
+            if pulled:
+                for ticker in pulled:
+                    markets.update(ticker, {"quoting_active": False, "enabled": False})
+                state._apply_quotes({ticker: cleared_quote() for ticker in pulled})
+                shown = ", ".join(pulled[:LOGGED_TICKERS])
+                more = len(pulled) - LOGGED_TICKERS
+                state._add_log(
+                    "warning",
+                    f"Pulled quotes on {len(pulled)} markets whose feed has been "
+                    f"down or resyncing for {self.stale_after:g}s: {shown}"
+                    + (f" and {more} more" if more > 0 else "")
+                    + ". Refreshing them over REST.",
+                )
+        if pulled:
+            self.pulled += len(pulled)
+            _stale_markets.inc(len(pulled))
+            await self.refresh(state, pulled)
+        return pulled
+
+    async def refresh(self, state, tickers: list[str]):
+        """Refetches `tickers` through `get_market` and merges the results."""
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
+
+        async def fetch(ticker: str) -> dict | None:
+            async with semaphore:
+                response = await kalshi_api.get_market(self.api_key, ticker)
+            if "error" in response or not response.get("market"):
+                self.feed.update_buffer.log(
+                    "warning",
+                    f"Stale market refresh failed for {ticker}: "
+                    f"{response.get('error', 'no market in response')}",
+                )
+                return None
+            return response["market"]
+
+        fetched = [
+            market
+            for market in await asyncio.gather(*(fetch(ticker) for ticker in tickers))
+            if market is not None
+        ]
+        if not fetched:
+            return
+        self.refreshed += len(fetched)
+        _stale_refreshes.inc(len(fetched))
+        self.watch([market["ticker"] for market in fetched])
+        async with state:
+            _, _, retired = state._reconcile_markets(
+                [kalshi_market(market) for market in fetched], False, "kalshi"
+            )
+        if retired:
+            self.forget(retired)
+            await self.feed.remove_tickers(retired)
+
+    async def run(self, state):
+        """Checks every `check_interval` seconds while the bot is running."""
+        while state.is_bot_running:
+            await asyncio.sleep(self.check_interval)
+            await self.check(state)
@@ -1,7 +1,55 @@
-import reflex as rx
 import asyncio
+import time
 from typing import Literal
-from app.models import Market, OrderBookLevel, TradeFill, StrategyParams, PriceDataPoint
+
+import numpy as np
+import reflex as rx
+
+from app.activity_log import LOG_LEVELS, activity_log
+from app.market_cache import CACHED_FIELDS, market_cache
+from app.market_store import PARAM_FIELDS, MarketStore
+from app.market_view import SORT_KEYS, MarketView, page_count
+from app.metrics import metrics
+from app.models import (
+    Exposure,
+    FeedStats,
+    KillSwitchReport,
+    LogEntry,
+    Market,
+    MetricSummary,
+    OrderStats,
+    PriceDataPoint,
+    RiskTotals,
+    ShardStats,
+    StrategyParams,
+    VenueMarket,
+    VenueStats,
+)
+from app.price_history import PriceHistory, chart_points
+from app.quote_engine import QuoteEngine, cleared_quote
+from app.risk import RiskEngine
+from app.search_index import MarketSearchIndex
+
+LOG_VIEW_SIZE = 200
+SERIES_EXPOSURE_ROWS = 5
+DEFAULT_STRATEGY_PARAMS = StrategyParams(
+    target_spread_bps=200,
+    max_inventory=1000,
+    base_quote_size=100,
+    skew=0.5,
+    enabled=False,
+)
+# Strategy params the bulk form can patch, with their parsers; `enabled`
+# follows quoting and is set through `set_bulk_quoting`.
+BULK_PARAM_TYPES = {
+    field: StrategyParams.__annotations__[field]
+    for field in PARAM_FIELDS
+    if field != "enabled"
+}
+BULK_SCOPES = ("filtered", "series")
+_fetch_markets_seconds = metrics.histogram(
+    "fetch_markets_seconds", "End-to-end time of a market fetch and reconcile."
+)
 
 
 class BotState(rx.State):
@@ -13,61 +61,133 @@ class BotState(rx.State):
     kalshi_api_key: str = rx.LocalStorage("", name="kalshi_api_key")
     kalshi_secret_key: str = rx.LocalStorage("", name="kalshi_secret_key")
     polymarket_api_key: str = rx.LocalStorage("", name="polymarket_api_key")
-    markets: dict[str, Market] = {}
+    _markets: MarketStore = MarketStore()
+    _search_index: MarketSearchIndex = MarketSearchIndex()
     active_market_id: str | None = None
-    log_messages: list[dict[str, str]] = []
+    log_entries: list[LogEntry] = []
+    log_level: str = "all"
+    _log_cursor: int = 0
     show_kill_switch_dialog: bool = False
     search_query: str = ""
     items_per_page: int = 10
+    current_page: int = 1
+    sort_key: str = "default"
+    bulk_scope: str = "filtered"
+    bulk_series: str = ""
+    _market_view: MarketView = MarketView()
+    _price_histories: dict[str, PriceHistory] = rx.field(default_factory=dict)
+    _closed_markets: set[str] = rx.field(default_factory=set)
+    _unpriced_markets: set[str] = rx.field(default_factory=set)
+    _history_version: int = 0
+    _series_version: int = 0
+    _quote_engine: QuoteEngine = QuoteEngine()
+    _risk: RiskEngine = RiskEngine()
+    _risk_version: int = 0
     chart_time_range: str = "1D"
+    feed_stats: FeedStats = FeedStats(
+        messages=0,
+        merged=0,
+        dropped=0,
+        flushes=0,
+        last_flush_size=0,
+        last_lock_ms=0.0,
+        max_lock_ms=0.0,
+        reconnects=0,
+        sequence_gaps=0,
+        last_recovery_ms=0.0,
+        max_recovery_ms=0.0,
+    )
+    shard_stats: list[ShardStats] = rx.field(default_factory=list)
+    kill_switch_report: KillSwitchReport | None = None
+    risk_totals: RiskTotals = RiskTotals(
+        positions=0,
+        unrealized_pnl=0.0,
+        realized_pnl=0.0,
+        gross_exposure=0.0,
+        net_exposure=0.0,
+    )
+    venue_exposure: list[Exposure] = rx.field(default_factory=list)
+    series_exposure: list[Exposure] = rx.field(default_factory=list)
+    venue_stats: list[VenueStats] = rx.field(default_factory=list)
+    metric_summaries: list[MetricSummary] = rx.field(default_factory=list)
+    order_stats: OrderStats = OrderStats(
+        open=0,
+        in_flight=0,
+        created=0,
+        amended=0,
+        canceled=0,
+        rejected=0,
+        fills=0,
+        throttled=0,
+    )
+
+    def _ordered_market_ids(self) -> list[str]:
+        """Filtered and sorted market ids, shared by the paging computed vars."""
+        return self._market_view.ordered_ids(
+            self._markets,
+            self._search_index.search(self.search_query),
+            self.sort_key,
+            self._search_index.version,
+        )
+
+    def _clamp_page(self):
+        """Pulls `current_page` back onto the last page when the filtered
+        markets shrank under it."""
+        pages = page_count(len(self._ordered_market_ids()), self.items_per_page)
+        if self.current_page > pages:
+            self.current_page = pages
 
     @rx.var
     def active_markets(self) -> list[Market]:
-        """Returns a list of all active markets, filtered by search query."""
-        markets_list = list(self.markets.values())
-        if self.search_query:
-            search_lower = self.search_query.lower()
-            markets_list = [
-                market
-                for market in markets_list
-                if search_lower in market["ticker"].lower()
-                or search_lower in market["description"].lower()
-            ]
-        return markets_list[: self.items_per_page]
+        """Returns the current page of markets, filtered by search query."""
+        ordered_ids = self._ordered_market_ids()
+        page = min(self.current_page, page_count(len(ordered_ids), self.items_per_page))
+        return self._market_view.page(
+            self._markets, ordered_ids, page, self.items_per_page
+        )
 
     @rx.var
     def filtered_markets_count(self) -> int:
-        if not self.search_query:
-            return len(self.markets)
-        search_lower = self.search_query.lower()
-        return len(
-            [
-                market
-                for market in self.markets.values()
-                if search_lower in market["ticker"].lower()
-                or search_lower in market["description"].lower()
-            ]
-        )
+        return len(self._ordered_market_ids())
+
+    @rx.var
+    def total_pages(self) -> int:
+        return page_count(len(self._ordered_market_ids()), self.items_per_page)
+
+    @rx.var(deps=["_series_version"], auto_deps=False)
+    def series_names(self) -> list[str]:
+        return self._markets.series_names()
+
+    @rx.var
+    def bulk_target_count(self) -> int:
+        """How many markets a bulk action would touch."""
+        if self.bulk_scope == "series":
+            return (
+                self._markets.series_size(self.bulk_series) if self.bulk_series else 0
+            )
+        return len(self._ordered_market_ids())
 
     @rx.var
     def selected_market(self) -> Market | None:
         """Returns the currently selected market for the detail view."""
-        if self.active_market_id and self.active_market_id in self.markets:
-            return self.markets[self.active_market_id]
+        if self.active_market_id and self.active_market_id in self._markets:
+            return self._markets.materialize(self.active_market_id)
         return None
 
-    @rx.var
+    @rx.var(
+        deps=["_history_version", "active_market_id", "chart_time_range"],
+        auto_deps=False,
+    )
     def price_history_for_range(self) -> list[PriceDataPoint]:
-        if not self.selected_market:
+        """Reads the ring buffer directly, so feed flushes that only move the
+        markets do not recompute the chart."""
+        if not self.active_market_id:
             return []
-        history = self.selected_market.get("price_history", [])
-        if self.chart_time_range == "1D":
-            return history[-24:]
-        elif self.chart_time_range == "1W":
-            return history[-168:]
-        elif self.chart_time_range == "1M":
-            return history[-720:]
-        return history
+        return chart_points(
+            self._price_histories.get(self.active_market_id),
+            self.chart_time_range,
+            time.time(),
+        )
 
     @rx.event
     def set_chart_time_range(self, time_range: str):
@@ -76,7 +196,32 @@ class BotState(rx.State):
     @rx.event
     def set_items_per_page(self, count: str):
         self.items_per_page = int(count)
-        yield BotState.fetch_markets
+        self.current_page = 1
+
+    @rx.event
+    def set_search_query(self, query: str):
+        """Filters the loaded markets and, when the query names series or
+        events, loads theirs too."""
+        from app.exchanges import search_terms
+
+        self.search_query = query
+        self.current_page = 1
+        if search_terms(query):
+            return BotState.fetch_markets
+
+    @rx.event
+    def set_sort_key(self, sort_key: str):
+        if sort_key in SORT_KEYS:
+            self.sort_key = sort_key
+            self.current_page = 1
+
+    @rx.event
+    def next_page(self):
+        self.current_page = min(self.current_page + 1, self.total_pages)
+
+    @rx.event
+    def prev_page(self):
+        self.current_page = max(self.current_page - 1, 1)
 
     @rx.event
     def save_credentials(self):
@@ -95,20 +240,92 @@ class BotState(rx.State):
     def toggle_kill_switch_dialog(self):
         self.show_kill_switch_dialog = not self.show_kill_switch_dialog
 
-    @rx.event
-    def activate_kill_switch(self):
-        """Immediately stops all quoting."""
-        self.global_kill_switch_active = True
-        self.is_bot_running = False
-        self._add_log(
-            "error", "GLOBAL KILL SWITCH ACTIVATED. All quoting has been stopped."
+    @rx.event(background=True)
+    async def activate_kill_switch(self):
+        """Stops all quoting and mass-cancels every open order on every
+        connected venue.
+
+        The cancels run outside the state lock, one venue alongside the
+        other; the report's `elapsed_ms` is measured from the moment this
+        handler starts.
+        """
+        from app.exchanges import adapters_for
+        from app.kill_switch import TARGET_MS, cancel_everything, merge_reports
+        from app.order_manager import order_managers
+
+        pressed_at = time.monotonic()
+        async with self:
+            self.global_kill_switch_active = True
+            self.is_bot_running = False
+            self.show_kill_switch_dialog = False
+            client_token = self.router.session.client_token
+            adapters = adapters_for(
+                client_token, self.kalshi_api_key, self.polymarket_api_key
+            )
+            order_manager = order_managers.get(client_token)
+            order_ids = order_manager.halt() if order_manager is not None else []
+            markets = self._plain_markets()
+            quoted = markets.ids_where(
+                ~np.isnan(markets.column("my_bid_price"))
+                | ~np.isnan(markets.column("my_ask_price"))
+            )
+            self._apply_quotes({market_id: cleared_quote() for market_id in quoted})
+            self._add_log(
+                "error", "GLOBAL KILL SWITCH ACTIVATED. All quoting has been stopped."
+            )
+        outcomes = dict(
+            zip(
+                adapters,
+                await asyncio.gather(
+                    *(
+                        cancel_everything(
+                            adapter.api_key,
+                            order_ids if venue == "kalshi" else [],
+                            pressed_at,
+                            exchange=adapter,
+                        )
+                        for venue, adapter in adapters.items()
+                    )
+                ),
+            )
         )
-        self.show_kill_switch_dialog = False
+        report = merge_reports([report for report, _ in outcomes.values()])
+        if order_manager is not None:
+            _, failed = outcomes.get("kalshi", (None, []))
+            order_manager.forget(order_ids, failed)
+        async with self:
+            self.kill_switch_report = report
+            level = (
+                "error"
+                if report["failed"]
+                or report["listing_failed"]
+                or report["elapsed_ms"] > TARGET_MS
+                else "warning"
+            )
+            self._add_log(
+                level,
+                f"Kill switch canceled {report['canceled']} of "
+                f"{report['requested']} orders in {report['elapsed_ms']} ms "
+                f"({report['already_gone']} already gone, {report['failed']} failed, "
+                f"{report['retries']} retries).",
+            )
+            if report["listing_failed"]:
+                self._add_log(
+                    "error",
+                    f"Kill switch could not list resting orders on "
+                    f"{report['listing_failed']} venue(s); orders placed outside "
+                    "this session may still be live.",
+                )
 
     @rx.event
     def deactivate_kill_switch(self):
         """Resumes bot operation."""
+        from app.order_manager import order_managers
+
         self.global_kill_switch_active = False
+        order_manager = order_managers.get(self.router.session.client_token)
+        if order_manager is not None:
+            order_manager.resume()
         self.is_bot_running = True
         self._add_log(
             "info", "Global kill switch deactivated. Bot resuming operations."
@@ -117,40 +334,179 @@ class BotState(rx.State):
     @rx.event
     def toggle_market_quoting(self, market_id: str):
         """Toggles the quoting status for a single market."""
-        if market_id in self.markets:
-            is_enabled = not self.markets[market_id]["quoting_active"]
-            self.markets[market_id]["quoting_active"] = is_enabled
-            self.markets[market_id]["strategy_params"]["enabled"] = is_enabled
+        markets = self._plain_markets()
+        if market_id in markets:
+            is_enabled = not markets.get(market_id, "quoting_active")
+            if is_enabled and market_id in self._closed_markets:
+                return rx.toast.error(
+                    f"{markets.get(market_id, 'ticker')} is closed.", duration=3000
+                )
+            markets.update(
+                market_id, {"quoting_active": is_enabled, "enabled": is_enabled}
+            )
+            self._touch_markets()
+            if is_enabled:
+                self._restart_staleness_clock([market_id])
+                self._requote([market_id])
+            else:
+                self._apply_quotes({market_id: cleared_quote()})
             status = "enabled" if is_enabled else "disabled"
             self._add_log(
                 "info",
-                f"Quoting for market {self.markets[market_id]['ticker']} has been {status}.",
+                f"Quoting for market {markets.get(market_id, 'ticker')} has been {status}.",
             )
 
+    def _restart_staleness_clock(self, market_ids: list[str]):
+        """Gives markets the operator just turned back on a full staleness
+        window before the watchdog can pull them again."""
+        from app.staleness import staleness_watchdogs
+
+        watchdog = staleness_watchdogs.get(self.router.session.client_token)
+        if watchdog is None:
+            return
+        markets = self._plain_markets()
+        watchdog.watch(
+            [
+                market_id
+                for market_id in market_ids
+                if markets.get(market_id, "venue") == "kalshi"
+            ]
+        )
+
     @rx.event
     def update_strategy_params(self, market_id: str, new_params: StrategyParams):
         """Updates strategy parameters for a market."""
-        if market_id in self.markets:
-            self.markets[market_id]["strategy_params"].update(new_params)
-            self._add_log(
-                "info",
-                f"Strategy parameters for {self.markets[market_id]['ticker']} updated.",
-            )
+        markets = self._plain_markets()
+        if market_id in markets:
+            markets.update(market_id, new_params)
+            self._touch_markets()
+            self._requote([market_id])
+            ticker = markets.get(market_id, "ticker")
+            self._add_log("info", f"Strategy parameters for {ticker} updated.")
             rx.toast.info(
-                f"Strategy updated for {self.markets[market_id]['ticker']}",
+                f"Strategy updated for {ticker}",
                 duration=3000,
             )
 
+    def _bulk_target_ids(self) -> list[str]:
+        """The markets in the bulk scope: the current search results, or
+        every market in the chosen series."""
+        if self.bulk_scope == "series":
+            if not self.bulk_series:
+                return []
+            return self._plain_markets().ids_in_series(self.bulk_series)
+        return self._ordered_market_ids()
+
+    def _bulk_scope_label(self) -> str:
+        if self.bulk_scope == "series":
+            return f" in series {self.bulk_series}"
+        if self.search_query:
+            return f" matching '{self.search_query}'"
+        return ""
+
+    @rx.event
+    def set_bulk_scope(self, scope: str):
+        if scope in BULK_SCOPES:
+            self.bulk_scope = scope
+
+    @rx.event
+    def set_bulk_series(self, series: str):
+        self.bulk_series = series
+
+    @rx.event
+    def apply_bulk_params(self, form_data: dict):
+        """Applies the filled-in strategy params to every market in the bulk
+        scope in one write, requotes the ones that changed and logs a single
+        summary."""
+        patch = {}
+        for field, kind in BULK_PARAM_TYPES.items():
+            value = str(form_data.get(field) or "").strip()
+            if not value:
+                continue
+            try:
+                patch[field] = kind(value)
+            except ValueError:
+                return rx.toast.error(f"Invalid {field}: {value}", duration=3000)
+            if kind is int and patch[field] < 0:
+                return rx.toast.error(f"{field} must not be negative", duration=3000)
+        if not patch:
+            return rx.toast.info("No strategy parameters to apply.", duration=3000)
+        market_ids = self._bulk_target_ids()
+        if not market_ids:
+            return rx.toast.info("No markets in scope.", duration=3000)
+        changed = self._plain_markets().update_many(market_ids, patch)
+        if changed:
+            self._touch_markets()
+            self._requote(changed)
+        summary = ", ".join(f"{field}={value}" for field, value in patch.items())
+        self._add_log(
+            "info",
+            f"Bulk update: set {summary} on {len(changed)} of {len(market_ids)} "
+            f"markets{self._bulk_scope_label()}.",
+        )
+        return rx.toast.info(
+            f"Strategy updated for {len(changed)} markets", duration=3000
+        )
+
+    @rx.event
+    def set_bulk_quoting(self, enabled: bool):
+        """Turns quoting on or off for every market in the bulk scope."""
+        market_ids = self._bulk_target_ids()
+        if enabled and self._closed_markets:
+            market_ids = [
+                market_id
+                for market_id in market_ids
+                if market_id not in self._closed_markets
+            ]
+        if not market_ids:
+            return rx.toast.info("No markets in scope.", duration=3000)
+        changed = self._plain_markets().update_many(
+            market_ids, {"quoting_active": enabled, "enabled": enabled}
+        )
+        if changed:
+            self._touch_markets()
+            if enabled:
+                self._restart_staleness_clock(changed)
+                self._requote(changed)
+            else:
+                self._apply_quotes(
+                    {market_id: cleared_quote() for market_id in changed}
+                )
+        status = "enabled" if enabled else "disabled"
+        self._add_log(
+            "info",
+            f"Quoting {status} for {len(changed)} of {len(market_ids)} "
+            f"markets{self._bulk_scope_label()}.",
+        )
+        return rx.toast.info(
+            f"Quoting {status} for {len(changed)} markets", duration=3000
+        )
+
     @rx.event
     def set_active_market_id(self, market_id: str):
         self.active_market_id = market_id
 
     @rx.event(background=True)
     async def on_load_dashboard(self):
-        """Fetches markets when the dashboard loads."""
+        """Renders cached markets, then fetches fresh ones, when the
+        dashboard loads."""
         async with self:
-            if not self.markets:
-                yield BotState.fetch_markets
+            self._sync_log_view()
+            if not self._markets:
+                yield BotState.load_cached_markets
+
+    @rx.event(background=True)
+    async def load_cached_markets(self):
+        """Restores the markets saved by the market cache, if none are
+        loaded yet, then reconciles them with the API in the background."""
+        rows, prices = await asyncio.to_thread(market_cache.load)
+        async with self:
+            if rows and not self._markets:
+                self._restore_markets(rows, prices)
+                self._add_log("info", f"Restored {len(rows)} markets from cache.")
+                if self.active_market_id not in self._markets:
+                    self.active_market_id = next(iter(self._markets), None)
+            yield BotState.fetch_markets
 
     @rx.event
     async def on_load_market_detail(self):
@@ -158,7 +514,7 @@ class BotState(rx.State):
         market_id = self.router.page.params.get("market_id")
         if not market_id:
             return
-        if not self.markets or market_id not in self.markets:
+        if not self._markets or market_id not in self._markets:
             return BotState.fetch_markets_and_set_active(market_id)
         else:
             self.active_market_id = market_id
@@ -167,23 +523,10 @@ class BotState(rx.State):
     def fetch_markets_and_set_active(self, market_id: str):
         """A chained event to fetch markets and then set the active one."""
         self.active_market_id = market_id
+        if not self._markets:
+            return BotState.load_cached_markets
         return BotState.fetch_markets
 
-    @rx.event(background=True)
-    async def poll_market_data(self):
-        """Periodically polls the bot controller for fresh market data."""
-        async with self:
-            if not self.kalshi_api_key:
-                self._add_log(
-                    "error",
-                    "Bot stopped. Kalshi API key not set. Please add it on the settings page.",
-                )
-                self.is_bot_running = False
-                return
-        while self.is_bot_running:
-            await self.fetch_markets()
-            await asyncio.sleep(5)
-
     @rx.event
     def start_bot(self):
         self.is_bot_running = True
@@ -196,100 +539,420 @@ class BotState(rx.State):
         self._add_log("warning", "Bot stopped. Disconnecting from real-time feeds.")
 
     def _add_log(self, level: str, message: str):
-        """Adds a message to the log."""
-        import datetime
+        """Adds a message to the activity log and pulls it into the view."""
+        activity_log.append(level, message)
+        self._sync_log_view()
 
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        self.log_messages.insert(
-            0, {"level": level, "message": f"{timestamp} - {message}"}
+    def _log_levels(self) -> set[str] | None:
+        return None if self.log_level == "all" else {self.log_level}
+
+    def _sync_log_view(self):
+        """Appends the entries logged since the last pull to the visible
+        window. Does nothing, and so pushes nothing, when there are none."""
+        new_entries = activity_log.since(
+            self._log_cursor, self._log_levels(), LOG_VIEW_SIZE
         )
-        if len(self.log_messages) > 100:
-            self.log_messages.pop()
+        self._log_cursor = activity_log.last_id
+        if new_entries:
+            self.log_entries = (self.log_entries + new_entries)[-LOG_VIEW_SIZE:]
+
+    @rx.event
+    def set_log_level(self, level: str):
+        if level != "all" and level not in LOG_LEVELS:
+            return
+        self.log_level = level
+        self.log_entries = activity_log.tail(LOG_VIEW_SIZE, self._log_levels())
+        self._log_cursor = activity_log.last_id
 
     @rx.event(background=True)
     async def fetch_markets(self):
-        from app.kalshi_api import get_markets
+        """Fetches every venue's markets, or, when the search query names
+        series or events, just theirs, merged into the loaded ones."""
+        from app.exchanges import adapters_for, search_terms
+        from app.staleness import staleness_watchdogs
 
+        started = time.perf_counter()
         async with self:
-            api_key = self.kalshi_api_key
-            series_ticker = self.search_query if len(self.search_query) > 2 else None
-        response_data = await get_markets(
-            api_key,
-            status="open",
-            limit=self.items_per_page,
-            series_ticker=series_ticker,
+            adapters = list(
+                adapters_for(
+                    self.router.session.client_token,
+                    self.kalshi_api_key,
+                    self.polymarket_api_key,
+                ).values()
+            )
+            terms = search_terms(self.search_query)
+        responses = await asyncio.gather(
+            *(
+                adapter.search_markets(terms) if terms else adapter.fetch_markets()
+                for adapter in adapters
+            )
         )
+        changes = []
         async with self:
-            if "error" in response_data:
-                self._add_log("error", f"API Error: {response_data['error']}")
-                self.connection_status["kalshi"] = "failed"
-                return
-            if api_key:
-                self.connection_status["kalshi"] = "connected"
-            raw_markets = response_data.get("markets", [])
-            self._add_log("info", f"Fetched {len(raw_markets)} markets from Kalshi.")
-            if raw_markets:
-                self.markets.clear()
-            strategy_template = {
-                "target_spread_bps": 200,
-                "max_inventory": 1000,
-                "base_quote_size": 100,
-                "skew": 0.5,
-                "enabled": False,
-            }
-            for market_data in raw_markets:
-                market_id = market_data["ticker"]
-                price_history = [
-                    PriceDataPoint(time="10:00", price=0.5),
-                    PriceDataPoint(time="10:05", price=0.52),
-                    PriceDataPoint(time="10:10", price=0.51),
-                    PriceDataPoint(time="10:15", price=0.53),
-                    PriceDataPoint(time="10:20", price=0.55),
-                ]
-                if market_id not in self.markets:
-                    self.markets[market_id] = Market(
-                        market_id=market_id,
-                        ticker=market_data["ticker"],
-                        description=market_data["title"],
-                        best_bid=market_data.get("yes_bid", 0) / 100.0,
-                        best_ask=market_data.get("yes_ask", 0) / 100.0,
-                        my_bid_price=None,
-                        my_bid_size=None,
-                        my_ask_price=None,
-                        my_ask_size=None,
-                        inventory=0,
-                        unrealized_pnl=0.0,
-                        quoting_active=False,
-                        total_volume=market_data.get("volume_total", 0),
-                        price_history=price_history,
-                        strategy_params=strategy_template.copy(),
-                        order_book=[],
-                        recent_trades=[],
-                    )
-                else:
-                    self.markets[market_id]["best_bid"] = (
-                        market_data.get("yes_bid", 0) / 100.0
-                    )
-                    self.markets[market_id]["best_ask"] = (
-                        market_data.get("yes_ask", 0) / 100.0
+            for adapter, response_data in zip(adapters, responses):
+                venue = adapter.venue
+                self._publish_venue_stats(adapter.venue_stats())
+                if "error" in response_data:
+                    self._add_log(
+                        "error", f"{venue.title()} API Error: {response_data['error']}"
                     )
-            if not self.active_market_id and self.markets:
-                self.active_market_id = list(self.markets.keys())[0]
+                    self.connection_status[venue] = "failed"
+                    continue
+                if adapter.api_key:
+                    self.connection_status[venue] = "connected"
+                venue_markets = response_data["markets"]
+                complete = not terms
+                reconcile_started = time.perf_counter()
+                added, updated, retired = self._reconcile_markets(
+                    venue_markets, complete, venue
+                )
+                metrics.histogram(
+                    "market_reconcile_seconds",
+                    "Time to merge one venue's fetched markets into the store.",
+                    venue=venue,
+                ).observe(time.perf_counter() - reconcile_started)
+                self._add_log(
+                    "info",
+                    f"Fetched {len(venue_markets)} markets from {venue.title()} "
+                    f"({len(added)} new, {updated} changed, {len(retired)} retired).",
+                )
+                changes.append((adapter, added, retired))
+            if self.active_market_id not in self._markets:
+                self.active_market_id = next(iter(self._markets), None)
+        watchdog = staleness_watchdogs.get(self.router.session.client_token)
+        for adapter, added, retired in changes:
+            if adapter.feed is not None:
+                await adapter.feed.add_tickers(added)
+                await adapter.feed.remove_tickers(retired)
+            if watchdog is not None and adapter.venue == "kalshi":
+                watchdog.watch(added)
+                watchdog.forget(retired)
+        _fetch_markets_seconds.observe(time.perf_counter() - started)
+
+    @rx.event
+    def refresh_metrics(self):
+        """Pulls the current metrics into the diagnostics panel."""
+        self.metric_summaries = metrics.summaries()
+
+    def _plain_markets(self) -> MarketStore:
+        """The market store without any Reflex proxy around it. The store's
+        writes are not tracked, so callers that write must call
+        `_touch_markets` afterwards."""
+        markets = self._markets
+        return getattr(markets, "__wrapped__", markets)
+
+    def _touch_markets(self):
+        self.dirty_vars.add("_markets")
+        self._mark_dirty()
+        market_cache.mark_dirty(self._plain_markets(), self._price_histories)
+
+    def _requote(self, market_ids: list[str]):
+        """Reprices the given markets that are quoting and writes the quotes
+        the engine decided to move."""
+        if self.global_kill_switch_active or not market_ids:
+            return
+        markets = self._plain_markets()
+        known = [market_id for market_id in market_ids if market_id in markets]
+        quoting_rows = markets.column("quoting_active")[markets.rows(known)]
+        quoting = [
+            market_id for market_id, quoting in zip(known, quoting_rows) if quoting
+        ]
+        self._apply_quotes(self._quote_engine.requote(markets, quoting))
+
+    def _revalue(self, market_ids: list[str]):
+        """Marks the positions among `market_ids` to their new mids."""
+        self._risk.mark(self._plain_markets(), market_ids)
+        self._publish_risk()
+
+    def _apply_fill(self, market_id: str, count: int, price: float):
+        """Books a fill of `count` yes contracts (negative for a sale)."""
+        self._risk.apply_fill(self._plain_markets(), market_id, count, price)
+        self._touch_markets()
+        self._publish_risk()
+
+    def _publish_risk(self):
+        """Pushes the portfolio totals, if they moved since the last push."""
+        if self._risk.version == self._risk_version:
+            return
+        self._risk_version = self._risk.version
+        self.risk_totals = self._risk.totals()
+        self.venue_exposure = self._risk.exposures("venue")
+        self.series_exposure = self._risk.exposures("series", SERIES_EXPOSURE_ROWS)
+
+    def _publish_venue_stats(self, stats: VenueStats):
+        """Replaces one venue's row of the per-venue feed and REST stats."""
+        rows = [row for row in self.venue_stats if row["venue"] != stats["venue"]]
+        rows.append(stats)
+        self.venue_stats = sorted(rows, key=lambda row: row["venue"])
+
+    def _apply_quotes(self, quotes: dict[str, dict]):
+        """Writes quote fields into the markets and hands the Kalshi ones to
+        the running order manager, if any."""
+        if not quotes:
+            return
+        from app.order_manager import order_managers
+
+        markets = self._plain_markets()
+        for market_id, quote in quotes.items():
+            markets.update(market_id, quote)
+        self._touch_markets()
+        order_manager = order_managers.get(self.router.session.client_token)
+        if order_manager is not None:
+            for market_id, quote in quotes.items():
+                if markets.get(market_id, "venue") == "kalshi":
+                    order_manager.set_quotes(market_id, quote)
+
+    def _record_price(self, market_id: str, timestamp: float, price: float):
+        """Appends a price point to the market's ring buffer and invalidates
+        the chart if the market is the one being viewed."""
+        history = self._price_histories.get(market_id)
+        if history is None:
+            history = self._price_histories[market_id] = PriceHistory()
+        history.append(timestamp, price)
+        if market_id == self.active_market_id:
+            self._history_version += 1
+
+    def _reconcile_markets(
+        self, venue_markets: list[VenueMarket], complete: bool, venue: str
+    ) -> tuple[list[str], int, list[str]]:
+        """Merges one venue's normalized markets into `self._markets` in place
+        and returns the added ids, the number of changed markets and the
+        retired ids.
+
+        Only fields whose value changed are written, so operator state
+        (strategy params, quoting flag, inventory, order book, history) is kept
+        and an unchanged poll leaves the markets var clean. Changed markets
+        are requoted and revalued, so no quote outlives the prices it was
+        computed from; so are markets restored from the cache whose prices the
+        fetch confirmed. Markets reported as closed are retired; when
+        `complete` is set the response covers the venue's whole open universe,
+        so its markets missing from it are retired too. A market due for
+        retirement that still holds inventory, quotes or orders is kept as
+        closed instead, with quoting off, until it holds none.
+        """
+        markets = self._plain_markets()
+        added = []
+        retired = []
+        changed = []
+        seen = set()
+        now = time.time()
+        for market in venue_markets:
+            market_id = market["market_id"]
+            if market["closed"]:
+                if market_id in markets:
+                    retired.append(market_id)
+                continue
+            seen.add(market_id)
+            fields = {
+                "description": market["description"],
+                "best_bid": market["best_bid"],
+                "best_ask": market["best_ask"],
+                "total_volume": market["total_volume"],
+            }
+            if market["last_price"]:
+                self._record_price(market_id, now, market["last_price"])
+            if market_id not in markets:
+                description = fields.pop("description")
+                markets.add(
+                    market_id,
+                    market["ticker"],
+                    description,
+                    fields,
+                    DEFAULT_STRATEGY_PARAMS,
+                    venue=market["venue"],
+                    series=market["series"],
+                )
+                self._search_index.upsert(market_id, market["ticker"], description)
+                added.append(market_id)
+                continue
+            if markets.update(market_id, fields):
+                self._search_index.upsert(
+                    market_id,
+                    markets.get(market_id, "ticker"),
+                    markets.get(market_id, "description"),
+                )
+                changed.append(market_id)
+        repriced = []
+        if self._unpriced_markets:
+            repriced = list(self._unpriced_markets.intersection(seen))
+            self._unpriced_markets.difference_update(seen)
+        if complete:
+            retired.extend(
+                market_id
+                for market_id in markets
+                if market_id not in seen and markets.get(market_id, "venue") == venue
+            )
+        if self._closed_markets:
+            self._closed_markets.difference_update(seen)
+        retired, held = self._split_retired(list(dict.fromkeys(retired)))
+        for market_id in retired:
+            markets.remove(market_id)
+            self._search_index.remove(market_id)
+            self._price_histories.pop(market_id, None)
+            if market_id == self.active_market_id:
+                self._history_version += 1
+            self._risk.forget(market_id)
+            self._closed_markets.discard(market_id)
+            self._unpriced_markets.discard(market_id)
+        if retired:
+            market_cache.retire(retired)
+        if held:
+            self._close_markets(held)
+        changed = [market_id for market_id in changed if market_id in markets]
+        self._requote(
+            [
+                market_id
+                for market_id in dict.fromkeys(changed + repriced)
+                if market_id in markets
+            ]
+        )
+        self._revalue(changed)
+        if added or changed or retired:
+            self._touch_markets()
+            self._publish_risk()
+            self._clamp_page()
+        if self._series_version != markets.series_epoch:
+            self._series_version = markets.series_epoch
+        return added, len(changed), retired
+
+    def _split_retired(self, market_ids: list[str]) -> tuple[list[str], list[str]]:
+        """Splits markets due for retirement into the ones safe to drop and
+        the ones still holding inventory, quotes or orders."""
+        from app.order_manager import order_managers
+
+        if not market_ids:
+            return [], []
+        markets = self._plain_markets()
+        rows = markets.rows(market_ids)
+        held = markets.column("inventory")[rows] != 0
+        for field in ("my_bid_price", "my_ask_price"):
+            held |= ~np.isnan(markets.column(field)[rows])
+        order_manager = order_managers.get(self.router.session.client_token)
+        if order_manager is not None:
+            held |= [order_manager.has_orders(market_id) for market_id in market_ids]
+        return (
+            [market_id for market_id, keep in zip(market_ids, held) if not keep],
+            [market_id for market_id, keep in zip(market_ids, held) if keep],
+        )
+
+    def _close_markets(self, market_ids: list[str]):
+        """Turns quoting off on markets the venue closed while they still
+        hold a position or orders, and pulls their quotes."""
+        closing = [
+            market_id
+            for market_id in market_ids
+            if market_id not in self._closed_markets
+        ]
+        if not closing:
+            return
+        self._closed_markets.update(closing)
+        markets = self._plain_markets()
+        markets.update_many(closing, {"quoting_active": False, "enabled": False})
+        self._apply_quotes({market_id: cleared_quote() for market_id in closing})
+        shown = ", ".join(closing[:10])
+        more = len(closing) - 10
+        self._add_log(
+            "warning",
+            f"{len(closing)} closed markets still hold positions or orders and "
+            f"were kept with quoting off: {shown}"
+            + (f" and {more} more" if more > 0 else "")
+            + ".",
+        )
+
+    def _restore_markets(
+        self, rows: list[dict], prices: dict[str, list[tuple[float, float]]]
+    ):
+        """Loads cached market rows and price points into an empty store and
+        revalues them. The cached prices may be days old, so the markets are
+        restored unquoted and are only quoted once a fetch reprices them."""
+        markets = self._plain_markets()
+        for row in rows:
+            market_id = row["market_id"]
+            markets.add(
+                market_id,
+                row["ticker"],
+                row["description"],
+                {
+                    field: row[field]
+                    for field in CACHED_FIELDS
+                    if field not in PARAM_FIELDS
+                },
+                StrategyParams(**{field: row[field] for field in PARAM_FIELDS}),
+                venue=row["venue"],
+                series=row["series"],
+            )
+            self._search_index.upsert(market_id, row["ticker"], row["description"])
+        self._unpriced_markets.update(markets)
+        histories = self._price_histories
+        histories = getattr(histories, "__wrapped__", histories)
+        for market_id, points in prices.items():
+            if market_id in markets:
+                history = histories[market_id] = PriceHistory()
+                for timestamp, price in points:
+                    history.append(timestamp, price)
+        self._history_version += 1
+        self._series_version = markets.series_epoch
+        self._risk.restore(
+            markets,
+            markets.ids_where(
+                (markets.column("inventory") != 0)
+                | (markets.column("realized_pnl") != 0)
+            ),
+        )
+        self._touch_markets()
+        self._publish_risk()
+        self._clamp_page()
 
     @rx.event(background=True)
     async def run_websocket_client(self):
-        from app.websocket_client import KalshiWebsocketClient
+        from app.exchanges import adapters_for, release_feeds
+        from app.market_sync import ReconciliationSweep
+        from app.order_manager import OrderManager, order_managers
+        from app.staleness import StalenessWatchdog, staleness_watchdogs
 
         async with self:
             if not self.kalshi_api_key:
                 self._add_log("error", "Cannot start bot: Kalshi API key is not set.")
                 self.is_bot_running = False
                 return
-            market_tickers = list(self.markets.keys())
-            if not market_tickers:
+            markets = self._plain_markets()
+            if not len(markets):
                 self._add_log("warning", "No markets to monitor. Stopping bot.")
                 self.is_bot_running = False
                 return
-            client = KalshiWebsocketClient(self.kalshi_api_key, market_tickers)
+            client_token = self.router.session.client_token
+            adapters = adapters_for(
+                client_token, self.kalshi_api_key, self.polymarket_api_key
+            )
+            feeds = []
+            venue_ids = {}
+            for adapter in adapters.values():
+                market_ids = venue_ids[adapter.venue] = [
+                    market_id
+                    for market_id in markets
+                    if markets.get(market_id, "venue") == adapter.venue
+                ]
+                if market_ids or adapter.venue == "kalshi":
+                    feeds.append(adapter.create_feed(market_ids))
+            kalshi_feed = adapters["kalshi"].feed
+            order_manager = OrderManager(self.kalshi_api_key)
+            sweep = ReconciliationSweep(self.kalshi_api_key, kalshi_feed)
+            watchdog = StalenessWatchdog(self.kalshi_api_key, kalshi_feed)
+            watchdog.watch(venue_ids["kalshi"])
+            order_managers[client_token] = order_manager
+            staleness_watchdogs[client_token] = watchdog
+            for market_id in markets.ids_where(markets.column("quoting_active")):
+                if markets.get(market_id, "venue") == "kalshi":
+                    order_manager.set_quotes(market_id, markets.materialize(market_id))
             yield
-        await client.connect(self)
\ No newline at end of file
+        try:
+            await asyncio.gather(
+                *(feed.run(self) for feed in feeds),
+                order_manager.run(self),
+                sweep.run(self),
+                watchdog.run(self),
+            )
+        finally:
+            release_feeds(client_token)
+            order_managers.pop(client_token, None)
+            staleness_watchdogs.pop(client_token, None)
@@ -0,0 +1,34 @@
+from app.cache import TTLCache
+
+
+def test_entries_expire_after_their_ttl():
+    now = [0.0]
+    cache = TTLCache(8, 10.0, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30.0)
+    now[0] = 9.9
+    assert cache.get("a") == 1
+    now[0] = 10.0
+    # A hit refreshes recency, not expiry.
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert (cache.hits, cache.misses) == (2, 1)
+    now[0] = 30.0
+    assert cache.get("b", "gone") == "gone"
+    assert len(cache) == 0
+
+
+def test_set_purges_expired_entries_then_evicts_least_recent():
+    now = [0.0]
+    cache = TTLCache(2, 10.0, clock=lambda: now[0])
+    cache.set("old", 0, ttl=1.0)
+    cache.set("a", 1)
+    now[0] = 5.0
+    cache.set("b", 2)
+    # "old" expired and was purged, so nothing was evicted to make room.
+    assert cache.evictions == 0
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.evictions == 1
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
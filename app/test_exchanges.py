@@ -0,0 +1,23 @@
+from app import exchanges
+from app.exchanges import SESSION_IDLE_TTL, adapters_for, release_feeds
+
+
+def test_idle_sessions_are_dropped(monkeypatch):
+    monkeypatch.setattr(exchanges, "exchange_adapters", {})
+    monkeypatch.setattr(exchanges, "_last_used", {})
+    running = adapters_for("running", "kalshi-key", "")
+    running["kalshi"].feed = object()
+    stopped = adapters_for("stopped", "kalshi-key", "poly-key")
+    stopped["polymarket"].token_ids["will-it"] = "yes-0"
+    release_feeds("stopped")
+    assert adapters_for("stopped", "kalshi-key", "poly-key") is stopped
+    assert stopped["polymarket"].token_ids == {"will-it": "yes-0"}
+
+    for token in ("running", "stopped"):
+        exchanges._last_used[token] -= SESSION_IDLE_TTL
+    adapters_for("other", "kalshi-key", "")
+    # A session whose feed still runs is kept however long since its last call.
+    assert set(exchanges.exchange_adapters) == {"running", "other"}
+    assert set(exchanges._last_used) == {"running", "other"}
+    release_feeds("running")
+    assert running["kalshi"].feed is None
@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import kalshi_api
+from app.cache import TTLCache
+
+MARKETS = {"markets": [{"ticker": "KX-A"}], "cursor": ""}
+
+
+@pytest.fixture
+def venue(monkeypatch):
+    """A markets endpoint that answers slowly and tags its body with an
+    ETag, recording the requests it gets."""
+    requests: list[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=MARKETS, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(kalshi_api, "_client_options", {})
+    monkeypatch.setattr(kalshi_api, "_client", None)
+    monkeypatch.setattr(kalshi_api, "_responses", TTLCache(16, 1.0))
+    monkeypatch.setattr(kalshi_api, "_in_flight", {})
+    kalshi_api.configure_client(transport=httpx.MockTransport(handler))
+    return requests
+
+
+def test_identical_calls_share_one_request(venue):
+    async def scenario():
+        return await asyncio.gather(
+            *(kalshi_api.get_markets("key", limit=10) for _ in range(20))
+        )
+
+    responses = asyncio.run(scenario())
+    assert len(venue) == 1
+    assert all(response is responses[0] for response in responses)
+    assert responses[0] == MARKETS
+    assert kalshi_api._in_flight == {}
+
+
+def test_fresh_response_is_reused_and_stale_one_revalidated(venue):
+    async def scenario():
+        first = await kalshi_api.get_markets("key", limit=10)
+        cached = await kalshi_api.get_markets("key", limit=10)
+        assert len(venue) == 1
+        # Once past its fresh-until time the response is revalidated with
+        # the stored ETag.
+        key = next(iter(kalshi_api._responses._entries))
+        _, etag, body = kalshi_api._responses.get(key)
+        kalshi_api._responses.set(key, (0.0, etag, body))
+        revalidated = await kalshi_api.get_markets("key", limit=10)
+        return first, cached, revalidated
+
+    first, cached, revalidated = asyncio.run(scenario())
+    assert cached is first
+    assert len(venue) == 2
+    assert venue[0].headers.get("if-none-match") is None
+    assert venue[1].headers["if-none-match"] == '"v1"'
+    # The 304 reused the stored body.
+    assert revalidated is first
+
+
+def test_errors_are_not_cached(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, json=MARKETS)
+
+    monkeypatch.setattr(kalshi_api, "_client_options", {})
+    monkeypatch.setattr(kalshi_api, "_client", None)
+    monkeypatch.setattr(kalshi_api, "_responses", TTLCache(16, 1.0))
+    monkeypatch.setattr(kalshi_api, "_in_flight", {})
+    kalshi_api.configure_client(transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        return [await kalshi_api.get_markets("key", limit=10) for _ in range(2)]
+
+    failed, retried = asyncio.run(scenario())
+    assert "503" in failed["error"]
+    assert retried == MARKETS
+    assert len(calls) == 2
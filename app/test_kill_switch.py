@@ -0,0 +1,170 @@
+import asyncio
+import base64
+import time
+
+import pytest
+
+from app import kalshi_api, polymarket_api
+from app.exchanges import PolymarketAdapter
+from app.kalshi_api import BATCH_ORDER_LIMIT
+from app.kill_switch import TARGET_MS, cancel_everything
+from app.mock_exchange import MockExchange, MockPolymarket
+from app.order_manager import OrderManager
+
+ORDER_COUNT = 1000
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    exchange = MockExchange(latency=0.02, seed=7)
+    monkeypatch.setattr(kalshi_api, "_client_options", {})
+    monkeypatch.setattr(kalshi_api, "_client", None)
+    kalshi_api.configure_client(transport=exchange.transport())
+    return exchange
+
+
+@pytest.fixture
+def polymarket(monkeypatch):
+    venue = MockPolymarket(secret=base64.urlsafe_b64encode(b"secret").decode())
+    monkeypatch.setattr(polymarket_api, "_client_options", {})
+    monkeypatch.setattr(polymarket_api, "_client", None)
+    monkeypatch.setattr(polymarket_api, "API_SECRET", venue.secret)
+    monkeypatch.setattr(polymarket_api, "API_PASSPHRASE", "passphrase")
+    monkeypatch.setattr(polymarket_api, "WALLET_ADDRESS", "0xabc")
+    polymarket_api.configure_client(transport=venue.transport())
+    return venue
+
+
+async def _place_orders(count: int) -> list[str]:
+    payloads = [
+        {
+            "ticker": f"KX-TEST-{i % 100}",
+            "client_order_id": f"test-{i}",
+            "side": "yes",
+            "action": "buy" if i % 2 else "sell",
+            "type": "limit",
+            "count": 10,
+            "yes_price": 40 if i % 2 else 60,
+        }
+        for i in range(count)
+    ]
+    responses = await asyncio.gather(
+        *(
+            kalshi_api.batch_create_orders("key", payloads[i : i + BATCH_ORDER_LIMIT])
+            for i in range(0, count, BATCH_ORDER_LIMIT)
+        )
+    )
+    return [
+        result["order"]["order_id"]
+        for response in responses
+        for result in response["orders"]
+    ]
+
+
+def test_cancels_1000_orders_within_target(exchange):
+    async def scenario():
+        order_ids = await _place_orders(ORDER_COUNT)
+        exchange.fail_rate = 0.05
+        # The panel only knows about most of them; the rest must be found by
+        # listing the account's resting orders.
+        return await cancel_everything("key", order_ids[:900], time.monotonic())
+
+    report, _ = asyncio.run(scenario())
+    assert exchange.resting_orders() == []
+    assert report["requested"] == ORDER_COUNT
+    assert report["canceled"] == ORDER_COUNT
+    assert report["failed"] == 0
+    assert report["elapsed_ms"] < TARGET_MS
+
+
+def test_orders_already_gone_are_not_failures(exchange):
+    async def scenario():
+        order_ids = await _place_orders(100)
+        for order_id in order_ids[:30]:
+            exchange.fill(order_id)
+        return await cancel_everything(
+            "key", order_ids + ["order-unknown"], time.monotonic()
+        )
+
+    report, _ = asyncio.run(scenario())
+    assert exchange.resting_orders() == []
+    assert report["canceled"] == 70
+    assert report["already_gone"] == 31
+    assert report["failed"] == 0
+
+
+def test_polymarket_cancels_are_signed(polymarket):
+    for i in range(150):
+        polymarket.add_order(f"0x{i}", "token", 0.4, 10)
+    report, _ = asyncio.run(
+        cancel_everything(
+            "key", [], time.monotonic(), exchange=PolymarketAdapter("key")
+        )
+    )
+    assert polymarket.orders == {}
+    assert report["canceled"] == 150
+    assert report["listing_failed"] == 0
+
+
+def test_listing_failure_is_reported(polymarket, monkeypatch):
+    polymarket.add_order("0x1", "token", 0.4, 10)
+    monkeypatch.setattr(
+        polymarket_api, "API_SECRET", base64.urlsafe_b64encode(b"wrong").decode()
+    )
+    report, _ = asyncio.run(
+        cancel_everything(
+            "key", [], time.monotonic(), exchange=PolymarketAdapter("key")
+        )
+    )
+    assert list(polymarket.orders) == ["0x1"]
+    assert report["listing_failed"] == 1
+    # Nothing was acknowledged, so there is no latency to report.
+    assert report["elapsed_ms"] == 0.0
+
+
+def test_throttled_cancels_end_canceled_or_reported_failed(exchange):
+    async def scenario():
+        order_ids = await _place_orders(ORDER_COUNT)
+        exchange.fail_rate = 0.05
+        exchange.max_requests_per_second = 40
+        report, failed = await cancel_everything("key", order_ids, time.monotonic())
+        return order_ids, report, failed
+
+    order_ids, report, failed = asyncio.run(scenario())
+    resting = {order["order_id"] for order in exchange.resting_orders()}
+    assert exchange.rejected_for_rate > 0
+    # Every order is either cancelled or handed back as failed.
+    assert resting == set(failed) <= set(order_ids)
+    assert report["failed"] == len(failed)
+    assert report["canceled"] + report["failed"] == ORDER_COUNT
+    assert report["elapsed_ms"] < TARGET_MS
+
+
+def test_orders_whose_cancel_failed_stay_tracked(exchange):
+    quote = {
+        "my_bid_price": 0.4,
+        "my_bid_size": 10,
+        "my_ask_price": 0.6,
+        "my_ask_size": 10,
+    }
+
+    async def scenario():
+        manager = OrderManager("key", rate_limit=1000.0)
+        for i in range(100):
+            manager.set_quotes(f"KX-{i}", quote)
+        await manager.flush()
+        order_ids = manager.halt()
+        exchange.max_requests_per_second = 5
+        _, failed = await cancel_everything("key", order_ids, time.monotonic())
+        manager.forget(order_ids, failed)
+        tracked = {order["order_id"] for order in manager.orders.values()}
+        exchange.max_requests_per_second = None
+        manager.resume()
+        await manager.cancel_all()
+        return failed, tracked, len(manager.orders)
+
+    failed, tracked, left = asyncio.run(scenario())
+    assert failed
+    assert tracked == set(failed)
+    assert exchange.resting_orders() == []
+    assert left == 0
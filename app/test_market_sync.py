@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+from app import kalshi_api, market_sync
+from app.market_sync import ReconciliationSweep
+from app.replay import ReplayState, _make_state
+
+TICKERS = ["KX-A", "KX-B", "KX-GONE"]
+
+
+class FakeFeed:
+    def __init__(self):
+        self.update_buffer = SimpleNamespace(last_seen={}, log=lambda *args: None)
+        self.connected = True
+
+    def shard_for(self, ticker):
+        return SimpleNamespace(stats={"connected": self.connected})
+
+    async def remove_tickers(self, tickers):
+        pass
+
+
+def _sweep(monkeypatch, now: list[float]):
+    requested = []
+
+    async def get_markets(api_key, status=None, limit=100, tickers=None):
+        requested.append(list(tickers))
+        # KX-GONE is unknown to the exchange and never comes back.
+        return {
+            "markets": [
+                {"ticker": ticker, "title": ticker, "yes_bid": 40, "yes_ask": 60}
+                for ticker in tickers
+                if ticker != "KX-GONE"
+            ]
+        }
+
+    monkeypatch.setattr(kalshi_api, "get_markets", get_markets)
+    monkeypatch.setattr(market_sync.time, "monotonic", lambda: now[0])
+    feed = FakeFeed()
+    sweep = ReconciliationSweep("key", feed, quiet_after=60, max_backoff=240)
+    state = ReplayState(_make_state(TICKERS), lambda: None)
+    return sweep, feed, state, requested
+
+
+def test_sweep_marks_only_returned_markets_seen(monkeypatch):
+    now = [0.0]
+    sweep, feed, state, requested = _sweep(monkeypatch, now)
+    now[0] = 60.0
+    assert asyncio.run(sweep.sweep(state)) == 2
+    assert requested == [TICKERS]
+    assert feed.update_buffer.last_seen == {"KX-A": 60.0, "KX-B": 60.0}
+
+
+def test_quiet_markets_back_off_until_the_feed_speaks(monkeypatch):
+    now = [0.0]
+    sweep, feed, state, requested = _sweep(monkeypatch, now)
+    swept_at = []
+    for second in range(0, 1200, 15):
+        now[0] = float(second)
+        if second == 615:
+            feed.update_buffer.last_seen["KX-A"] = now[0]
+        count = len(requested)
+        asyncio.run(sweep.sweep(state))
+        if len(requested) > count:
+            swept_at.append((second, sorted(requested[-1])))
+    # Waits double from 60s up to the 240s cap; the feed's update on KX-A at
+    # 615s restarts its wait at 60s.
+    assert swept_at == [
+        (60, TICKERS),
+        (180, TICKERS),
+        (420, TICKERS),
+        (660, ["KX-B", "KX-GONE"]),
+        (675, ["KX-A"]),
+        (795, ["KX-A"]),
+        (900, ["KX-B", "KX-GONE"]),
+        (1035, ["KX-A"]),
+        (1140, ["KX-B", "KX-GONE"]),
+    ]
@@ -0,0 +1,71 @@
+from app.order_book import OrderBook, OrderBookStore
+
+
+def _book() -> OrderBook:
+    book = OrderBook("KX-A")
+    book.apply_snapshot(yes=[[38, 5], [40, 10], [35, 7]], no=[[55, 3], [52, 8]])
+    return book
+
+
+def test_no_bids_are_yes_asks():
+    book = _book()
+    # The best no bid at 55 is a yes ask at 100 - 55.
+    assert book.top_of_book_cents() == (40, 45)
+    assert book.best_bid() == 0.40
+    assert book.best_ask() == 0.45
+
+
+def test_delta_to_zero_clears_the_level():
+    book = _book()
+    assert book.apply_delta("yes", 40, -4) is False
+    assert book.levels("yes") == [[35, 7], [38, 5], [40, 6]]
+    assert book.apply_delta("yes", 40, -6) is True
+    assert book.levels("yes") == [[35, 7], [38, 5]]
+    assert book.top_of_book_cents() == (38, 45)
+    # Over-cancelling a level also clears it rather than going negative.
+    assert book.apply_delta("no", 55, -10) is True
+    assert book.levels("no") == [[52, 8]]
+    assert book.top_of_book_cents() == (38, 48)
+    assert book.apply_delta("no", 55, 2) is True
+    assert book.levels("no") == [[52, 8], [55, 2]]
+
+
+def test_out_of_range_deltas_are_ignored():
+    book = _book()
+    assert book.apply_delta("yes", 101, 5) is False
+    assert book.apply_delta("yes", -1, 5) is False
+    assert book.top_of_book_cents() == (40, 45)
+
+
+def test_top_levels_lists_asks_high_to_low_then_bids():
+    levels = _book().top_levels()
+    assert [(level["side"], level["price"], level["size"]) for level in levels] == [
+        ("ask", 0.48, 8),
+        ("ask", 0.45, 3),
+        ("bid", 0.40, 10),
+        ("bid", 0.38, 5),
+        ("bid", 0.35, 7),
+    ]
+    assert [level["price"] for level in _book().top_levels(depth=1)] == [0.45, 0.40]
+
+
+def test_empty_book_has_no_top():
+    book = OrderBook("KX-A")
+    assert book.top_of_book_cents() == (None, None)
+    assert book.best_bid() is None
+    assert book.best_ask() is None
+    assert book.top_levels() == []
+    book = _book()
+    book.apply_snapshot(yes=[], no=None)
+    assert book.top_of_book_cents() == (None, None)
+
+
+def test_snapshot_replaces_the_book():
+    store = OrderBookStore()
+    store.apply_snapshot("KX-A", [[40, 10]], [[55, 3]])
+    assert store.apply_delta("KX-A", "yes", 41, 1) is True
+    book = store.apply_snapshot("KX-A", [[30, 1]], [])
+    assert book.levels("yes") == [[30, 1]]
+    assert book.top_of_book_cents() == (30, None)
+    store.discard("KX-A")
+    assert "KX-A" not in store
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from app import kalshi_api
+from app.kalshi_api import BATCH_ORDER_LIMIT
+from app.mock_exchange import MockExchange
+from app.order_manager import FILL_CURSOR_SLACK, OrderManager
+
+QUOTE = {"my_bid_price": 0.4, "my_bid_size": 10, "my_ask_price": 0.6, "my_ask_size": 10}
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    exchange = MockExchange(latency=0.01, seed=7)
+    monkeypatch.setattr(kalshi_api, "_client_options", {})
+    monkeypatch.setattr(kalshi_api, "_client", None)
+    kalshi_api.configure_client(transport=exchange.transport())
+    return exchange
+
+
+def _fills_requested(exchange: MockExchange) -> int:
+    return sum(1 for _, _, path in exchange.requests if path.endswith("/fills"))
+
+
+def test_fills_are_booked_once(exchange):
+    async def scenario():
+        manager = OrderManager("key", rate_limit=1000.0)
+        manager.set_quotes("KX-A", QUOTE)
+        await manager.flush()
+        bid, ask = sorted(manager.orders.values(), key=lambda order: order["side"])
+        exchange.fill(bid["order_id"], 4)
+        first = await manager.poll_fills()
+        again = await manager.poll_fills()
+        exchange.fill(bid["order_id"])
+        exchange.fill(ask["order_id"])
+        second = await manager.poll_fills()
+        return first, again, second
+
+    first, again, second = asyncio.run(scenario())
+    assert [fill["count"] for fill in first] == [4]
+    assert again == []
+    assert sorted(fill["count"] for fill in second) == [6, 10]
+    assert _fills_requested(exchange) == 3
+
+
+def test_fill_cursor_advances_and_forgets_old_trades(exchange):
+    async def scenario():
+        manager = OrderManager("key", rate_limit=1000.0)
+        manager.set_quotes("KX-A", QUOTE)
+        await manager.flush()
+        order_id = next(iter(manager.orders.values()))["order_id"]
+        now = int(time.time())
+        for age in (60, 30, 0):
+            exchange.fill(order_id, 1)["ts"] = now + 100 - age
+        manager._fills_since = now
+        booked = await manager.poll_fills()
+        return manager, now, booked, await manager.poll_fills()
+
+    manager, now, booked, again = asyncio.run(scenario())
+    assert len(booked) == 3
+    assert again == []
+    assert manager._fills_since == now + 100 - FILL_CURSOR_SLACK
+    # Only trades at or after the cursor can come back, so only those are kept.
+    assert list(manager._seen_trades.values()) == [now + 100]
+
+
+def test_halt_cancels_creates_acknowledged_after_it(exchange):
+    exchange.latency = 0.05
+
+    async def scenario():
+        manager = OrderManager("key", rate_limit=1000.0)
+        for i in range(30):
+            manager.set_quotes(f"KX-{i}", QUOTE)
+        flush = asyncio.create_task(manager.flush())
+        await asyncio.sleep(0.02)
+        # Nothing is acknowledged yet, so the kill switch has nothing to
+        # cancel; the creates must cancel themselves when they land.
+        acknowledged = manager.halt()
+        manager.set_quotes("KX-late", QUOTE)
+        await flush
+        return manager, acknowledged, await manager.flush()
+
+    manager, acknowledged, sent_after_halt = asyncio.run(scenario())
+    assert acknowledged == []
+    assert sent_after_halt == 0
+    assert manager.pending == 0
+    assert len(manager.orders) == 0
+    assert len(exchange.orders) == 60
+    assert exchange.resting_orders() == []
+    assert not any(order["ticker"] == "KX-late" for order in exchange.orders.values())
+
+
+def test_flush_batches_and_paces_requests(exchange):
+    exchange.latency = 0.0
+    exchange.max_requests_per_second = 10
+
+    async def scenario():
+        manager = OrderManager("key", rate_limit=10.0)
+        for i in range(50):
+            manager.set_quotes(f"KX-{i}", {**QUOTE, "my_bid_price": 0.3})
+            # Only the latest target per side is sent.
+            manager.set_quotes(f"KX-{i}", QUOTE)
+        started = time.monotonic()
+        sent = await manager.flush()
+        return manager, sent, time.monotonic() - started
+
+    manager, sent, elapsed = asyncio.run(scenario())
+    creates = -(-100 // BATCH_ORDER_LIMIT)
+    assert sent == creates
+    assert exchange.rejected_for_rate == 0
+    assert len(exchange.resting_orders()) == 100
+    assert {order["yes_price"] for order in exchange.resting_orders()} == {40, 60}
+    assert manager.stats["created"] == 100
+    assert manager.stats["throttled"] > 0
+    # Evenly spaced at 10/s: the first request goes out at once.
+    assert elapsed >= (creates - 1) / 10.0 * 0.9
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import polymarket_api
+from app.exchanges import PolymarketAdapter
+from app.mock_exchange import MockPolymarket
+
+MARKETS = [
+    {
+        "conditionId": f"0xcond{i}",
+        "slug": f"will-it-{i}",
+        "question": f"Will it {i}?",
+        "clobTokenIds": json.dumps([f"yes-{i}", f"no-{i}"]),
+        "events": [{"ticker": "weather"}],
+        "bestBid": 0.4,
+        "bestAsk": 0.6,
+        "volumeNum": 1000,
+        "active": True,
+        "closed": False,
+    }
+    for i in range(3)
+]
+
+
+@pytest.fixture
+def venue(monkeypatch):
+    venue = MockPolymarket(markets=MARKETS)
+    monkeypatch.setattr(polymarket_api, "_client_options", {})
+    monkeypatch.setattr(polymarket_api, "_client", None)
+    polymarket_api.configure_client(transport=venue.transport())
+    return venue
+
+
+async def _until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_feed_subscribes_and_applies_book_events(venue):
+    async def scenario():
+        async with venue:
+            adapter = PolymarketAdapter("key")
+            fetched = await adapter.fetch_markets()
+            market_ids = [market["market_id"] for market in fetched["markets"]]
+            feed = adapter.create_feed(market_ids[:2])
+            feed.ws_url = venue.url
+            handler = feed.handler
+            state = SimpleNamespace(is_bot_running=True)
+            task = asyncio.create_task(feed._connect(state))
+            await _until(lambda: venue.subscribed == {"yes-0", "yes-1"})
+            await venue.publish(
+                [
+                    {
+                        "event_type": "book",
+                        "asset_id": "yes-0",
+                        "bids": [{"price": "0.45", "size": "100"}],
+                        "asks": [
+                            {"price": "0.55", "size": "50"},
+                            {"price": "0.58", "size": "10"},
+                        ],
+                    },
+                    {
+                        "event_type": "price_change",
+                        "price_changes": [
+                            {
+                                "asset_id": "yes-0",
+                                "side": "BUY",
+                                "price": "0.47",
+                                "size": "20",
+                            },
+                            {
+                                "asset_id": "yes-0",
+                                "side": "SELL",
+                                "price": "0.55",
+                                "size": "0",
+                            },
+                        ],
+                    },
+                    {"event_type": "book", "asset_id": "yes-2", "bids": [], "asks": []},
+                ]
+            )
+            await _until(lambda: handler.messages == 3)
+            await feed.add_tickers([market_ids[2]])
+            await _until(lambda: "yes-2" in venue.subscribed)
+            await feed.remove_tickers([market_ids[1]])
+            await _until(lambda: "yes-1" not in venue.subscribed)
+            state.is_bot_running = False
+        await task
+        return market_ids, adapter, feed
+
+    market_ids, adapter, feed = asyncio.run(scenario())
+    handler = feed.handler
+    assert market_ids == ["will-it-0", "will-it-1", "will-it-2"]
+    assert adapter.token_ids["will-it-0"] == "yes-0"
+    book = handler.order_books.get("will-it-0")
+    assert book.levels("yes") == [[45, 100], [47, 20]]
+    # The ask at 0.55 was pulled, leaving 0.58 as the best ask.
+    assert book.top_of_book_cents() == (47, 58)
+    assert handler.update_buffer._pending["will-it-0"] == {
+        "best_bid": 0.47,
+        "best_ask": 0.58,
+    }
+    # The book for a market not subscribed when it arrived was ignored.
+    assert handler.order_books.get("will-it-2") is None
+    assert set(handler.markets_by_token) == {"yes-0", "yes-2"}
+    assert adapter.venue_stats()["messages"] == 3
+
+
+def test_sub_cent_ticks_share_a_cent_level():
+    from app.polymarket_feed import PolymarketFeedHandler
+
+    handler = PolymarketFeedHandler("key")
+    handler.markets_by_token["yes-0"] = "will-it-0"
+
+    async def scenario():
+        await handler.handle_message(
+            {
+                "event_type": "book",
+                "asset_id": "yes-0",
+                "bids": [
+                    {"price": "0.031", "size": "10"},
+                    {"price": "0.035", "size": "5.5"},
+                    {"price": "0.029", "size": "1"},
+                ],
+                "asks": [
+                    {"price": "0.962", "size": "7"},
+                    {"price": "0.968", "size": "3"},
+                ],
+            }
+        )
+        book = handler.order_books.get("will-it-0")
+        snapshot = (book.levels("yes"), book.top_of_book_cents())
+        await handler.handle_message(
+            {
+                "event_type": "price_change",
+                "asset_id": "yes-0",
+                "changes": [
+                    {"side": "BUY", "price": "0.035", "size": "0"},
+                    {"side": "SELL", "price": "0.961", "size": "2"},
+                ],
+            }
+        )
+        return snapshot, book
+
+    (levels, top), book = asyncio.run(scenario())
+    # 0.031 and 0.035 add up on the 3 cent level; bids round down.
+    assert levels == [[2, 1], [3, 16]]
+    # Asks round up: 0.962 and 0.968 are both offered at 97 cents.
+    assert top == (3, 97)
+    assert book.levels("no") == [[3, 12]]
+    assert book.levels("yes") == [[2, 1], [3, 10]]
+    handler.forget(["will-it-0"])
+    assert handler._ticks == {}
@@ -0,0 +1,46 @@
+import numpy as np
+
+from app.price_history import PriceHistory, chart_points, downsample_min_max
+
+
+def test_downsampling_keeps_each_buckets_extremes_in_order():
+    rng = np.random.default_rng(3)
+    ts = np.arange(10_000, dtype=np.float64)
+    px = rng.random(10_000)
+    px[1234] = 5.0
+    px[8765] = -5.0
+    kept_ts, kept_px = downsample_min_max(ts, px, 500)
+    assert len(kept_ts) <= 500
+    assert np.all(np.diff(kept_ts) > 0)
+    # Every bucket of 40 points contributes its own minimum and maximum.
+    for start in range(0, 10_000, 40):
+        bucket = px[start : start + 40]
+        inside = kept_px[(kept_ts >= start) & (kept_ts < start + 40)]
+        assert set(inside) == {bucket.min(), bucket.max()}
+    assert 5.0 in kept_px and -5.0 in kept_px
+    assert kept_px.tolist() == px[kept_ts.astype(int)].tolist()
+
+
+def test_short_series_are_returned_whole():
+    ts = np.arange(3, dtype=np.float64)
+    px = np.array([0.3, 0.1, 0.2])
+    kept_ts, kept_px = downsample_min_max(ts, px, 500)
+    assert kept_ts is ts and kept_px is px
+    # An uneven last bucket is padded without inventing points.
+    ts = np.arange(5, dtype=np.float64)
+    px = np.array([0.3, 0.1, 0.2, 0.5, 0.4])
+    kept_ts, kept_px = downsample_min_max(ts, px, 4)
+    assert kept_ts.tolist() == [0.0, 1.0, 3.0, 4.0]
+    assert kept_px.tolist() == [0.3, 0.1, 0.5, 0.4]
+
+
+def test_ring_buffer_wraps_and_skips_repeated_prices():
+    history = PriceHistory(capacity=4)
+    for second, price in enumerate([0.1, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6]):
+        history.append(float(second), price)
+    ts, px = history.columns()
+    assert list(ts) == [3.0, 4.0, 5.0, 6.0]
+    assert list(px) == [0.3, 0.4, 0.5, 0.6]
+    ts, px = history.query(since=5.0)
+    assert ts.tolist() == [5.0, 6.0]
+    assert len(chart_points(history, "ALL", now=6.0)) == 4
@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+from app.market_store import MarketStore
+from app.risk import RiskEngine
+from app.state import DEFAULT_STRATEGY_PARAMS
+
+VENUES = ("kalshi", "polymarket")
+SERIES = ("KXA", "KXB", "KXC")
+
+
+def _store(count: int) -> MarketStore:
+    markets = MarketStore()
+    for i in range(count):
+        markets.add(
+            f"M-{i}",
+            f"M-{i}",
+            f"Market {i}",
+            {"best_bid": 0.4, "best_ask": 0.6},
+            DEFAULT_STRATEGY_PARAMS,
+            venue=VENUES[i % len(VENUES)],
+            series=SERIES[i % len(SERIES)],
+        )
+    return markets
+
+
+def _mark(markets: MarketStore, market_id: str) -> float | None:
+    bid = markets.get(market_id, "best_bid")
+    ask = markets.get(market_id, "best_ask")
+    return (bid + ask) / 2.0 if bid and ask and ask >= bid else None
+
+
+def _brute_force(markets: MarketStore, cash: dict[str, float]) -> dict:
+    """Totals and buckets recomputed from scratch out of the store."""
+    totals = {"net": 0.0, "gross": 0.0, "unrealized": 0.0, "value": 0.0}
+    buckets: dict[tuple[str, str], list[float]] = {}
+    for market_id in markets:
+        inventory = markets.get(market_id, "inventory")
+        avg_cost = markets.get(market_id, "avg_cost")
+        mark = _mark(markets, market_id)
+        mark = avg_cost if mark is None else mark
+        # Cash paid plus what the position is worth: realized and unrealized
+        # PnL must add up to this however the fills were booked.
+        totals["value"] += cash.get(market_id, 0.0) + inventory * mark
+        if not inventory:
+            continue
+        net = inventory * mark
+        unrealized = inventory * (mark - avg_cost)
+        totals["net"] += net
+        totals["gross"] += abs(net)
+        totals["unrealized"] += unrealized
+        for key in (
+            ("venue", markets.get(market_id, "venue")),
+            ("series", markets.get(market_id, "series")),
+        ):
+            bucket = buckets.setdefault(key, [0.0, 0.0, 0.0])
+            bucket[0] += abs(net)
+            bucket[1] += net
+            bucket[2] += unrealized
+    return {"totals": totals, "buckets": buckets}
+
+
+def _assert_matches(risk: RiskEngine, markets: MarketStore, cash: dict[str, float]):
+    expected = _brute_force(markets, cash)
+    totals = expected["totals"]
+    assert risk.net_exposure == pytest.approx(totals["net"], abs=1e-6)
+    assert risk.gross_exposure == pytest.approx(totals["gross"], abs=1e-6)
+    assert risk.unrealized_pnl == pytest.approx(totals["unrealized"], abs=1e-6)
+    assert risk.realized_pnl + risk.unrealized_pnl == pytest.approx(
+        totals["value"], abs=1e-6
+    )
+    actual = {
+        **{("venue", name): bucket for name, bucket in risk.by_venue.items()},
+        **{("series", name): bucket for name, bucket in risk.by_series.items()},
+    }
+    assert actual.keys() == expected["buckets"].keys()
+    for key, (gross, net, unrealized) in expected["buckets"].items():
+        assert actual[key][1:] == pytest.approx([gross, net, unrealized], abs=1e-6)
+
+
+def test_adding_reducing_and_crossing_a_position():
+    markets = _store(1)
+    risk = RiskEngine()
+    risk.apply_fill(markets, "M-0", 10, 0.4)
+    risk.apply_fill(markets, "M-0", 10, 0.6)
+    assert markets.get("M-0", "inventory") == 20
+    assert markets.get("M-0", "avg_cost") == pytest.approx(0.5)
+
+    risk.apply_fill(markets, "M-0", -5, 0.7)
+    assert markets.get("M-0", "inventory") == 15
+    assert markets.get("M-0", "avg_cost") == pytest.approx(0.5)
+    assert markets.get("M-0", "realized_pnl") == pytest.approx(1.0)
+
+    # Selling through zero closes the long and opens a short at the fill.
+    risk.apply_fill(markets, "M-0", -25, 0.3)
+    assert markets.get("M-0", "inventory") == -10
+    assert markets.get("M-0", "avg_cost") == pytest.approx(0.3)
+    assert markets.get("M-0", "realized_pnl") == pytest.approx(-2.0)
+    assert risk.net_exposure == pytest.approx(-5.0)
+    assert risk.unrealized_pnl == pytest.approx(-2.0)
+
+    risk.apply_fill(markets, "M-0", 10, 0.2)
+    assert markets.get("M-0", "inventory") == 0
+    assert markets.get("M-0", "avg_cost") == 0.0
+    assert risk.realized_pnl == pytest.approx(-1.0)
+    # Flat again: the market leaves the totals and its buckets are dropped.
+    assert risk.totals()["positions"] == 0
+    assert risk.by_venue == {}
+    assert risk.by_series == {}
+    assert (risk.net_exposure, risk.gross_exposure, risk.unrealized_pnl) == (
+        0.0,
+        0.0,
+        0.0,
+    )
+
+
+def test_random_fills_and_marks_match_a_recomputation():
+    rng = random.Random(7)
+    markets = _store(12)
+    risk = RiskEngine()
+    cash: dict[str, float] = {}
+    market_ids = list(markets)
+    for _ in range(2000):
+        market_id = rng.choice(market_ids)
+        if rng.random() < 0.6:
+            count = rng.choice([-1, 1]) * rng.randint(1, 30)
+            price = rng.randint(1, 99) / 100
+            cash[market_id] = cash.get(market_id, 0.0) - count * price
+            risk.apply_fill(markets, market_id, count, price)
+        else:
+            bid = rng.randint(1, 98) / 100
+            ask = rng.randint(int(bid * 100) + 1, 99) / 100
+            if rng.random() < 0.1:
+                # A crossed book carries the position at cost.
+                bid, ask = ask, bid
+            markets.update(market_id, {"best_bid": bid, "best_ask": ask})
+            risk.mark(markets, [market_id])
+        _assert_matches(risk, markets, cash)
+
+    # A fresh engine rebuilt from the store books the same totals.
+    restored = RiskEngine()
+    restored.restore(
+        markets,
+        markets.ids_where(
+            (markets.column("inventory") != 0) | (markets.column("realized_pnl") != 0)
+        ),
+    )
+    assert restored.totals()["positions"] == risk.totals()["positions"]
+    assert restored.realized_pnl == pytest.approx(risk.realized_pnl, abs=1e-6)
+    _assert_matches(restored, markets, cash)
+
+
+def test_forgetting_a_market_keeps_its_realized_pnl():
+    markets = _store(2)
+    risk = RiskEngine()
+    risk.apply_fill(markets, "M-0", 10, 0.4)
+    risk.apply_fill(markets, "M-0", -4, 0.6)
+    risk.apply_fill(markets, "M-1", 5, 0.5)
+    risk.forget("M-0")
+    assert risk.realized_pnl == pytest.approx(0.8)
+    assert risk.totals()["positions"] == 1
+    assert risk.net_exposure == pytest.approx(2.5)
+    assert set(risk.by_venue) == {"polymarket"}
@@ -0,0 +1,59 @@
+from app.staleness import StalenessWatchdog
+from app.websocket_client import ShardedKalshiFeed
+
+TICKERS = [f"KX-{i}" for i in range(1000)]
+
+
+def _watchdog() -> tuple[StalenessWatchdog, ShardedKalshiFeed]:
+    feed = ShardedKalshiFeed("key", TICKERS, shard_count=4)
+    for shard in feed.shards:
+        shard.stats["connected"] = True
+    watchdog = StalenessWatchdog("key", feed, stale_after=10.0)
+    watchdog.watch(TICKERS, now=0.0)
+    return watchdog, feed
+
+
+def test_live_markets_are_never_scheduled():
+    watchdog, _ = _watchdog()
+    for second in range(100):
+        assert watchdog.due(float(second)) == []
+    assert watchdog._heap == []
+    assert watchdog._deadlines == {}
+
+
+def test_a_dropped_shard_goes_stale_after_its_deadline():
+    watchdog, feed = _watchdog()
+    shard = feed.shards[1]
+    down = sorted(shard.market_tickers)
+    shard.stats["connected"] = False
+    shard._disconnected_at = 5.0
+    assert watchdog.due(5.0) == []
+    assert len(watchdog._heap) == len(down)
+    # An update on a down shard, e.g. a REST refresh, buys the market time.
+    feed.update_buffer.last_seen[down[0]] = 8.0
+    assert watchdog.due(14.9) == []
+    assert sorted(watchdog.due(15.0)) == down[1:]
+    assert watchdog.due(18.0) == [down[0]]
+    # Still down: the pulled markets are checked again every stale_after.
+    assert sorted(watchdog.due(25.0)) == down[1:]
+
+    shard.stats["connected"] = True
+    shard._disconnected_at = None
+    assert watchdog.due(40.0) == []
+    assert watchdog._deadlines == {}
+
+
+def test_a_resyncing_book_is_armed_once_per_resync():
+    watchdog, feed = _watchdog()
+    feed.handler.resyncing["KX-7"] = 3.0
+    assert watchdog.due(3.0) == []
+    assert watchdog._heap == [(13.0, "KX-7")]
+    assert watchdog.due(12.0) == []
+    assert len(watchdog._heap) == 1
+    assert watchdog.due(13.0) == ["KX-7"]
+
+    feed.handler.resyncing.pop("KX-7")
+    assert watchdog.due(23.0) == []
+    feed.handler.resyncing["KX-7"] = 30.0
+    assert watchdog.due(30.0) == []
+    assert watchdog.due(40.0) == ["KX-7"]
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from app.exchanges import kalshi_market
+from app.market_cache import MarketCache
+from app.order_manager import OrderManager, order_managers
+from app.replay import _make_state
+
+
+@pytest.fixture
+def order_manager(monkeypatch):
+    manager = OrderManager("key")
+    monkeypatch.setitem(order_managers, "", manager)
+    return manager
+
+
+def _fetched(*tickers: str, bid: int = 40, ask: int = 60) -> list:
+    return [
+        kalshi_market(
+            {"ticker": ticker, "title": ticker, "yes_bid": bid, "yes_ask": ask}
+        )
+        for ticker in tickers
+    ]
+
+
+def _quoting_state(tickers: list[str]):
+    state = _make_state(tickers)
+    markets = state._plain_markets()
+    markets.update_many(tickers, {"quoting_active": True})
+    state._requote(tickers)
+    return state, markets
+
+
+def test_repriced_markets_are_requoted(order_manager):
+    state, markets = _quoting_state(["KX-A", "KX-B"])
+    assert markets.get("KX-A", "my_bid_price") == pytest.approx(0.49)
+    assert markets.get("KX-A", "my_ask_price") == pytest.approx(0.51)
+
+    _, updated, _ = state._reconcile_markets(
+        _fetched("KX-A", bid=80, ask=90), complete=False, venue="kalshi"
+    )
+
+    assert updated == 1
+    bid = markets.get("KX-A", "my_bid_price")
+    ask = markets.get("KX-A", "my_ask_price")
+    assert 0.8 <= bid < ask <= 0.9
+    assert order_manager._targets[("KX-A", "bid")][0] == bid
+    assert order_manager._targets[("KX-A", "ask")][0] == ask
+    assert markets.get("KX-B", "my_bid_price") == pytest.approx(0.49)
+
+
+def test_restart_restores_cached_markets_unquoted(tmp_path, order_manager):
+    from app.state import BotState
+
+    state, markets = _quoting_state(["KX-A", "KX-B"])
+    state._apply_fill("KX-A", 5, 0.45)
+    state._record_price("KX-A", time.time(), 0.5)
+    cache = MarketCache(str(tmp_path / "markets.db"))
+    cache.mark_dirty(markets, state._price_histories)
+    cache._write(*cache._capture())
+
+    rows, prices = MarketCache(cache.path).load()
+    order_manager._targets.clear()
+    restored = BotState(_reflex_internal_init=True)
+    restored._restore_markets(rows, prices)
+    loaded = restored._plain_markets()
+
+    assert list(loaded) == ["KX-A", "KX-B"]
+    assert loaded.get("KX-A", "inventory") == 5
+    assert loaded.get("KX-A", "quoting_active")
+    assert loaded.get("KX-A", "best_bid") == pytest.approx(0.4)
+    assert restored._price_histories["KX-A"].last()[1] == pytest.approx(0.5)
+    # The cached prices may be stale: nothing is quoted until a fetch.
+    assert loaded.get("KX-A", "my_bid_price") is None
+    assert order_manager.pending == 0
+
+    # A fetch that finds the prices unchanged still prices the markets.
+    restored._reconcile_markets(_fetched("KX-A", "KX-B"), False, "kalshi")
+    for ticker in ("KX-A", "KX-B"):
+        assert 0.4 <= loaded.get(ticker, "my_bid_price") < 0.6
+        assert order_manager._targets[(ticker, "bid")] is not None
+    assert not restored._unpriced_markets
+
+
+def test_retiring_markets_pulls_the_page_back():
+    tickers = [f"KX-{i:02d}" for i in range(25)]
+    state = _make_state(tickers)
+    state.current_page = 3
+    assert state.total_pages == 3
+
+    state._reconcile_markets(_fetched(*tickers[:12]), complete=True, venue="kalshi")
+
+    assert state.total_pages == 2
+    assert state.current_page == 2
+    assert [market["market_id"] for market in state.active_markets] == tickers[10:12]
+    state._reconcile_markets(_fetched(*tickers[:3]), complete=True, venue="kalshi")
+    assert state.current_page == 1
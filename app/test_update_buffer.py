@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.replay import ReplayState, _make_state
+from app.update_buffer import MarketUpdateBuffer
+
+TICKERS = ["KX-A", "KX-B", "KX-C"]
+
+
+def _flushed_state():
+    commits = []
+    state = ReplayState(_make_state(TICKERS), lambda: commits.append(1))
+    return state, commits
+
+
+def test_updates_to_one_market_merge_into_one_patch():
+    state, commits = _flushed_state()
+    buffer = MarketUpdateBuffer()
+    for bid in (0.41, 0.42, 0.43):
+        buffer.update("KX-A", {"best_bid": bid})
+    buffer.update("KX-A", {"best_ask": 0.55})
+    buffer.update("KX-B", {"best_bid": 0.30})
+    assert len(buffer) == 2
+    assert buffer.stats["merged"] == 3
+
+    assert asyncio.run(buffer.flush(state)) == 2
+    assert len(commits) == 1
+    markets = state._plain_markets()
+    assert markets.get("KX-A", "best_bid") == pytest.approx(0.43)
+    assert markets.get("KX-A", "best_ask") == pytest.approx(0.55)
+    assert markets.get("KX-B", "best_bid") == pytest.approx(0.30)
+    assert buffer.last_seen.keys() == {"KX-A", "KX-B"}
+    assert buffer.stats["last_flush_size"] == 2
+    # Nothing pending: the next flush does not take the state lock.
+    assert asyncio.run(buffer.flush(state)) == 0
+    assert len(commits) == 1
+
+
+def test_updates_for_markets_past_max_pending_are_dropped():
+    state, _ = _flushed_state()
+    buffer = MarketUpdateBuffer(max_pending=2)
+    buffer.update("KX-A", {"best_bid": 0.41})
+    buffer.update("KX-B", {"best_bid": 0.31})
+    buffer.update("KX-C", {"best_bid": 0.21})
+    # Markets already pending still merge.
+    buffer.update("KX-A", {"best_bid": 0.42})
+    assert buffer.stats["dropped"] == 1
+    assert buffer.stats["merged"] == 1
+
+    assert asyncio.run(buffer.flush(state)) == 2
+    assert state._plain_markets().get("KX-C", "best_bid") == pytest.approx(0.40)
+    buffer.update("KX-C", {"best_bid": 0.21})
+    assert asyncio.run(buffer.flush(state)) == 1
+    assert state._plain_markets().get("KX-C", "best_bid") == pytest.approx(0.21)
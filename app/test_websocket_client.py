@@ -0,0 +1,152 @@
+import asyncio
+import json
+from collections import deque
+from types import SimpleNamespace
+
+from app.order_book import OrderBookStore
+from app.websocket_client import KalshiWebsocketClient
+
+TICKERS = ["KX-A", "KX-B"]
+
+
+class FakeKalshiSocket:
+    """Stands in for the exchange end of one connection: acknowledges
+    subscribes with fresh sids, opens every order book subscription with a
+    snapshot of the true books, and lets the test queue deltas, including
+    ones it never delivers."""
+
+    def __init__(self, state):
+        self.state = state
+        self.books = OrderBookStore()
+        for ticker in TICKERS:
+            self.books.apply_snapshot(ticker, [[40, 10]], [[55, 5]])
+        self.sent: list[dict] = []
+        self.frames: deque = deque()
+        self._next_sid = 1
+        self._seq: dict[int, int] = {}
+
+    async def send(self, message: str):
+        command = json.loads(message)
+        self.sent.append(command)
+        if command["cmd"] != "subscribe":
+            return
+        sid = self._next_sid
+        self._next_sid += 1
+        channel = command["params"]["channels"][0]
+        self.frames.append(
+            {
+                "id": command["id"],
+                "type": "subscribed",
+                "msg": {"channel": channel, "sid": sid},
+            }
+        )
+        if channel != "orderbook_delta":
+            return
+        for ticker in command["params"]["market_tickers"]:
+            book = self.books.get(ticker)
+            self._frame(
+                sid,
+                "orderbook_snapshot",
+                market_ticker=ticker,
+                yes=book.levels("yes"),
+                no=book.levels("no"),
+            )
+
+    def delta(self, sid: int, ticker: str, side: str, price: int, delta: int):
+        """Applies a delta to the true book and queues it on `sid`."""
+        self.books.apply_delta(ticker, side, price, delta)
+        self._frame(
+            sid,
+            "orderbook_delta",
+            market_ticker=ticker,
+            side=side,
+            price=price,
+            delta=delta,
+        )
+
+    def _frame(self, sid: int, msg_type: str, **msg):
+        seq = self._seq[sid] = self._seq.get(sid, 0) + 1
+        self.frames.append({"type": msg_type, "sid": sid, "seq": seq, "msg": msg})
+
+    async def recv(self) -> str:
+        if not self.frames:
+            self.state.is_bot_running = False
+            return json.dumps({"type": "heartbeat"})
+        return json.dumps(self.frames.popleft())
+
+
+def test_sequence_gap_resubscribes_and_rebuilds_the_books():
+    state = SimpleNamespace(is_bot_running=True)
+    socket = FakeKalshiSocket(state)
+    client = KalshiWebsocketClient("key", list(TICKERS))
+    handler = client.handler
+
+    async def scenario():
+        await client._subscribe(socket)
+        socket.delta(1, "KX-A", "yes", 41, 3)
+        # A delta lost in transit: the next one skips a sequence number.
+        socket.delta(1, "KX-A", "yes", 40, -10)
+        socket.frames.pop()
+        socket.delta(1, "KX-B", "no", 55, -5)
+        socket.delta(1, "KX-A", "no", 57, 2)
+        await client._receive(socket, state)
+
+    asyncio.run(scenario())
+
+    commands = [(command["cmd"], command.get("params")) for command in socket.sent]
+    assert ("unsubscribe", {"sids": [1]}) in commands
+    resubscribe = commands[commands.index(("unsubscribe", {"sids": [1]})) + 1]
+    assert resubscribe == (
+        "subscribe",
+        {"channels": ["orderbook_delta"], "market_tickers": TICKERS},
+    )
+    stats = handler.update_buffer.stats
+    assert stats["sequence_gaps"] == 1
+    # The gapped frame and the old subscription's later frame were dropped.
+    assert client.dropped_frames == 2
+    assert handler.resyncing == {}
+    assert 1 not in client._subscriptions
+    for ticker in TICKERS:
+        book = handler.order_books.get(ticker)
+        for side in ("yes", "no"):
+            assert book.levels(side) == socket.books.get(ticker).levels(side)
+    assert handler.order_books.get("KX-A").top_of_book_cents() == (41, 43)
+
+
+def test_deltas_are_held_while_a_book_resyncs():
+    client = KalshiWebsocketClient("key", list(TICKERS))
+    handler = client.handler
+
+    async def scenario():
+        await handler.handle_message(
+            {
+                "type": "orderbook_snapshot",
+                "msg": {"market_ticker": "KX-A", "yes": [[40, 10]], "no": []},
+            }
+        )
+        handler.begin_resync(["KX-A"])
+        await handler.handle_message(
+            {
+                "type": "orderbook_delta",
+                "msg": {
+                    "market_ticker": "KX-A",
+                    "side": "yes",
+                    "price": 45,
+                    "delta": 1,
+                },
+            }
+        )
+        held = handler.order_books.get("KX-A").levels("yes")
+        assert "KX-A" in handler.resyncing
+        await handler.handle_message(
+            {
+                "type": "orderbook_snapshot",
+                "msg": {"market_ticker": "KX-A", "yes": [[42, 1]], "no": []},
+            }
+        )
+        return held
+
+    held = asyncio.run(scenario())
+    assert held == [[40, 10]]
+    assert handler.order_books.get("KX-A").levels("yes") == [[42, 1]]
+    assert "KX-A" not in handler.resyncing
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+from app.activity_log import activity_log
+from app.metrics import metrics
+from app.models import FeedStats, ShardStats, VenueStats
+from app.order_book import ORDER_BOOK_DEPTH, OrderBookStore
+
+DEFAULT_FLUSH_INTERVAL = 0.15
+DEFAULT_MAX_PENDING_MARKETS = 20000
+
+_flush_seconds = metrics.histogram(
+    "state_flush_seconds", "Time a feed flush holds the state lock."
+)
+_flushed_markets = metrics.counter(
+    "state_flushed_markets_total", "Market patches written by feed flushes."
+)
+
+
+class MarketUpdateBuffer:
+    """Coalesces websocket updates in plain Python and flushes them into
+    `BotState._markets` as a single state transaction.
+
+    Handlers call `update` / `mark_book` / `log` without touching the state
+    lock. Repeated updates to the same market between flushes are merged, so
+    each flush writes at most one patch per market no matter how many
+    messages arrived. Once `max_pending` distinct markets are waiting, updates
+    for further markets are dropped until the next flush. `last_seen` holds
+    the monotonic time of the flush that last carried news for each ticker.
+    """
+
+    def __init__(
+        self,
+        order_books: OrderBookStore | None = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING_MARKETS,
+    ):
+        self.order_books = order_books
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[str, dict] = {}
+        self._dirty_books: set[str] = set()
+        self._logged = False
+        self._prices: dict[str, list[tuple[float, float]]] = {}
+        self.shard_stats: list[ShardStats] = []
+        self.last_seen: dict[str, float] = {}
+        self.venue_stats: Callable[[], VenueStats] | None = None
+        self.stats = FeedStats(
+            messages=0,
+            merged=0,
+            dropped=0,
+            flushes=0,
+            last_flush_size=0,
+            last_lock_ms=0.0,
+            max_lock_ms=0.0,
+            reconnects=0,
+            sequence_gaps=0,
+            last_recovery_ms=0.0,
+            max_recovery_ms=0.0,
+        )
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def update(self, ticker: str, fields: dict):
+        """Queues a field patch for `ticker`, merging into any pending patch."""
+        self.stats["messages"] += 1
+        pending = self._pending.get(ticker)
+        if pending is not None:
+            pending.update(fields)
+            self.stats["merged"] += 1
+        elif len(self._pending) < self.max_pending:
+            self._pending[ticker] = dict(fields)
+        else:
+            self.stats["dropped"] += 1
+
+    def forget(self, tickers: list[str]):
+        for ticker in tickers:
+            self._pending.pop(ticker, None)
+            self._dirty_books.discard(ticker)
+            self.last_seen.pop(ticker, None)
+
+    def mark_book(self, ticker: str):
+        """Flags a ticker whose order book ladder changed since the last flush."""
+        self._dirty_books.add(ticker)
+
+    def record_price(self, ticker: str, timestamp: float, price: float):
+        """Queues a traded price for the market's price history."""
+        points = self._prices.get(ticker)
+        if points is None:
+            self._prices[ticker] = [(timestamp, price)]
+        else:
+            points.append((timestamp, price))
+
+    def log(self, level: str, message: str):
+        """Writes to the activity log now; the view picks it up at the next
+        flush."""
+        activity_log.append(level, message)
+        self._logged = True
+
+    async def flush(self, state) -> int:
+        """Applies all pending updates inside one `async with state` block and
+        returns the number of markets written."""
+        if (
+            not self._pending
+            and not self._dirty_books
+            and not self._logged
+            and not self._prices
+        ):
+            return 0
+        pending, self._pending = self._pending, {}
+        prices, self._prices = self._prices, {}
+        dirty_books, self._dirty_books = self._dirty_books, set()
+        self._logged = False
+        now = time.monotonic()
+        for ticker in pending:
+            self.last_seen[ticker] = now
+        for ticker in dirty_books:
+            self.last_seen[ticker] = now
+        written = 0
+        async with state:
+            started = time.perf_counter()
+            markets = state._plain_markets()
+            touched = []
+            for ticker, fields in pending.items():
+                if ticker not in markets:
+                    continue
+                if markets.update(ticker, fields):
+                    touched.append(ticker)
+                written += 1
+            state._requote(touched)
+            state._revalue(touched)
+            for ticker, points in prices.items():
+                if ticker in markets:
+                    for timestamp, price in points:
+                        state._record_price(ticker, timestamp, price)
+            active_id = state.active_market_id
+            if self.order_books and active_id in dirty_books and active_id in markets:
+                book = self.order_books.get(active_id)
+                if book is not None and markets.set(
+                    active_id, "order_book", book.top_levels(ORDER_BOOK_DEPTH)
+                ):
+                    touched.append(active_id)
+            if touched:
+                state._touch_markets()
+            state._sync_log_view()
+            lock_seconds = time.perf_counter() - started
+            _flush_seconds.observe(lock_seconds)
+            _flushed_markets.inc(written)
+            lock_ms = lock_seconds * 1000.0
+            self.stats["flushes"] += 1
+            self.stats["last_flush_size"] = written
+            self.stats["last_lock_ms"] = round(lock_ms, 3)
+            self.stats["max_lock_ms"] = round(
+                max(self.stats["max_lock_ms"], lock_ms), 3
+            )
+            state.feed_stats = dict(self.stats)
+            if self.shard_stats:
+                state.shard_stats = [dict(stats) for stats in self.shard_stats]
+            if self.venue_stats is not None:
+                state._publish_venue_stats(self.venue_stats())
+        return written
+
+    async def run(self, state):
+        """Flushes every `flush_interval` seconds while the bot is running."""
+        while state.is_bot_running:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush(state)
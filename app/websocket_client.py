@@ -1,88 +1,500 @@
-import reflex as rx
 import asyncio
-import websockets
 import json
 import logging
+import os
+import random
+import time
+import zlib
+
+import reflex as rx
+import websockets
+
+from app import json_codec
+from app.metrics import metrics
+from app.models import ShardStats
+from app.order_book import OrderBookStore
 from app.state import BotState
+from app.update_buffer import DEFAULT_FLUSH_INTERVAL, MarketUpdateBuffer
 
+logger = logging.getLogger(__name__)
 
-class KalshiWebsocketClient:
-    def __init__(self, api_key: str, market_tickers: list[str]):
+KALSHI_WS_URL = os.getenv(
+    "KALSHI_WS_URL", "wss://trading-api.kalshi.com/trade-api/ws/v2"
+)
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+SUBSCRIPTION_CHUNK_SIZE = 50
+FATAL_HANDSHAKE_STATUSES = {401, 403}
+DEFAULT_SHARD_COUNT = 4
+DEFAULT_QUEUE_SIZE = 10000
+
+_received_bytes = metrics.counter(
+    "feed_received_bytes_total", "Websocket bytes received.", venue="kalshi"
+)
+_decode_seconds = metrics.histogram(
+    "feed_decode_seconds", "Time to decode one feed frame.", venue="kalshi"
+)
+_handle_seconds = metrics.histogram(
+    "feed_handle_seconds", "Time to apply one decoded feed frame.", venue="kalshi"
+)
+_queue_lag_seconds = metrics.histogram(
+    "feed_queue_lag_seconds",
+    "Time a decoded frame waited in the shard fan-in queue.",
+    venue="kalshi",
+)
+
+
+class MarketFeedHandler:
+    """Applies decoded feed messages to the order books and queues the
+    resulting market updates in the update buffer.
+
+    Tickers in `resyncing` lost order book deltas: their deltas are dropped
+    until the `orderbook_snapshot` of their resubscription replaces the
+    book, so nothing is applied to a book that is known to be wrong.
+    """
+
+    def __init__(self, api_key: str, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
         self.api_key = api_key
-        self.market_tickers = market_tickers
-        self.ws_url = "wss://trading-api.kalshi.com/trade-api/ws/v2"
+        self.order_books = OrderBookStore()
+        self.update_buffer = MarketUpdateBuffer(
+            self.order_books, flush_interval=flush_interval
+        )
+        self.resyncing: dict[str, float] = {}
 
-    async def connect(self, state_setter: BotState):
-        extra_headers = {"Authorization": f"Bearer {self.api_key}"}
-        try:
-            async with websockets.connect(
-                self.ws_url, extra_headers=extra_headers
-            ) as websocket:
-                async with state_setter:
-                    state_setter._add_log("info", "Connected to Kalshi WebSocket.")
-                if self.market_tickers:
-                    subscription_msg = {
-                        "id": 1,
-                        "cmd": "subscribe",
-                        "params": {
-                            "channels": ["orderbook_delta", "ticker"],
-                            "market_tickers": self.market_tickers,
-                        },
-                    }
-                    await websocket.send(json.dumps(subscription_msg))
-                while state_setter.is_bot_running:
-                    try:
-                        message = await asyncio.wait_for(websocket.recv(), timeout=15)
-                        data = json.loads(message)
-                        await self.handle_message(data, state_setter)
-                    except asyncio.TimeoutError as e:
-                        logging.exception(f"WebSocket timeout: {e}")
-                        ping_msg = {"id": 2, "cmd": "ping"}
-                        await websocket.send(json.dumps(ping_msg))
-                    except websockets.exceptions.ConnectionClosed as e:
-                        logging.exception(f"WebSocket connection closed: {e}")
-                        async with state_setter:
-                            state_setter._add_log(
-                                "error", "WebSocket connection closed."
-                            )
-                        break
-        except Exception as e:
-            logging.exception(f"WebSocket connection failed: {e}")
-            async with state_setter:
-                state_setter._add_log("error", f"WebSocket connection failed: {e}")
-                state_setter.is_bot_running = False
-
-    async def handle_message(self, data: dict, state_setter: BotState):
+    async def handle_message(self, data: dict):
         msg_type = data.get("type")
         if msg_type == "orderbook_delta":
-            await self._handle_orderbook_delta(data, state_setter)
+            await self._handle_orderbook_delta(data)
+        elif msg_type == "orderbook_snapshot":
+            await self._handle_orderbook_snapshot(data)
         elif msg_type == "ticker":
-            await self._handle_ticker(data, state_setter)
+            await self._handle_ticker(data)
         elif msg_type == "subscribed":
-            async with state_setter:
-                state_setter._add_log(
-                    "info", f"Subscribed to channel: {data['msg']['channel']}"
-                )
+            self.update_buffer.log(
+                "info", f"Subscribed to channel: {data['msg']['channel']}"
+            )
 
-    async def _handle_orderbook_delta(self, data: dict, state_setter: BotState):
+    async def _handle_orderbook_snapshot(self, data: dict):
         msg = data.get("msg", {})
         market_ticker = msg.get("market_ticker")
         if not market_ticker:
             return
-        async with state_setter:
-            if market_ticker in state_setter.markets:
-                log_msg = f"Order book update for {market_ticker}: {msg['side']} at {msg['price']} cents, size change {msg['delta']}"
+        self.order_books.apply_snapshot(
+            market_ticker, msg.get("yes", []), msg.get("no", [])
+        )
+        self._publish_book(market_ticker, top_changed=True)
+        started = self.resyncing.pop(market_ticker, None)
+        if started is not None:
+            self.record_recovery(started)
+
+    async def _handle_orderbook_delta(self, data: dict):
+        msg = data.get("msg", {})
+        market_ticker = msg.get("market_ticker")
+        if not market_ticker or market_ticker in self.resyncing:
+            return
+        top_changed = self.order_books.apply_delta(
+            market_ticker, msg["side"], msg["price"], msg["delta"]
+        )
+        self._publish_book(market_ticker, top_changed)
+
+    def _publish_book(self, market_ticker: str, top_changed: bool):
+        """Queues the top of book for the next flush. The depth ladder is only
+        materialized at flush time, and only for the market on the detail page."""
+        self.update_buffer.mark_book(market_ticker)
+        if top_changed:
+            book = self.order_books.get(market_ticker)
+            self.update_buffer.update(
+                market_ticker,
+                {"best_bid": book.best_bid(), "best_ask": book.best_ask()},
+            )
 
-    async def _handle_ticker(self, data: dict, state_setter: BotState):
+    async def _handle_ticker(self, data: dict):
         msg = data.get("msg", {})
         market_ticker = msg.get("market_ticker")
         if not market_ticker:
             return
-        async with state_setter:
-            if market_ticker in state_setter.markets:
-                state_setter.markets[market_ticker]["best_bid"] = (
-                    msg.get("yes_bid", 0) / 100.0
+        self.update_buffer.update(
+            market_ticker,
+            {
+                "best_bid": msg.get("yes_bid", 0) / 100.0,
+                "best_ask": msg.get("yes_ask", 0) / 100.0,
+            },
+        )
+        if msg.get("price"):
+            self.update_buffer.record_price(
+                market_ticker, msg.get("ts") or time.time(), msg["price"] / 100.0
+            )
+
+    def record_recovery(self, started: float):
+        elapsed_ms = round((time.monotonic() - started) * 1000.0, 1)
+        stats = self.update_buffer.stats
+        stats["last_recovery_ms"] = elapsed_ms
+        stats["max_recovery_ms"] = max(stats["max_recovery_ms"], elapsed_ms)
+
+    def begin_resync(self, tickers: list[str]):
+        """Holds the tickers' books until their next snapshot arrives."""
+        now = time.monotonic()
+        for ticker in tickers:
+            self.resyncing.setdefault(ticker, now)
+
+    def forget(self, tickers: list[str]):
+        for ticker in tickers:
+            self.order_books.discard(ticker)
+            self.resyncing.pop(ticker, None)
+        self.update_buffer.forget(tickers)
+
+
+class KalshiWebsocketClient:
+    """A single supervised websocket connection.
+
+    Messages are decoded and sequence-checked here, then either handed to
+    `handler` directly or, when the client is one shard of a
+    `ShardedKalshiFeed`, put on the feed's shared queue.
+
+    A sequence gap on an order book subscription drops that subscription:
+    its later messages are discarded, and its tickers are resubscribed
+    under a new sid. The exchange opens every order book subscription with
+    an `orderbook_snapshot`, so the rebuilt books line up with the deltas
+    that follow.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        market_tickers: list[str],
+        handler: MarketFeedHandler | None = None,
+        queue: asyncio.Queue | None = None,
+        shard_id: int = 0,
+        decoder: json_codec.JsonDecoder | None = None,
+        ws_url: str = KALSHI_WS_URL,
+    ):
+        self.api_key = api_key
+        self.market_tickers = market_tickers
+        self.ws_url = ws_url
+        self.handler = handler or MarketFeedHandler(api_key)
+        self.decoder = decoder or json_codec.decoder
+        self.queue = queue
+        self.shard_id = shard_id
+        self.stats = ShardStats(
+            shard=shard_id,
+            tickers=len(market_tickers),
+            connected=False,
+            messages=0,
+            blocked=0,
+            queue_lag_ms=0.0,
+            max_queue_lag_ms=0.0,
+        )
+        self._websocket = None
+        self._next_command_id = 1
+        self._pending_subscriptions: dict[int, tuple[str, list[str]]] = {}
+        self._subscriptions: dict[int, tuple[str, list[str]]] = {}
+        self._last_seq: dict[int, int] = {}
+        self._dropped_sids: set[int] = set()
+        self.dropped_frames = 0
+        self._disconnected_at: float | None = None
+
+    @property
+    def down_since(self) -> float | None:
+        """When the connection dropped, until data flows again after the
+        reconnect; 0 before it first connects; None while it is up."""
+        if self._disconnected_at is not None:
+            return self._disconnected_at
+        return None if self.stats["connected"] else 0.0
+
+    async def connect(self, state_setter: BotState):
+        """Runs the connection until the bot stops, reconnecting with
+        exponential backoff and jitter whenever it drops."""
+        extra_headers = {"Authorization": f"Bearer {self.api_key}"}
+        update_buffer = self.handler.update_buffer
+        attempt = 0
+        while state_setter.is_bot_running:
+            try:
+                async with websockets.connect(
+                    self.ws_url, additional_headers=extra_headers
+                ) as websocket:
+                    attempt = 0
+                    self._websocket = websocket
+                    self.stats["connected"] = True
+                    update_buffer.log(
+                        "info",
+                        f"Connected to Kalshi WebSocket (shard {self.shard_id}).",
+                    )
+                    await self._subscribe(websocket)
+                    await self._receive(websocket, state_setter)
+            except websockets.exceptions.ConnectionClosed:
+                logger.exception("WebSocket connection closed")
+                update_buffer.log("error", "WebSocket connection closed.")
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                logger.exception("WebSocket connection failed")
+                if status in FATAL_HANDSHAKE_STATUSES:
+                    async with state_setter:
+                        state_setter._add_log(
+                            "error", f"WebSocket connection failed: {e}"
+                        )
+                        state_setter.is_bot_running = False
+                    break
+                update_buffer.log("error", f"WebSocket connection failed: {e}")
+            finally:
+                self._websocket = None
+                self.stats["connected"] = False
+            if not state_setter.is_bot_running:
+                break
+            if self._disconnected_at is None:
+                self._disconnected_at = time.monotonic()
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+            attempt += 1
+            update_buffer.stats["reconnects"] += 1
+            update_buffer.log(
+                "warning", f"Reconnecting to Kalshi WebSocket in {delay:.1f}s."
+            )
+            await asyncio.sleep(delay)
+
+    async def _subscribe(self, websocket):
+        """Subscribes the current ticker set. Order book channels are split
+        into chunks so a sequence gap only invalidates that chunk's books."""
+        self._pending_subscriptions.clear()
+        self._subscriptions.clear()
+        self._last_seq.clear()
+        self._dropped_sids.clear()
+        await self._subscribe_tickers(websocket, list(self.market_tickers))
+
+    async def _subscribe_tickers(self, websocket, tickers: list[str]):
+        if not tickers:
+            return
+        await self._subscribe_books(websocket, tickers)
+        await self._send_command(
+            websocket, "subscribe", {"channels": ["ticker"], "market_tickers": tickers}
+        )
+
+    async def _subscribe_books(self, websocket, tickers: list[str]):
+        for i in range(0, len(tickers), SUBSCRIPTION_CHUNK_SIZE):
+            await self._send_command(
+                websocket,
+                "subscribe",
+                {
+                    "channels": ["orderbook_delta"],
+                    "market_tickers": tickers[i : i + SUBSCRIPTION_CHUNK_SIZE],
+                },
+            )
+
+    async def _send_command(self, websocket, cmd: str, params: dict | None = None):
+        command_id = self._next_command_id
+        self._next_command_id += 1
+        message = {"id": command_id, "cmd": cmd}
+        if params is not None:
+            message["params"] = params
+            if cmd == "subscribe":
+                self._pending_subscriptions[command_id] = (
+                    params["channels"][0],
+                    list(params["market_tickers"]),
+                )
+        await websocket.send(json.dumps(message))
+
+    async def add_tickers(self, tickers: list[str]):
+        """Subscribes additional tickers on the live connection."""
+        tickers = [ticker for ticker in tickers if ticker not in self.market_tickers]
+        self.market_tickers.extend(tickers)
+        self.stats["tickers"] = len(self.market_tickers)
+        if self._websocket is not None:
+            await self._subscribe_tickers(self._websocket, tickers)
+
+    async def remove_tickers(self, tickers: list[str]):
+        """Drops tickers from every subscription that covers them."""
+        removed = set(tickers)
+        self.market_tickers[:] = [t for t in self.market_tickers if t not in removed]
+        self.stats["tickers"] = len(self.market_tickers)
+        for sid, (channel, sid_tickers) in list(self._subscriptions.items()):
+            dropped = [ticker for ticker in sid_tickers if ticker in removed]
+            if not dropped:
+                continue
+            self._subscriptions[sid] = (
+                channel,
+                [ticker for ticker in sid_tickers if ticker not in removed],
+            )
+            if self._websocket is not None:
+                await self._send_command(
+                    self._websocket,
+                    "update_subscription",
+                    {
+                        "sids": [sid],
+                        "market_tickers": dropped,
+                        "action": "delete_markets",
+                    },
                 )
-                state_setter.markets[market_ticker]["best_ask"] = (
-                    msg.get("yes_ask", 0) / 100.0
-                )
\ No newline at end of file
+
+    async def _receive(self, websocket, state_setter: BotState):
+        while state_setter.is_bot_running:
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=15)
+            except TimeoutError:
+                logger.exception("WebSocket timeout")
+                await self._send_command(websocket, "ping")
+                continue
+            received_at = time.monotonic()
+            if self._disconnected_at is not None:
+                self.handler.record_recovery(self._disconnected_at)
+                self._disconnected_at = None
+            _received_bytes.inc(len(message))
+            started = time.perf_counter()
+            data = self.decoder.decode_feed(message)
+            _decode_seconds.observe(time.perf_counter() - started)
+            self.stats["messages"] += 1
+            if data.get("sid") in self._dropped_sids:
+                self.dropped_frames += 1
+                continue
+            gap_sid = self._track_message(data)
+            if gap_sid is not None:
+                self.dropped_frames += 1
+                await self._resubscribe(websocket, gap_sid)
+                continue
+            if self.queue is None:
+                started = time.perf_counter()
+                await self.handler.handle_message(data)
+                _handle_seconds.observe(time.perf_counter() - started)
+                continue
+            if self.queue.full():
+                self.stats["blocked"] += 1
+            await self.queue.put((self, received_at, data))
+
+    def _track_message(self, data: dict) -> int | None:
+        """Maps subscription ids to tickers and checks `seq` per subscription.
+        Returns the sid of an order book subscription that skipped a
+        sequence number."""
+        msg_type = data.get("type")
+        sid = data.get("sid")
+        if msg_type == "subscribed":
+            subscription = self._pending_subscriptions.pop(data.get("id"), None)
+            sid = data.get("msg", {}).get("sid")
+            if subscription is not None and sid is not None:
+                self._subscriptions[sid] = subscription
+            return None
+        seq = data.get("seq")
+        if sid is None or seq is None:
+            return None
+        last = self._last_seq.get(sid)
+        self._last_seq[sid] = seq
+        if msg_type != "orderbook_delta" or last is None or seq == last + 1:
+            return None
+        return sid
+
+    async def _resubscribe(self, websocket, sid: int):
+        """Drops a subscription whose sequence broke and subscribes its
+        tickers again, holding their books until the new snapshots."""
+        last = self._last_seq.pop(sid, None)
+        _, tickers = self._subscriptions.pop(sid, ("", []))
+        self._dropped_sids.add(sid)
+        self.handler.update_buffer.stats["sequence_gaps"] += 1
+        self.handler.update_buffer.log(
+            "warning",
+            f"Sequence gap on shard {self.shard_id} subscription {sid} after "
+            f"seq {last}; resubscribing {len(tickers)} order books.",
+        )
+        self.handler.begin_resync(tickers)
+        await self._send_command(websocket, "unsubscribe", {"sids": [sid]})
+        await self._subscribe_books(websocket, tickers)
+
+
+class ShardedKalshiFeed:
+    """Spreads the ticker set over several websocket connections whose
+    decoded messages fan into one bounded queue drained by a single
+    consumer. A full queue blocks the shards' receive loops, which pushes
+    back on the exchange instead of buffering without limit.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        market_tickers: list[str],
+        shard_count: int = DEFAULT_SHARD_COUNT,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        ws_url: str = KALSHI_WS_URL,
+    ):
+        self.handler = MarketFeedHandler(api_key, flush_interval=flush_interval)
+        self.update_buffer = self.handler.update_buffer
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        shard_count = max(1, min(shard_count, len(market_tickers)))
+        self.shards = [
+            KalshiWebsocketClient(
+                api_key, [], self.handler, self.queue, shard_id, ws_url=ws_url
+            )
+            for shard_id in range(shard_count)
+        ]
+        for ticker in market_tickers:
+            self.shard_for(ticker).market_tickers.append(ticker)
+        for shard in self.shards:
+            shard.stats["tickers"] = len(shard.market_tickers)
+        self.update_buffer.shard_stats = [shard.stats for shard in self.shards]
+
+    def shard_for(self, ticker: str) -> KalshiWebsocketClient:
+        return self.shards[zlib.crc32(ticker.encode()) % len(self.shards)]
+
+    async def add_tickers(self, tickers: list[str]):
+        for shard, shard_tickers in self._group(tickers).items():
+            await shard.add_tickers(shard_tickers)
+
+    async def remove_tickers(self, tickers: list[str]):
+        for shard, shard_tickers in self._group(tickers).items():
+            await shard.remove_tickers(shard_tickers)
+        self.handler.forget(tickers)
+
+    def unhealthy_since(self, ticker: str) -> float | None:
+        """Since when `ticker`'s data cannot be trusted because its shard is
+        down or its book is resyncing; None while it is live."""
+        down = self.shard_for(ticker).down_since
+        resync = self.handler.resyncing.get(ticker)
+        if down is None or resync is None:
+            return resync if down is None else down
+        return min(down, resync)
+
+    def outages(self) -> list[tuple[tuple, float, list[str]]]:
+        """`(key, since, tickers)` for each down shard and each resyncing
+        book, keyed so a caller can tell a new outage from one it has seen."""
+        outages = [
+            (("shard", shard.shard_id), shard.down_since, shard.market_tickers)
+            for shard in self.shards
+            if shard.down_since is not None
+        ]
+        outages.extend(
+            (("resync", ticker), since, [ticker])
+            for ticker, since in self.handler.resyncing.items()
+        )
+        return outages
+
+    def _group(self, tickers: list[str]) -> dict[KalshiWebsocketClient, list[str]]:
+        groups: dict[KalshiWebsocketClient, list[str]] = {}
+        for ticker in tickers:
+            groups.setdefault(self.shard_for(ticker), []).append(ticker)
+        return groups
+
+    async def _consume(self, state_setter: BotState):
+        while state_setter.is_bot_running or not self.queue.empty():
+            try:
+                shard, received_at, data = await asyncio.wait_for(
+                    self.queue.get(), timeout=1.0
+                )
+            except TimeoutError:
+                continue
+            lag = time.monotonic() - received_at
+            _queue_lag_seconds.observe(lag)
+            lag_ms = lag * 1000.0
+            shard.stats["queue_lag_ms"] = round(lag_ms, 3)
+            if lag_ms > shard.stats["max_queue_lag_ms"]:
+                shard.stats["max_queue_lag_ms"] = round(lag_ms, 3)
+            started = time.perf_counter()
+            await self.handler.handle_message(data)
+            _handle_seconds.observe(time.perf_counter() - started)
+
+    async def run(self, state_setter: BotState):
+        flusher = asyncio.create_task(self.update_buffer.run(state_setter))
+        consumer = asyncio.create_task(self._consume(state_setter))
+        try:
+            await asyncio.gather(
+                *(shard.connect(state_setter) for shard in self.shards)
+            )
+        finally:
+            consumer.cancel()
+            flusher.cancel()
+            await self.update_buffer.flush(state_setter)